@@ -5,32 +5,31 @@ import subprocess
 import logging
 import re
 import json
+import os
+import signal
+import tempfile
 from lxml import etree
 
+from fio.FioResult import FioResult
+
 class FioJob(object):
     '''
     A class configuring the fio job.
     '''
-    ## Position of read IOPS in the fio terse output.
-    terseIOPSReadPos = 7
-
-    ## Position of write IOPS in the fio terse output.
-    terseIOPSWritePos = 48
-
-    ## Position of write total IO in the fio terse output
-    terseTotIOWritePos = 46
+    ## Single arguments that are only valid on the command line, not in job files.
+    cmdLineSglArgs = ['minimal']
 
-    ## Start Position of write latencies in fio terse output
-    terseLatStartWritePos = 78
+    ## Key value arguments that are only valid on the command line, not in job files.
+    cmdLineKVArgs = ['output-format']
 
-    ## Start Position of read latencies in fio terse output
-    terseLatStartReadPos = 37
+    ## Path of the Fio executable, shared by all jobs.
+    cachedPath = None
 
-    ## Postion of total read throughput.
-    terseTPReadPos = 6
+    ## Version string of the Fio executable, shared by all jobs.
+    cachedVersion = None
 
-    ## Postion of total write throughput.
-    terseTPWritePos = 47
+    ## Lowest Fio version supporting the steady state detection (steadystate, ss_dur, ss_ramp).
+    steadyVersion = [2,99]
 
     def __init__(self):
         ''' The constructor '''
@@ -42,6 +41,12 @@ class FioJob(object):
         self.__fioKVArgs = {}
         ## Single arguments e.g. group_reporting
         self.__fioSglArgs = []
+        ## A FioServer to send the jobs to, None to start Fio locally
+        self.__server = None
+        ## The parsed result of the last parsed Fio output
+        self.__result = None
+        ## The Fio output the cached result has been parsed from
+        self.__resultOut = None
 
     def __str__(self):
         ''' Return a string representation of the fio executable. '''   
@@ -49,16 +54,37 @@ class FioJob(object):
         return res
 
     def initialize(self):
-        ''' Initialize Fio path and version. '''
-        fio = subprocess.Popen(['which', 'fio'],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        stdout = fio.communicate()[0]
-        if fio.returncode != 0:
-            logging.error("# Error: command 'which fio' returned an error code.")
-            raise RuntimeError, "which fio command error"
+        '''
+        Initialize Fio path and version. As every test and preconditioning
+        uses the same Fio, the path and version are only looked up once.
+        '''
+        if FioJob.cachedPath == None:
+            fio = subprocess.Popen(['which', 'fio'],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
+            stdout = fio.communicate()[0]
+            if fio.returncode != 0:
+                logging.error("# Error: command 'which fio' returned an error code.")
+                raise RuntimeError, "which fio command error"
+            path = stdout.rstrip("\n");
+            fio = subprocess.Popen(['fio','--version'],stdout=subprocess.PIPE)
+            FioJob.cachedVersion = fio.communicate()[0]
+            FioJob.cachedPath = path
+        self.__fioPath = FioJob.cachedPath
+        self.__fioVersion = FioJob.cachedVersion
+
+    def getFioPath(self):
+        ''' Return the path of the Fio executable. '''
+        return self.__fioPath
 
-        self.__fioPath = stdout.rstrip("\n");
-        fio = subprocess.Popen(['fio','--version'],stdout=subprocess.PIPE)
-        self.__fioVersion = fio.communicate()[0]
+    def getServer(self):
+        ''' Return the Fio server jobs are sent to, None if Fio is started locally. '''
+        return self.__server
+
+    def setServer(self,server):
+        '''
+        Send all jobs to a running Fio server instead of starting Fio for every job.
+        @param server A FioServer object or None to start Fio locally again.
+        '''
+        self.__server = server
 
     def getFioVersion(self):
         ''' Return the current Fio version string. '''
@@ -68,6 +94,23 @@ class FioJob(object):
         ''' Set the used Fio version (useful if loading from xml). '''
         self.__fioVersion = fioStr
 
+    def getVersionNumbers(self):
+        '''
+        Return the numbers of the Fio version, e.g. [3,28] for fio-3.28.
+        @return A list of integers or None if the version is not known.
+        '''
+        if self.__fioVersion == None:
+            return None
+        match = re.search(r'\d+(\.\d+)*',self.__fioVersion)
+        if match == None:
+            return None
+        return [int(v) for v in match.group().split('.')]
+
+    def hasSteadyState(self):
+        ''' Check if the Fio version supports the steady state detection, cf. steadyVersion. '''
+        version = self.getVersionNumbers()
+        return version != None and version[:2] >= FioJob.steadyVersion
+
     def checkFioVersion(self):
         ''' Check if the Fio version is high enough. '''
         if self.__fioVersion != None:
@@ -121,12 +164,65 @@ class FioJob(object):
         '''
         self.__fioKVArgs[key] = value
         
+    def removeKVArg(self,key):
+        ''' Remove a key value pair from the fio argument list.
+        @param key Name of the option being removed.
+        '''
+        self.__fioKVArgs.pop(key,None)
+
     def addSglArg(self,key):
         ''' Add a single value option to fio argument list.
         @param key Name of the option being added.
         ''' 
         self.__fioSglArgs.append(key)
         
+    def removeSglArg(self,key):
+        ''' Remove a single value option from the fio argument list.
+        @param key Name of the option being removed.
+        '''
+        if key in self.__fioSglArgs:
+            self.__fioSglArgs.remove(key)
+
+    def setOutputFormat(self,fmt):
+        '''
+        Set the output format of Fio. The default is the terse output (--minimal),
+        'json+' additionally reports the completion latency histogram bins.
+        @param fmt 'terse', 'json' or 'json+'.
+        '''
+        if fmt == 'terse':
+            self.__fioKVArgs.pop('output-format',None)
+            if 'minimal' not in self.__fioSglArgs:
+                self.__fioSglArgs.append('minimal')
+        else:
+            self.removeSglArg('minimal')
+            self.__fioKVArgs['output-format'] = fmt
+
+    def isJsonOutput(self):
+        ''' Return True if Fio reports its results as json. '''
+        return self.__fioKVArgs.get('output-format','').startswith('json')
+
+    def readOutputs(self,stream):
+        '''
+        Read the results Fio writes to a stream as soon as they are reported.
+        Terse results are single lines, json results are documents ending with
+        a closing brace on its own line. Other lines, e.g. messages of a Fio
+        server, are skipped.
+        @param stream The stdout of the Fio process.
+        @return A generator of result strings.
+        '''
+        doc = []
+        for line in iter(stream.readline,''):
+            line = line.rstrip('\n')
+            if self.isJsonOutput():
+                if len(doc) == 0 and not line.startswith('{'):
+                    continue
+                doc.append(line)
+                if line == '}':
+                    yield '\n'.join(doc)
+                    doc = []
+            elif line.find(';') > -1:
+                yield line
+
     def prepKVArgs(self):
         ''' Generate an argument list out of the dictionary suited for fio. '''
         argList = [self.__fioPath]
@@ -142,9 +238,15 @@ class FioJob(object):
         
     def start(self):
         ''' Start a Fio job with its argument list.
-        The argument list defines the parameters given to Fio.
+        The argument list defines the parameters given to Fio. If a Fio server
+        is set the job is sent to the server as a job file.
         @return [True,standard output] of the Fio test or [False,0] on error.
         '''
+        if self.__server != None:
+            call,outs = self.startBatch([{}])
+            if call == False:
+                return [False,'']
+            return [True,outs[0]]
         args = self.prepKVArgs()
         args = self.prepSglArgs(args)
         logging.info('%s',args)
@@ -158,86 +260,216 @@ class FioJob(object):
             return [False,'']
         else:
             return [True,stdout]
-        
+
+    def prepJobFile(self,sections):
+        '''
+        Generate a Fio job file out of the current arguments and a list of sections.
+        The key value and single arguments are written to the global section. Every
+        given section waits for the previous one (stonewall) and is reported as its
+        own group, therefore Fio outputs one result per section in the given order.
+        @param sections A list of dictionaries, each one containing the key value
+        arguments of a section.
+        @return The content of the job file as string.
+        '''
+        lines = ['[global]']
+        for k,v in self.__fioKVArgs.iteritems():
+            if k == 'name' or k in FioJob.cmdLineKVArgs:
+                continue
+            lines.append(k + '=' + v)
+        for k in self.__fioSglArgs:
+            if k not in FioJob.cmdLineSglArgs:
+                lines.append(k)
+        name = self.__fioKVArgs.get('name','tkperf')
+        for i,sec in enumerate(sections):
+            lines.append('')
+            lines.append('[' + name + '-' + str(i) + ']')
+            for k,v in sec.iteritems():
+                lines.append(k + '=' + v)
+            lines.append('stonewall')
+            lines.append('new_group')
+        return '\n'.join(lines) + '\n'
+
+    def prepJobFileArgs(self,sections):
+        '''
+        Write a job file for the given sections to a temporary file and generate
+        the Fio argument list to run it. The caller has to remove the file.
+        @param sections A list of dictionaries with key value arguments per section.
+        @return [path of the job file,argument list]
+        '''
+        jobFile = self.prepJobFile(sections)
+        fd,path = tempfile.mkstemp(prefix='tkperf-',suffix='.fio')
+        os.write(fd,jobFile)
+        os.close(fd)
+        args = [self.__fioPath]
+        if self.__server != None:
+            args.append(self.__server.getClientArg())
+        for k in self.__fioSglArgs:
+            if k in FioJob.cmdLineSglArgs:
+                args.append('--' + k)
+        for k,v in self.__fioKVArgs.iteritems():
+            if k in FioJob.cmdLineKVArgs:
+                args.append('--' + k + '=' + v)
+        args.append(path)
+        logging.info('%s',args)
+        logging.info(jobFile)
+        return [path,args]
+
+    def popen(self,args):
+        '''
+        Start Fio, its stdout is read while Fio runs. The stderr is written to
+        a temporary file, a pipe would block Fio if it is not drained.
+        @param args The argument list of Fio.
+        @return [process,stderr file], cf. wait.
+        '''
+        errFile = tempfile.TemporaryFile(prefix='tkperf-',suffix='.err')
+        proc = subprocess.Popen(args,stdout=subprocess.PIPE,stderr=errFile)
+        return [proc,errFile]
+
+    def wait(self,proc,errFile):
+        '''
+        Wait for a Fio process started by popen.
+        @return The stderr of the process.
+        '''
+        proc.wait()
+        errFile.seek(0)
+        stderr = errFile.read()
+        errFile.close()
+        return stderr
+
+    def startBatch(self,sections):
+        '''
+        Start one Fio process running all given sections after each other.
+        Instead of starting Fio for every single test cell, the cells of a round
+        are compiled into one job file, cf. prepJobFile. If a Fio server is set
+        the job file is sent to the server. The results are read line by line
+        as soon as Fio reports them.
+        @param sections A list of dictionaries with key value arguments per section.
+        @return [True,list of outputs] with one terse or json output per section
+        or [False,[]] on error.
+        '''
+        path,args = self.prepJobFileArgs(sections)
+        out,errFile = self.popen(args)
+        outs = []
+        for res in self.readOutputs(out.stdout):
+            #a json document holds the results of all sections
+            if self.isJsonOutput():
+                outs.extend(FioResult.splitJson(res))
+            else:
+                logging.debug("Fio result of section " + str(len(outs)) + ": " + res)
+                outs.append(res)
+        stderr = self.wait(out,errFile)
+        os.remove(path)
+        if stderr != '':
+            logging.error("Fio encountered an error: " + stderr)
+            return [False,[]]
+        if len(outs) != len(sections):
+            logging.error("Fio returned " + str(len(outs)) + " results for " +
+                          str(len(sections)) + " sections.")
+            return [False,[]]
+        return [True,outs]
+
+    def startStream(self,interval,callback):
+        '''
+        Start a Fio job and read its status snapshots while it is running. Fio
+        reports the results of the job every interval seconds. Each snapshot is
+        given to the callback, if the callback returns True the job is stopped
+        early and Fio reports the results up to this point.
+        @param interval Seconds between two status snapshots.
+        @param callback A callable getting the FioResult of every snapshot.
+        @return [True,output of the last snapshot] or [False,''] on error.
+        '''
+        path = None
+        if self.__server != None:
+            path,args = self.prepJobFileArgs([{}])
+        else:
+            args = self.prepKVArgs()
+            args = self.prepSglArgs(args)
+            logging.info('%s',args)
+        args.append('--status-interval=' + str(interval))
+        out,errFile = self.popen(args)
+        last = ''
+        stopped = False
+        for res in self.readOutputs(out.stdout):
+            last = res
+            if not stopped and callback(self.getResult(res)) == True:
+                logging.info("# Stopping Fio job early, the results have converged.")
+                out.send_signal(signal.SIGINT)
+                stopped = True
+        stderr = self.wait(out,errFile)
+        if path != None:
+            os.remove(path)
+        if stderr != '':
+            logging.error("Fio encountered an error: " + stderr)
+            return [False,'']
+        return [True,last]
+
+    def getResult(self,fioOut):
+        '''
+        Return the parsed result of a Fio output. The output is parsed only once,
+        the result is cached on the job until another output is given.
+        @param fioOut The output of the Fio performance test.
+        @return A FioResult object.
+        '''
+        if self.__result == None or self.__resultOut != fioOut:
+            self.__result = FioResult().parse(fioOut)
+            self.__resultOut = fioOut
+        return self.__result
+
     def getIOPS(self,fioOut):
         '''
         Parses the average IOPS out of the Fio result output.
         @param fioOut The output of the Fio performance test.
         @return Sum of read IOPS and write IOPS.
         '''
-        #index 7 iops read
-        #index 48 iops write
-        fioTerse = fioOut.split(';')
-        return int(fioTerse[FioJob.terseIOPSReadPos]) + int(fioTerse[FioJob.terseIOPSWritePos])
-       
+        return self.getResult(fioOut).getIOPS()
+
     def getIOPSRead(self,fioOut):
         '''
         Parses the average read IOPS out of the fio result output.
         @param fioOut The output of the fio performance test.
         @return Read IOPS
         '''
-        #index 7 iops read
-        fioTerse = fioOut.split(';')
-        return int(fioTerse[FioJob.terseIOPSReadPos])
-    
+        return self.getResult(fioOut).readIOPS
+
     def getIOPSWrite(self,fioOut):
         '''
         Parses the average write IOPS out of the Fio result output.
         @param fioOut The output of the Fio performance test.
         @return Write IOPS
         '''
-        #index 48 iops write
-        fioTerse = fioOut.split(';')
-        return int(fioTerse[FioJob.terseIOPSWritePos])
-       
+        return self.getResult(fioOut).writeIOPS
+
     def getTotIOWrite(self,fioOut):
         '''
         Parses the write total IO out of the Fio result output.
         @param fioOut The output of the Fio performance test.
         @return Write total IO in KB.
         '''
-        #index 46 write total IO
-        fioTerse = fioOut.split(';')
-        return int(fioTerse[FioJob.terseTotIOWritePos])
-    
+        return self.getResult(fioOut).writeIO
+
     def getWriteLats(self,fioOut):
         '''
         Parses the write total latencies out of the Fio result output.
         @param fioOut The output of the Fio performance test.
         @return [min,max,mean] total write latencies in microseconds.
         '''
-        #index 78 write total latency
-        fioTerse = fioOut.split(';')
-        return [float(fioTerse[FioJob.terseLatStartWritePos]),
-                float(fioTerse[FioJob.terseLatStartWritePos + 1]),
-                float(fioTerse[FioJob.terseLatStartWritePos + 2])]
-        
+        return self.getResult(fioOut).getWriteLats()
+
     def getReadLats(self,fioOut):
         '''
         Parses the read total latencies out of the Fio result output.
         @param fioOut The output of the Fio performance test.
         @return [min,max,mean] total read latencies in microseconds.
         '''
-        #index 78 write total latency
-        fioTerse = fioOut.split(';')
-        return [float(fioTerse[FioJob.terseLatStartReadPos]),
-                float(fioTerse[FioJob.terseLatStartReadPos + 1]),
-                float(fioTerse[FioJob.terseLatStartReadPos + 2])]
-        
+        return self.getResult(fioOut).getReadLats()
+
     def getTotLats(self,fioOut):
         '''
         Parses the read+write total latencies out of the Fio result output.
         @param fioOut The output of the Fio performance test.
         @return [min,max,mean] total latencies in microseconds.
         '''
-        #index 78 write total latency
-        fioTerse = fioOut.split(';')
-        return [float(fioTerse[FioJob.terseLatStartReadPos]) + 
-                      float(fioTerse[FioJob.terseLatStartWritePos]),
-                float(fioTerse[FioJob.terseLatStartReadPos + 1]) + 
-                      float(fioTerse[FioJob.terseLatStartWritePos + 1]),
-                float(fioTerse[FioJob.terseLatStartReadPos + 2]) + 
-                      float(fioTerse[FioJob.terseLatStartWritePos + 2])]
+        return self.getResult(fioOut).getTotLats()
 
     def getTPRead(self,fioOut):
         '''
@@ -245,16 +477,69 @@ class FioJob(object):
         @param fioOut The output of the Fio performance test.
         @return Read total bandwidth.
         '''
-        #index 6 write total IO
-        fioTerse = fioOut.split(';')
-        return int(fioTerse[FioJob.terseTPReadPos])
-        
+        return self.getResult(fioOut).readBW
+
     def getTPWrite(self,fioOut):
         '''
         Parses the write bandwidth of the Fio result output.
         @param fioOut The output of the Fio performance test.
         @return Write total bandwidth.
         '''
-        #index 47 write total IO
-        fioTerse = fioOut.split(';')
-        return int(fioTerse[FioJob.terseTPWritePos])
\ No newline at end of file
+        return self.getResult(fioOut).writeBW
+
+class Convergence(object):
+    '''
+    A callable checking if the IOPS of a running Fio job have converged, cf.
+    FioJob.startStream. Fio reports the averages since the start of the job in
+    every status snapshot, these running averages flatten by construction. The
+    IOPS of each interval are therefore derived from the increase of the IOs
+    done between two snapshots. The IOPS have converged if the last intervals
+    stay inside the given tolerance around their average.
+    '''
+    ## Number of intervals that must stay inside the tolerance.
+    window = 3
+
+    def __init__(self,tolerance):
+        '''
+        Constructor
+        @param tolerance Allowed excursion of the IOPS from their average in percent.
+        '''
+        ## Allowed excursion in percent
+        self.__tolerance = tolerance
+        ## IOPS of the intervals between the status snapshots
+        self.__iops = []
+        ## [IOs done,runtime in ms] of the last snapshot
+        self.__last = [0,0]
+
+    def getIOPS(self): return self.__iops
+
+    @staticmethod
+    def getProgress(result):
+        '''
+        Return the progress of a job up to a status snapshot.
+        @param result The FioResult of the snapshot.
+        @return [IOs done,runtime in ms] since the start of the job.
+        '''
+        ios = (result.readIOPS * result.readRuntime + result.writeIOPS * result.writeRuntime) / 1000.0
+        return [ios,max(result.readRuntime,result.writeRuntime)]
+
+    def __call__(self,result):
+        '''
+        Add a status snapshot and check if the IOPS have converged.
+        @param result The FioResult of the snapshot.
+        @return True if the IOPS have converged, False if not.
+        '''
+        ios,runtime = Convergence.getProgress(result)
+        lastIos,lastRuntime = self.__last
+        self.__last = [ios,runtime]
+        if runtime <= lastRuntime:
+            return False
+        self.__iops.append((ios - lastIos) * 1000.0 / (runtime - lastRuntime))
+        logging.info("# Live IOPS: " + str(self.__iops[-1]))
+        if len(self.__iops) < Convergence.window:
+            return False
+        win = self.__iops[-Convergence.window:]
+        avg = sum(win) / float(len(win))
+        if avg == 0:
+            return False
+        return (max(win) - min(win)) <= avg * self.__tolerance / 100.0
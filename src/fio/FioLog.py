@@ -0,0 +1,88 @@
+''' @package FioLog
+A module reading fio's per interval IOPS, bandwidth and latency logs, as written
+with write_iops_log, write_bw_log and write_lat_log.
+'''
+import glob
+import re
+
+## Data direction of write samples in a fio log.
+ddirWrite = 1
+
+def logFiles(prefix,kind):
+    '''
+    Return the log files fio has written for a prefix, one file per job.
+    @param prefix The prefix given to fio, e.g. write_iops_log=prefix.
+    @param kind The kind of the log, e.g. 'iops', 'bw' or 'lat'.
+    @return A sorted list of paths.
+    '''
+    #newer fio versions add the job number to the file name
+    paths = glob.glob(prefix + '_' + kind + '.*.log')
+    paths += glob.glob(prefix + '_' + kind + '.log')
+    return sorted(paths)
+
+def latDivisor(fioVersion):
+    '''
+    Return the divisor to get microseconds from the latencies of a fio log,
+    fio 3 logs latencies in nanoseconds, older versions in microseconds.
+    @param fioVersion The fio version string, e.g. 'fio-3.1'.
+    '''
+    match = re.search(r'\d+',fioVersion or '')
+    if match != None and int(match.group()) >= 3:
+        return 1000.0
+    return 1.0
+
+def readLog(path):
+    '''
+    Read the samples of a fio log line by line.
+    @param path The path of the log file.
+    @return A generator of (time in ms,value,data direction) tuples.
+    '''
+    f = open(path,'r')
+    try:
+        for line in f:
+            fields = line.split(',')
+            if len(fields) < 3:
+                continue
+            yield (int(fields[0]),float(fields[1]),int(fields[2]))
+    finally:
+        f.close()
+
+def readSamples(paths,combine='sum',divisor=1.0,ddir=ddirWrite):
+    '''
+    Merge the per second samples of the logs of multiple jobs, e.g. numjobs > 1.
+    @param paths The log files, cf. logFiles.
+    @param combine 'sum' to add the values of the jobs (IOPS, bandwidth), 'mean'
+    to average them (latencies).
+    @param divisor Divide every value by it, e.g. to convert units.
+    @param ddir The data direction of the samples to read.
+    @return A list of (second,value) tuples sorted by second, starting at 0.
+    '''
+    sums = {}
+    counts = {}
+    for path in paths:
+        for msec,value,d in readLog(path):
+            if d != ddir:
+                continue
+            #a sample logged at 1000ms holds the values of second 0
+            sec = max(msec - 1,0) // 1000
+            sums[sec] = sums.get(sec,0) + value / divisor
+            counts[sec] = counts.get(sec,0) + 1
+    if combine == 'mean':
+        return [(sec,sums[sec] / counts[sec]) for sec in sorted(sums)]
+    return [(sec,sums[sec]) for sec in sorted(sums)]
+
+def downsample(samples,period=60):
+    '''
+    Downsample per second samples to periods, e.g. to rounds of one minute.
+    @param samples A sorted list of (second,value) tuples, cf. readSamples.
+    @param period The length of a period in seconds.
+    @return A list of [min,max,mean] of the samples per period. Periods without
+    samples, e.g. if fio stalled, hold zeros.
+    '''
+    periods = []
+    for sec,value in samples:
+        idx = sec // period
+        while len(periods) <= idx:
+            periods.append([])
+        periods[idx].append(value)
+    return [[min(p),max(p),sum(p) / len(p)] if len(p) > 0 else [0,0,0] for p in periods]
@@ -0,0 +1,271 @@
+''' @package FioResult
+A module holding the parsed result of a fio job run.
+'''
+import json
+
+from fio.LatHistogram import LatHistogram
+
+class FioResult(object):
+    '''
+    A compact record of the values of one fio result. The output of fio is
+    parsed once, either as terse (--minimal) or as json output. All latencies
+    are stored in microseconds, bandwidths in KB/s and IO sizes in KB.
+    '''
+    __slots__ = ['readIO','readBW','readIOPS','readRuntime',
+                 'readSlat','readClat','readLat','readPct','readHist',
+                 'writeIO','writeBW','writeIOPS','writeRuntime',
+                 'writeSlat','writeClat','writeLat','writePct','writeHist',
+                 'usrCpu','sysCpu','ctx','diskUtil']
+
+    ## Version of the terse output format that can be parsed.
+    terseVersion = '3'
+
+    ## Start position of the read values in the fio terse output.
+    terseReadPos = 5
+
+    ## Start position of the write values in the fio terse output.
+    terseWritePos = 46
+
+    ## Position of the user cpu usage in the fio terse output.
+    terseCpuPos = 87
+
+    ## Position of the disk utilization in the fio terse output.
+    terseUtilPos = 129
+
+    ## Number of completion latency percentiles in the fio terse output.
+    tersePctCount = 20
+
+    def __init__(self):
+        ''' The constructor '''
+        for k in FioResult.__slots__:
+            setattr(self,k,0)
+        for k in ['readSlat','readClat','readLat','writeSlat','writeClat','writeLat']:
+            #[min,max,mean,stdev]
+            setattr(self,k,[0.0,0.0,0.0,0.0])
+        #completion latency percentile -> latency
+        self.readPct = {}
+        self.writePct = {}
+        #completion latency histograms, only reported by json+
+        self.readHist = None
+        self.writeHist = None
+        self.diskUtil = None
+
+    def getIOPS(self):
+        ''' Return the sum of read and write IOPS. '''
+        return self.readIOPS + self.writeIOPS
+
+    def getReadLats(self):
+        ''' Return [min,max,mean] total read latencies in microseconds. '''
+        return self.readLat[0:3]
+
+    def getWriteLats(self):
+        ''' Return [min,max,mean] total write latencies in microseconds. '''
+        return self.writeLat[0:3]
+
+    def getMeanLat(self):
+        ''' Return the mean total latency of both directions, weighted by their IOPS. '''
+        iops = self.readIOPS + self.writeIOPS
+        if iops == 0:
+            return 0.0
+        return (self.readLat[2] * self.readIOPS + self.writeLat[2] * self.writeIOPS) / float(iops)
+
+    def getTotLats(self):
+        ''' Return the sum of read and write [min,max,mean] total latencies. '''
+        return [self.readLat[i] + self.writeLat[i] for i in range(3)]
+
+    def getClatHist(self,read=True,write=True):
+        '''
+        Return the completion latency histogram of one or both directions, the
+        histograms of both directions are merged for a mixed workload.
+        @param read Include the read direction.
+        @param write Include the write direction.
+        @return A LatHistogram object or None if fio reported no histogram.
+        '''
+        hists = []
+        if read and self.readIO > 0:
+            hists.append(self.readHist)
+        if write and self.writeIO > 0:
+            hists.append(self.writeHist)
+        if len(hists) == 0 or None in hists:
+            return None
+        return LatHistogram.mergeAll(hists)
+
+    def getClatPcts(self,pcts,read=True,write=True):
+        '''
+        Return completion latency percentiles of one or both directions. If fio
+        reported the histograms (json+) the percentiles are taken from the
+        merged histogram and are exact for the mixed workload. Else the
+        percentiles reported by fio are used, for a mixed workload the larger
+        one of both directions as an upper bound.
+        @param pcts A list of percentiles, e.g. [50.0,99.0].
+        @param read Include the read direction.
+        @param write Include the write direction.
+        @return A list of latencies in microseconds, one per percentile.
+        '''
+        hist = self.getClatHist(read,write)
+        if hist != None:
+            return hist.percentiles(pcts)
+        dirs = []
+        if read and self.readIO > 0:
+            dirs.append(self.readPct)
+        if write and self.writeIO > 0:
+            dirs.append(self.writePct)
+        if len(dirs) == 0:
+            return [0.0] * len(pcts)
+        return [max(FioResult.nearestPct(pct,p) for pct in dirs) for p in pcts]
+
+    @staticmethod
+    def nearestPct(pct,p):
+        '''
+        Return the latency of a reported percentile, if fio did not report the
+        percentile the next higher reported one is taken.
+        @param pct A dictionary of percentile -> latency.
+        @param p The percentile.
+        '''
+        if len(pct) == 0:
+            return 0.0
+        higher = [k for k in pct if k >= p]
+        if len(higher) == 0:
+            return pct[max(pct)]
+        return pct[min(higher)]
+
+    def toDict(self):
+        ''' Return the record as a dictionary, e.g. to dump it to json. '''
+        d = dict((k,getattr(self,k)) for k in FioResult.__slots__)
+        for k in ['readHist','writeHist']:
+            if d[k] != None:
+                d[k] = d[k].encode()
+        return d
+
+    def parse(self,fioOut):
+        '''
+        Parse the output of fio, the format is detected automatically.
+        @param fioOut The terse or json output of a fio job.
+        @return The record itself.
+        @exception ValueError if the output cannot be parsed.
+        '''
+        out = fioOut.strip()
+        if out.startswith('{'):
+            return self.parseJson(out)
+        return self.parseTerse(out)
+
+    def parseTerse(self,fioOut):
+        '''
+        Parse the terse (--minimal) output of one fio group.
+        @param fioOut The terse output line.
+        @return The record itself.
+        @exception ValueError if the terse version is not supported.
+        '''
+        terse = fioOut.strip().split(';')
+        if terse[0] != FioResult.terseVersion:
+            raise ValueError("unsupported fio terse version " + terse[0])
+        for prefix,pos in [('read',FioResult.terseReadPos),('write',FioResult.terseWritePos)]:
+            setattr(self,prefix + 'IO',int(terse[pos]))
+            setattr(self,prefix + 'BW',int(terse[pos + 1]))
+            setattr(self,prefix + 'IOPS',int(float(terse[pos + 2])))
+            setattr(self,prefix + 'Runtime',int(terse[pos + 3]))
+            setattr(self,prefix + 'Slat',[float(v) for v in terse[pos + 4:pos + 8]])
+            setattr(self,prefix + 'Clat',[float(v) for v in terse[pos + 8:pos + 12]])
+            pct = {}
+            for p in terse[pos + 12:pos + 12 + FioResult.tersePctCount]:
+                if p.find('=') > -1:
+                    k,v = p.split('=')
+                    pct[float(k.rstrip('%'))] = float(v)
+            setattr(self,prefix + 'Pct',pct)
+            latPos = pos + 12 + FioResult.tersePctCount
+            setattr(self,prefix + 'Lat',[float(v) for v in terse[latPos:latPos + 4]])
+        self.usrCpu = float(terse[FioResult.terseCpuPos].rstrip('%'))
+        self.sysCpu = float(terse[FioResult.terseCpuPos + 1].rstrip('%'))
+        self.ctx = int(terse[FioResult.terseCpuPos + 2])
+        if len(terse) > FioResult.terseUtilPos:
+            self.diskUtil = float(terse[FioResult.terseUtilPos].rstrip('%'))
+        return self
+
+    def parseJson(self,fioOut):
+        '''
+        Parse the json output of fio, the first job or group is taken.
+        @param fioOut The json output of fio.
+        @return The record itself.
+        '''
+        decoded = json.loads(fioOut)
+        self.parseJsonJob(FioResult.getJsonJobs(decoded)[0])
+        if 'disk_util' in decoded and len(decoded['disk_util']) > 0:
+            self.diskUtil = float(decoded['disk_util'][0]['util'])
+        return self
+
+    def parseJsonJob(self,job):
+        '''
+        Parse a single job (or group) of the fio json output.
+        @param job The decoded json object of the job.
+        @return The record itself.
+        '''
+        for prefix in ['read','write']:
+            d = job[prefix]
+            if 'io_kbytes' in d:
+                setattr(self,prefix + 'IO',int(d['io_kbytes']))
+            else:
+                setattr(self,prefix + 'IO',int(d['io_bytes']) // 1024)
+            setattr(self,prefix + 'BW',int(d['bw']))
+            setattr(self,prefix + 'IOPS',int(d['iops']))
+            setattr(self,prefix + 'Runtime',int(d['runtime']))
+            for name,key in [('Slat','slat'),('Clat','clat'),('Lat','lat')]:
+                stat,scale = FioResult.getJsonLat(d,key)
+                if stat == None:
+                    continue
+                setattr(self,prefix + name,[stat['min'] / scale,stat['max'] / scale,
+                                            stat['mean'] / scale,stat['stddev'] / scale])
+                if key == 'clat' and 'percentile' in stat:
+                    pct = {}
+                    for k,v in stat['percentile'].iteritems():
+                        pct[float(k)] = v / scale
+                    setattr(self,prefix + 'Pct',pct)
+                #old fio versions report bin indices instead of latencies
+                if key == 'clat' and 'bins' in stat and 'FIO_IO_U_PLAT_NR' not in stat['bins']:
+                    bins = dict((int(k) / scale,int(v)) for k,v in stat['bins'].iteritems())
+                    setattr(self,prefix + 'Hist',LatHistogram.fromBins(bins))
+        self.usrCpu = float(job['usr_cpu'])
+        self.sysCpu = float(job['sys_cpu'])
+        self.ctx = int(job['ctx'])
+        return self
+
+    @staticmethod
+    def getJsonJobs(decoded):
+        '''
+        Return the jobs (or groups) of a decoded fio json output. If the jobs
+        ran on a fio server they are reported as client stats.
+        @param decoded The decoded json output.
+        '''
+        if 'jobs' in decoded:
+            return decoded['jobs']
+        return decoded['client_stats']
+
+    @staticmethod
+    def splitJson(fioOut):
+        '''
+        Split the json output of a job file into one json output per job, as
+        fio reports all jobs in one document.
+        @param fioOut The json output of fio.
+        @return A list of json outputs in the order of the jobs.
+        '''
+        decoded = json.loads(fioOut)
+        outs = []
+        for job in FioResult.getJsonJobs(decoded):
+            if job.get('jobname') == 'All clients':
+                continue
+            outs.append(json.dumps({'jobs':[job]}))
+        return outs
+
+    @staticmethod
+    def getJsonLat(d,key):
+        '''
+        Return a latency object of a fio json read or write object. Newer fio
+        versions report nanoseconds ('clat_ns'), older ones microseconds ('clat').
+        @param d The read or write object.
+        @param key The latency name, e.g. 'clat'.
+        @return [latency object,divisor to get microseconds] or [None,1].
+        '''
+        if key + '_ns' in d:
+            return [d[key + '_ns'],1000.0]
+        if key in d:
+            return [d[key],1.0]
+        return [None,1]
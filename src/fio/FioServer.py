@@ -0,0 +1,109 @@
+''' @package FioServer
+A module realizing a persistent fio server backend.
+'''
+import subprocess
+import logging
+import os
+import tempfile
+from time import sleep
+
+class FioServer(object):
+    '''
+    A class starting and stopping a fio server process. Fio jobs are sent to the
+    server via 'fio --client', cf. FioJob.setServer.
+    '''
+    ## Seconds to wait for a local server socket to appear.
+    startTimeout = 10
+
+    def __init__(self,name,host=None,port=8765):
+        '''
+        Constructor
+        @param name Name of the server, used for the local socket file.
+        @param host A remote host already running 'fio --server', if None a
+        local server is started listening on a unix socket.
+        @param port The port of the remote fio server.
+        '''
+        ## The name of the server, e.g. the test name
+        self.__name = name
+        ## The remote host, None for a local server
+        self.__host = host
+        ## Port of the remote fio server
+        self.__port = port
+        ## Path of the unix socket of a local server
+        self.__sock = None
+        ## The process object of a local server
+        self.__proc = None
+        ## Path of the log file the stderr of a local server is written to
+        self.__log = None
+
+    def getHost(self): return self.__host
+    def getSock(self): return self.__sock
+    def getLog(self): return self.__log
+
+    def getAddress(self):
+        '''
+        Return the address of the server as understood by fio.
+        @return A string like 'sock:/tmp/tkperf-name.sock' or 'host,port'.
+        '''
+        if self.__host != None:
+            return self.__host + ',' + str(self.__port)
+        return 'sock:' + self.__sock
+
+    def getClientArg(self):
+        ''' Return the fio command line argument to send jobs to the server. '''
+        return '--client=' + self.getAddress()
+
+    def isRunning(self):
+        '''
+        Check if the server is usable.
+        @return True if a remote host is set or the local server is running.
+        '''
+        if self.__host != None:
+            return True
+        return self.__proc != None and self.__proc.poll() == None
+
+    def start(self,fioPath):
+        '''
+        Start a local fio server listening on a unix socket. For a remote host
+        nothing is started, the server has to be running already.
+        @param fioPath The path of the fio executable.
+        @exception RuntimeError if the server could not be started.
+        '''
+        if self.__host != None or self.isRunning():
+            return
+        self.__sock = os.path.join(tempfile.gettempdir(),
+                                   'tkperf-' + os.path.basename(self.__name) + '.sock')
+        if os.path.exists(self.__sock):
+            os.remove(self.__sock)
+        #the stderr is written to a log file, a pipe would block the server if not drained
+        self.__log = os.path.splitext(self.__sock)[0] + '.log'
+        args = [fioPath,'--server=sock:' + self.__sock]
+        logging.info("# Starting fio server: " + ' '.join(args) + ", log: " + self.__log)
+        devnull = open(os.devnull,'w')
+        log = open(self.__log,'w')
+        self.__proc = subprocess.Popen(args,stdout=devnull,stderr=log)
+        devnull.close()
+        log.close()
+        waited = 0
+        while not os.path.exists(self.__sock):
+            if self.__proc.poll() != None or waited >= FioServer.startTimeout * 10:
+                log = open(self.__log,'r')
+                logging.error("# Error: fio server could not be started: " + log.read())
+                log.close()
+                self.__proc = None
+                raise RuntimeError, "fio server start error"
+            sleep(0.1)
+            waited += 1
+        logging.info("# fio server is listening on " + self.__sock)
+
+    def stop(self):
+        ''' Stop a local fio server and remove its socket. '''
+        if self.__proc == None:
+            return
+        logging.info("# Stopping fio server on " + self.__sock)
+        if self.__proc.poll() == None:
+            self.__proc.terminate()
+        self.__proc.wait()
+        self.__proc = None
+        if os.path.exists(self.__sock):
+            os.remove(self.__sock)
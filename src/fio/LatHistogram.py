@@ -0,0 +1,206 @@
+''' @package LatHistogram
+A module holding a compact latency histogram with log-linear buckets, that can
+be merged over rounds, jobs and devices.
+'''
+import base64
+import zlib
+
+class LatHistogram(object):
+    '''
+    A latency histogram in the style of HdrHistogram. Latencies are recorded
+    in nanoseconds, every power of two is divided into 2^subBits linear sub
+    buckets. Values below 2^(subBits+1) ns are recorded exactly, larger values
+    with a relative error of at most 2^-subBits. The counts are kept in a list
+    indexed by bucket, histograms with the same subBits are merged by adding
+    the counts. Latencies given to and returned by the histogram are in
+    microseconds, like all latencies of a FioResult.
+    '''
+
+    ## Default number of bits of the linear sub buckets, about 3% precision.
+    defSubBits = 5
+
+    def __init__(self,subBits=None):
+        '''
+        Constructor
+        @param subBits The number of bits of the linear sub buckets.
+        '''
+        if subBits == None:
+            subBits = LatHistogram.defSubBits
+        ## Number of bits of the linear sub buckets
+        self.__subBits = subBits
+        ## Number of sub buckets per power of two
+        self.__subCount = 1 << subBits
+        ## Number of recorded latencies per bucket
+        self.__counts = []
+        ## Total number of recorded latencies
+        self.__total = 0
+
+    def getSubBits(self): return self.__subBits
+    def getCounts(self): return self.__counts
+    def getTotal(self): return self.__total
+
+    def index(self,ns):
+        '''
+        Return the bucket index of a latency.
+        @param ns The latency in nanoseconds.
+        '''
+        ns = max(int(ns),0)
+        exp = max(ns.bit_length() - self.__subBits - 1,0)
+        return self.__subCount * exp + (ns >> exp)
+
+    def bucketRange(self,idx):
+        '''
+        Return the latencies a bucket holds.
+        @param idx The bucket index.
+        @return [lowest,highest] latency of the bucket in nanoseconds.
+        '''
+        exp = max(idx // self.__subCount - 1,0)
+        sub = idx - self.__subCount * exp
+        return [sub << exp,((sub + 1) << exp) - 1]
+
+    def record(self,lat,count=1):
+        '''
+        Record a latency.
+        @param lat The latency in microseconds.
+        @param count The number of IOs with this latency.
+        '''
+        self.addBucket(self.index(round(lat * 1000)),count)
+
+    def merge(self,other):
+        '''
+        Add the counts of another histogram.
+        @param other A LatHistogram with the same number of sub bucket bits.
+        @return The histogram itself.
+        @exception ValueError if the bucket layouts differ.
+        '''
+        if other.getSubBits() != self.__subBits:
+            raise ValueError("cannot merge histograms with different sub buckets")
+        counts = other.getCounts()
+        if len(counts) > len(self.__counts):
+            self.__counts.extend([0] * (len(counts) - len(self.__counts)))
+        for i,c in enumerate(counts):
+            self.__counts[i] += c
+        self.__total += other.getTotal()
+        return self
+
+    def percentile(self,p):
+        '''
+        Return the latency below or equal to which p percent of the IOs are.
+        @param p The percentile, e.g. 99.9.
+        @return The highest latency of the bucket in microseconds, 0 if empty.
+        '''
+        if self.__total == 0:
+            return 0.0
+        limit = self.__total * p / 100.0
+        count = 0
+        for i,c in enumerate(self.__counts):
+            count += c
+            if c > 0 and count >= limit:
+                return self.bucketRange(i)[1] / 1000.0
+        return self.getMax()
+
+    def percentiles(self,pcts):
+        ''' Return a list of latencies in microseconds, one per percentile. '''
+        return [self.percentile(p) for p in pcts]
+
+    def getMax(self):
+        ''' Return the highest latency of the highest filled bucket in microseconds. '''
+        for i in range(len(self.__counts) - 1,-1,-1):
+            if self.__counts[i] > 0:
+                return self.bucketRange(i)[1] / 1000.0
+        return 0.0
+
+    def getMean(self):
+        ''' Return the mean latency in microseconds, taking the bucket middles. '''
+        if self.__total == 0:
+            return 0.0
+        s = 0.0
+        for i,c in enumerate(self.__counts):
+            if c > 0:
+                low,high = self.bucketRange(i)
+                s += c * (low + high) / 2.0
+        return s / self.__total / 1000.0
+
+    def encode(self):
+        '''
+        Return a compact string of the histogram, e.g. to store it in xml. The
+        filled buckets are written as varints of the index gap and the count,
+        compressed and base64 encoded.
+        '''
+        data = bytearray()
+        last = -1
+        for i,c in enumerate(self.__counts):
+            if c == 0:
+                continue
+            for v in [i - last,c]:
+                while v >= 0x80:
+                    data.append((v & 0x7f) | 0x80)
+                    v >>= 7
+                data.append(v)
+            last = i
+        return str(self.__subBits) + ':' + base64.b64encode(zlib.compress(str(data)))
+
+    @staticmethod
+    def decode(enc):
+        '''
+        Create a histogram from its compact string, cf. encode.
+        @param enc The encoded histogram.
+        @return A LatHistogram object.
+        @exception ValueError if the string is no encoded histogram.
+        '''
+        try:
+            subBits,payload = enc.split(':',1)
+            data = bytearray(zlib.decompress(base64.b64decode(payload)))
+            hist = LatHistogram(int(subBits))
+        except (TypeError,zlib.error),e:
+            raise ValueError("invalid encoded histogram: " + str(e))
+        values = []
+        v = 0
+        shift = 0
+        for b in data:
+            v |= (b & 0x7f) << shift
+            shift += 7
+            if b < 0x80:
+                values.append(v)
+                v = 0
+                shift = 0
+        idx = -1
+        for n in range(0,len(values) - 1,2):
+            idx += values[n]
+            hist.addBucket(idx,values[n + 1])
+        return hist
+
+    def addBucket(self,idx,count):
+        '''
+        Add to the count of a bucket, e.g. when decoding.
+        @param idx The bucket index.
+        @param count The number of IOs.
+        '''
+        if idx >= len(self.__counts):
+            self.__counts.extend([0] * (idx + 1 - len(self.__counts)))
+        self.__counts[idx] += count
+        self.__total += count
+
+    @staticmethod
+    def fromBins(bins,subBits=None):
+        '''
+        Create a histogram from the latency bins of fio's json+ output.
+        @param bins A dictionary of latency in microseconds -> number of IOs.
+        @return A LatHistogram object.
+        '''
+        hist = LatHistogram(subBits)
+        for lat,count in bins.iteritems():
+            hist.record(lat,count)
+        return hist
+
+    @staticmethod
+    def mergeAll(hists):
+        '''
+        Merge a list of histograms, e.g. of the rounds of a measurement window.
+        @param hists A non empty list of LatHistogram objects.
+        @return A new LatHistogram object.
+        '''
+        merged = LatHistogram(hists[0].getSubBits())
+        for h in hists:
+            merged.merge(h)
+        return merged
@@ -5,14 +5,23 @@ Created on Aug 25, 2014
 '''
 
 from abc import ABCMeta, abstractmethod
+import copy
 import logging
 from collections import deque
 from lxml import etree
 import json
+import numpy as np
 
 from perfTest.StdyState import StdyState
-from perfTest.Options import Options
+from perfTest.RoundStore import RoundStore
+import perfTest.MsmtTables as mt
+import perfTest.StdyCriteria as sc
 from fio.FioJob import FioJob
+from fio.FioJob import Convergence
+import fio.FioLog as fl
+from fio.LatHistogram import LatHistogram
+from system.Telemetry import Telemetry
+import system.SmartProbe as sp
 
 class DeviceTest(object):
     '''
@@ -20,11 +29,28 @@ class DeviceTest(object):
     '''
     __metaclass__ = ABCMeta
 
-    def __init__(self,testname,device,options=None):
+    ## Seconds between two fio status snapshots if cells can be stopped early.
+    statusInterval = 5
+    ## Metric used by fio's steady state detection.
+    ssMetric = 'iops'
+    ## Let fio's steady state detection end a cell early, only for tests whose rounds run until the steady state.
+    fioSteady = False
+    ## Default labels of block sizes, None if the test has no block sizes.
+    bsLabels = None
+    ## Default percentages of mixed workloads, None if the test has no mixed workloads.
+    mixWlds = None
+    ## Default number of rounds, None if the rounds are limited by the steady state.
+    maxRnds = None
+    ## Read the completion latency histograms from fio's json+ output.
+    jsonPlus = False
+
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Constructor
         @param testname Name of the test, specifies the output file
         @param device The tested device, a device object
+        @param options User defined options
+        @param plan The settings of the test from a TestPlan, None for the defaults
         '''
         ## The name of the test, is used to give the resulting files a name
         self.__testname = testname
@@ -36,15 +62,98 @@ class DeviceTest(object):
         self.__fioJob = FioJob()
         ## A list of filenames representing the generated plots
         self.__figures = []
-        ## Measurement overview tables, from which plots are generated
-        self.__tables = []
+        ## Measurement overview tables per statistic, from which plots are generated
+        self.__tables = None
+        ## Per call of runCells a list stating which cells ended before their runtime
+        self.__cellConv = []
+        ## Journal completed rounds are written to, None if not journaled
+        self.__journal = None
+        ## Key of the test in the journal
+        self.__journalKey = None
+        ## Journaled rounds that have not yet been restored
+        self.__pending = deque([])
+        ## Settings of the test plan overriding the class defaults
+        self.__plan = {} if plan == None else plan
+        ## Samples host and device statistics while fio runs, None if disabled
+        self.__telemetry = None
+        ## Per fio run a telemetry summary
+        self.__telemetrySums = []
+        ## Takes SMART snapshots before and after every round, None if disabled
+        self.__probe = None
+        ## Thermal note of the last round, cf. SmartProbe.compare
+        self.__thermalNote = None
+        ## If the last round has been restored from the journal
+        self.__restored = False
+        ## Write amplification and endurance of the test, cf. SmartProbe.endurance
+        self.__wear = None
 
     def getTestname(self): return self.__testname
     def getDevice(self): return self.__device
     def getOptions(self): return self.__options
+    def getPlan(self): return self.__plan
+    def getBsLabels(self): return self.__plan.get('bs',self.bsLabels)
+    def getMixWlds(self): return self.__plan.get('mix',self.mixWlds)
+    def getMaxRnds(self): return self.__plan.get('rounds',self.maxRnds)
     def getFioJob(self): return self.__fioJob
     def getFigures(self): return self.__figures
-    def getTables(self): return self.__tables
+    def getCellConv(self): return self.__cellConv
+    def getJournal(self): return self.__journal
+    def getTelemetrySums(self): return self.__telemetrySums
+    def getProbe(self): return self.__probe
+    def getThermalNote(self): return self.__thermalNote
+    def getWear(self): return self.__wear
+
+    def setProbe(self,probe): self.__probe = probe
+
+    def setJournal(self,journal,key):
+        '''
+        Set the journal completed rounds are written to. Rounds already in
+        the journal are restored instead of being carried out again.
+        @param journal A Journal object.
+        @param key The key of the test in the journal, e.g. 'iops'.
+        '''
+        self.__journal = journal
+        self.__journalKey = key
+        self.__pending = deque(journal.getRecords(key))
+
+    def hasProgress(self):
+        ''' Check if rounds of the test have been journaled by a previous run. '''
+        if self.__journal == None:
+            return False
+        return len(self.__journal.getRecords(self.__journalKey)) > 0
+
+    def isRestoring(self):
+        ''' Check if the next round is restored from the journal. '''
+        return len(self.__pending) > 0
+
+    def isRestored(self):
+        ''' Check if the last round has been restored from the journal. '''
+        return self.__restored
+
+    def getRuntime(self):
+        ''' Return the maximum runtime of a test cell in seconds. '''
+        if 'runtime' in self.__plan:
+            return self.__plan['runtime']
+        if self.__options == None or self.__options.getRuntime() == None:
+            return 60
+        return self.__options.getRuntime()
+
+    def getDetectionCell(self):
+        '''
+        Return the index of the 0/100% r/w 4k cell, used for steady state
+        detection, in a flattened round matrix.
+        '''
+        return self.getMixWlds().index(0) * len(self.getBsLabels()) + self.getBsLabels().index('4k')
+
+    def isStopEarly(self):
+        ''' Check if test cells can end before their runtime. '''
+        if self.__options == None:
+            return False
+        return self.isFioSteady() or self.__options.getEarlyStop() != None
+
+    def isFioSteady(self):
+        ''' Check if fio's steady state detection ends the cells of the test, cf. fioSteady. '''
+        return self.fioSteady and self.__options != None and self.__options.getFioSteady() == True
 
     def setFigures(self,fig):
         '''
@@ -59,17 +168,76 @@ class DeviceTest(object):
         '''
         self.__figures.append(fig)
 
-    def addTable(self,tb):
-        ''' Add an overview measurement table.
-        @param tb The table to add
+    def getTables(self):
+        '''
+        Return the measurement overview tables of the measurement window. The
+        tables are calculated once, cf. calcTables.
+        @return A dictionary of tables keyed by statistic, e.g. 'mean' or 'p99'.
+        '''
+        if self.__tables == None:
+            self.__tables = self.calcTables()
+        return self.__tables
+
+    def getTable(self,stat='mean'):
+        '''
+        Return one measurement overview table.
+        @param stat The statistic of the table, cf. MsmtTables.stats.
+        @return An array, rows are the workloads and columns the block sizes.
+        '''
+        return self.getTables()[stat]
+
+    def resetTables(self):
+        ''' Drop the calculated tables, e.g. if the round results changed. '''
+        self.__tables = None
+
+    def calcTables(self):
+        '''
+        Calculate the measurement overview tables of the test. Tests without a
+        measurement window, e.g. write saturation, have no tables.
+        @return A dictionary of tables keyed by statistic, empty for the base test.
+        '''
+        return {}
+
+    def newStdyState(self):
+        '''
+        Create a steady state object with the criterion, measurement window
+        and max number of rounds of the options.
+        @return A StdyState object.
         '''
-        self.__tables.append(tb)
+        name = window = rnds = None
+        abort = exclThrottled = False
+        if self.__options != None:
+            name = self.__options.getStdyCrit()
+            window = self.__options.getStdyWindow()
+            rnds = self.__options.getStdyRnds()
+            abort = self.__options.getStdyAbort()
+            exclThrottled = self.__options.getExclThrottled()
+        #the test plan overrides the options
+        stdy = self.__plan.get('stdy',{})
+        name = stdy.get('criterion',name)
+        window = stdy.get('window',window)
+        rnds = self.__plan.get('rounds',rnds)
+        crit = None
+        if name != None:
+            crit = sc.getCriterion(name,window)
+        elif window != None:
+            crit = sc.SniaCriterion(window)
+        return StdyState(crit,rnds,abort,exclThrottled)
 
     def initialize(self):
         ''' Initialize Device and FioJob to setup params. '''
         self.getDevice().initialize()
         self.initFio()
         self.__fioJob.checkFioVersion()
+        if self.__options != None and self.__options.getTelemetry():
+            self.__telemetry = Telemetry(self.__device.getDevPath())
+        if self.__options != None and self.__options.getSmartProbe() != None and self.__probe == None:
+            try:
+                self.__probe = sp.getProbe(self.__options.getSmartProbe(),self.__device.getDevPath(),
+                                           self.__device.getIntfce())
+            except ValueError,e:
+                logging.error("# " + str(e))
+                raise RuntimeError, "invalid SMART probe"
 
     def initFio(self):
         '''
@@ -97,7 +265,254 @@ class DeviceTest(object):
             if self.getOptions().getXargs() != None:
                 for arg in self.getOptions().getXargs():
                     self.__fioJob.addSglArg(arg)
+            if self.isFioSteady():
+                if not self.__fioJob.hasSteadyState():
+                    logging.error("# Error: fio's steady state detection needs fio >= 2.99, found " +
+                                  str(self.__fioJob.getFioVersion()))
+                    raise RuntimeError, "fio version to old for steady state error"
+                ssArgs = StdyState.getFioArgs(self.ssMetric,self.getRuntime())
+                for k,v in ssArgs.iteritems():
+                    self.__fioJob.addKVArg(k,v)
+        if 'runtime' in self.__plan:
+            self.__fioJob.addKVArg("runtime",str(self.__plan['runtime']))
+        if 'ramp' in self.__plan:
+            self.__fioJob.addKVArg("ramp_time",str(self.__plan['ramp']))
         self.__fioJob.addSglArg("group_reporting")
+        #fio 3 reports the histogram bins as latencies in nanoseconds
+        if self.jsonPlus and fl.latDivisor(self.__fioJob.getFioVersion()) > 1:
+            self.__fioJob.setOutputFormat('json+')
+
+    def startTelemetry(self):
+        ''' Start sampling host and device statistics before fio is started, if enabled. '''
+        if self.__telemetry != None:
+            self.__telemetry.start()
+
+    def stopTelemetry(self,outs):
+        '''
+        Stop sampling after fio has finished and keep the summary of the run.
+        The cpu usage of the fio jobs is added to the summary, alerts are logged.
+        @param outs The fio outputs of the run.
+        '''
+        if self.__telemetry == None:
+            return
+        summary = self.__telemetry.stop()
+        cpus = [self.__fioJob.getResult(out) for out in outs]
+        summary['fiocpu'] = round(max([r.usrCpu + r.sysCpu for r in cpus] + [0.0]),1)
+        if summary['fiocpu'] >= Telemetry.cpuLimit:
+            summary['alerts'].append("the fio jobs used " + str(summary['fiocpu']) + "% cpu")
+        for alert in summary['alerts']:
+            logging.warn("# Telemetry alert: " + alert)
+        self.__telemetrySums.append(summary)
+
+    def runCells(self,cells):
+        '''
+        Run a list of test cells with Fio. Each cell is a dictionary of Fio key
+        value arguments, e.g. block size and mixed workload. If batch mode is set
+        in the options, all cells are run by one Fio invocation, else Fio is started
+        for every cell.
+        If an early stop tolerance is set and cells are not batched, the progress
+        of a cell is streamed and the cell is stopped as soon as its IOPS converged.
+        @param cells A list of dictionaries with the key value arguments per cell.
+        @return A list of Fio outputs, one output per cell in the given order.
+        '''
+        self.startTelemetry()
+        if self.__options != None and self.__options.getBatch():
+            call,outs = self.__fioJob.startBatch(cells)
+            if call == False:
+                exit(1)
+        else:
+            outs = []
+            for cell in cells:
+                for k,v in cell.iteritems():
+                    self.__fioJob.addKVArg(k,v)
+                if self.__options != None and self.__options.getEarlyStop() != None:
+                    conv = Convergence(self.__options.getEarlyStop())
+                    call,jobOut = self.__fioJob.startStream(DeviceTest.statusInterval,conv)
+                else:
+                    call,jobOut = self.__fioJob.start()
+                if call == False:
+                    exit(1)
+                outs.append(jobOut)
+        self.stopTelemetry(outs)
+        for cell,jobOut in zip(cells,outs):
+            for k in sorted(cell.iterkeys()):
+                logging.info(k + ": " + cell[k])
+            logging.info(jobOut)
+            logging.info("######")
+        if self.isStopEarly():
+            conv = []
+            for jobOut in outs:
+                res = self.__fioJob.getResult(jobOut)
+                #allow one second of slack for job setup and tear down
+                conv.append(max(res.readRuntime,res.writeRuntime) < (self.getRuntime() - 1) * 1000)
+            logging.info("Cells ended before runtime: " + str(conv))
+            self.__cellConv.append(conv)
+        return outs
+
+    def snapshot(self):
+        ''' Take a SMART snapshot of the device if a probe is set, cf. SmartProbe.snapshot. '''
+        if self.__probe == None:
+            return None
+        return self.__probe.snapshot()
+
+    def getHostWritten(self):
+        ''' Return the bytes written by fio during the test, None if not summed up by the test. '''
+        return None
+
+    def calcWear(self,before,after):
+        '''
+        Calculate the write amplification of the test and project the endurance
+        of the device under its workload, cf. SmartProbe.endurance.
+        @param before The SMART snapshot taken before the test.
+        @param after The SMART snapshot taken after the test.
+        '''
+        self.__wear = sp.endurance(before,after,self.__device.getDevSizeB(),self.getHostWritten())
+        if self.__wear != None:
+            logging.info("# Write amplification and endurance: " + str(self.__wear))
+
+    def measureRounds(self):
+        '''
+        Carry out the test rounds, cf. runRounds. The SMART snapshots used to
+        calculate the write amplification are taken just before and after the
+        rounds, the secure erase and preconditioning are not part of the workload.
+        @return The result of runRounds.
+        '''
+        before = self.snapshot()
+        result = self.runRounds()
+        self.calcWear(before,self.snapshot())
+        return result
+
+    def isThrottled(self):
+        ''' Check if the device throttled in the last round. '''
+        return self.__thermalNote != None and self.__thermalNote['throttled'] == True
+
+    def doRound(self,*args):
+        '''
+        Carry out one test round and journal its result. If the round has
+        already been journaled by a previous run, its result is restored.
+        @param args The arguments of testRound.
+        @return The result of testRound.
+        '''
+        return self.journaled(self.testRound,args)
+
+    def journaled(self,func,args):
+        '''
+        Call a test function and journal its result, or restore the result
+        if it has already been journaled by a previous run. If a SMART probe
+        is set, the thermal note of the call is kept, cf. getThermalNote.
+        @param func The test function, e.g. testRound.
+        @param args The arguments of the function.
+        @return The result of the function.
+        '''
+        self.__restored = len(self.__pending) > 0
+        if self.__restored:
+            rec = self.__pending.popleft()
+            if 'cellconv' in rec:
+                self.__cellConv.extend(rec['cellconv'])
+            self.__thermalNote = rec.get('thermal')
+            logging.info("# Restored round from journal")
+            return rec['data']
+        convPos = len(self.__cellConv)
+        before = self.snapshot()
+        data = func(*args)
+        self.__thermalNote = sp.SmartProbe.compare(before,self.snapshot())
+        if self.isThrottled():
+            logging.warn("# The device throttled in the round, temperature: " + str(self.__thermalNote['temp']))
+        if self.__journal != None:
+            conv = self.__cellConv[convPos:]
+            if len(conv) == 0:
+                conv = None
+            self.__journal.append(self.__journalKey,data,conv,self.__thermalNote)
+        return data
+
+    def appendCellConvXml(self,r):
+        '''
+        Append the information which cells ended before their runtime to a XML node.
+        @param r The xml root tag to append the new elements to.
+        '''
+        if self.isStopEarly():
+            e = etree.SubElement(r,'cellconv')
+            e.text = json.dumps(self.__cellConv)
+
+    def appendTelemetryXml(self,r):
+        '''
+        Append the telemetry summaries of the fio runs to a XML node.
+        @param r The xml root tag to append the new elements to.
+        '''
+        if len(self.__telemetrySums) > 0:
+            e = etree.SubElement(r,'telemetrysums')
+            e.text = json.dumps(self.__telemetrySums)
+
+    def telemetryFromXml(self,root):
+        '''
+        Load the telemetry summaries of the fio runs from XML.
+        @param root The element containing the test information.
+        '''
+        if root.findtext('telemetrysums'):
+            self.__telemetrySums = json.loads(root.findtext('telemetrysums'))
+
+    def appendWearXml(self,r):
+        '''
+        Append the write amplification and endurance of the test to a XML node.
+        @param r The xml root tag to append the new elements to.
+        '''
+        if self.__wear != None:
+            e = etree.SubElement(r,'wear')
+            e.text = json.dumps(self.__wear)
+
+    def wearFromXml(self,root):
+        '''
+        Load the write amplification and endurance of the test from XML.
+        @param root The element containing the test information.
+        '''
+        if root.findtext('wear'):
+            self.__wear = json.loads(root.findtext('wear'))
+
+    def appendNotesXml(self,r,stores):
+        '''
+        Append the notes of the rounds, e.g. the thermal notes, to a XML node.
+        @param r The xml root tag to append the new elements to.
+        @param stores A list of RoundStores.
+        '''
+        notes = [s.getNotes() for s in stores]
+        if any(n != None for l in notes for n in l):
+            e = etree.SubElement(r,'roundnotes')
+            e.text = json.dumps(notes)
+
+    def notesFromXml(self,root,stores):
+        '''
+        Load the notes of the rounds from XML, after the rounds have been loaded.
+        @param root The element containing the test information.
+        @param stores A list of RoundStores.
+        '''
+        if root.findtext('roundnotes'):
+            for s,notes in zip(stores,json.loads(root.findtext('roundnotes'))):
+                s.setNotes(notes)
+
+    def appendPlanXml(self,r):
+        '''
+        Append the settings of the test plan to a XML node.
+        @param r The xml root tag to append the new elements to.
+        '''
+        if len(self.__plan) > 0:
+            e = etree.SubElement(r,'plan')
+            e.text = json.dumps(self.__plan)
+
+    def planFromXml(self,root):
+        '''
+        Load the settings of the test plan from XML.
+        @param root The element containing the test information.
+        '''
+        if root.findtext('plan'):
+            self.__plan = json.loads(root.findtext('plan'))
+
+    def cellConvFromXml(self,root):
+        '''
+        Load the information which cells ended before their runtime from XML.
+        @param root The element containing the test information.
+        '''
+        if root.findtext('cellconv'):
+            self.__cellConv = json.loads(root.findtext('cellconv'))
 
     @abstractmethod
     def testRound(self):
@@ -126,84 +541,115 @@ class SsdIopsTest(DeviceTest):
     bsLabels = ["1024k","128k","64k","32k","16k","8k","4k","512"]
     ##Percentages of mixed workloads
     mixWlds = [100,95,65,50,35,5,0]
+    ##The rounds run until the steady state, fio may end a cell early.
+    fioSteady = True
 
-    def __init__(self,testname,device,options=None):
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Constructor.
         '''
-        super(SsdIopsTest,self).__init__(testname,device,options)
-        ## A list of matrices with the collected fio measurement values of each round.
-        self.__roundMatrices = []
-        self.__stdyState = StdyState()
+        super(SsdIopsTest,self).__init__(testname,device,options,plan)
+        ## The collected fio measurement values of each round.
+        self.__roundMatrices = RoundStore((len(self.getMixWlds()),len(self.getBsLabels())),StdyState.testRnds,int)
+        self.__stdyState = self.newStdyState()
         self.getFioJob().addKVArg("rw","randrw")
 
     def getRndMatrices(self): return self.__roundMatrices
     def getStdyState(self): return self.__stdyState
 
+    def calcTables(self):
+        ''' Calculate the IOPS tables of the measurement window. '''
+        rnds = self.getStdyState().getStdyRnds()
+        return mt.windowStats(self.__roundMatrices.window(rnds))
+
     def toLog(self):
         '''
         Log information about the steady state and how it 
         has been reached.
         '''
         logging.info("Round matrices: ")
-        logging.info(self.__roundMatrices)
+        logging.info(self.__roundMatrices.toList())
         self.getStdyState().toLog()
 
-    def testRound(self):
+    def testRound(self,full=True):
         '''
         Carry out one IOPS test round.
         The round consists of two inner loops: one iterating over the
         percentage of random reads/writes in the mixed workload, the other
         over different block sizes.
+        @param full If False only the 0/100% r/w 4k cell is run, the other
+        cells of the matrix are 0.
         @return A matrix containing the sum of average IOPS.
         '''
-        jobOut = '' #Fio job output
+        if full == False:
+            outs = self.runCells([{"rwmixread":"0","bs":"4k"}])
+            rndMatrix = [[0] * len(self.getBsLabels()) for i in self.getMixWlds()]
+            row,col = divmod(self.getDetectionCell(),len(self.getBsLabels()))
+            rndMatrix[row][col] = self.getFioJob().getResult(outs[0]).getIOPS()
+            return rndMatrix
+        cells = []
+        for i in self.getMixWlds():
+            for j in self.getBsLabels():
+                cells.append({"rwmixread":str(i),"bs":j})
+        outs = self.runCells(cells)
         rndMatrix = []
-        for i in SsdIopsTest.mixWlds:
+        for i in range(len(self.getMixWlds())):
             rwRow = []
-            for j in SsdIopsTest.bsLabels:
-                self.getFioJob().addKVArg("rwmixread",str(i))
-                self.getFioJob().addKVArg("bs",j)
-                call,jobOut = self.getFioJob().start()
-                if call == False:
-                    exit(1)
-                logging.info("mixLoad: " +str(i))
-                logging.info("bs: "+j)
-                logging.info(jobOut)
-                logging.info("######")
-                rwRow.append(self.getFioJob().getIOPS(jobOut))
+            for j in range(len(self.getBsLabels())):
+                res = self.getFioJob().getResult(outs[i * len(self.getBsLabels()) + j])
+                rwRow.append(res.getIOPS())
             rndMatrix.append(rwRow)
         return rndMatrix
 
     def runRounds(self):
         '''
         Carry out the IOPS test rounds and check if the steady state is reached.
-        For a maximum of 25 rounds the test loop is carried out. After each
-        test round we check for a measurement window of the last 5 rounds if
-        the steady state has been reached.
+        For a maximum number of rounds (25 per default) the test loop is carried
+        out. After each test round we check for the measurement window of the
+        last rounds (5 per default) if the steady state has been reached.
+        In two phase mode only the 0/100% r/w 4k cell is run until it looks
+        steady, then the full matrix is run for the measurement window.
         @return True if the steady state has been reached, False if not.
         '''
         rndMatrix = []
-        steadyValues = deque([])#List of 4k random writes IOPS
-        xranges = deque([])#Rounds of current measurement window
-        
-        for i in range(StdyState.testRnds):
+        maxRnds = self.getStdyState().getMaxRnds()
+        window = self.getStdyState().getCriterion().getWindow()
+        #steady state of the single cell in the first phase
+        probe = None
+        if self.getOptions() != None and self.getOptions().getTwoPhase() == True:
+            probe = self.newStdyState()
+        #last round to carry out, lowered if the first phase is aborted
+        last = maxRnds - 1
+        for i in range(maxRnds):
+            if i > last:
+                break
             logging.info("#################")
             logging.info("Round nr. "+str(i))
-            rndMatrix = self.testRound()
-            self.getRndMatrices().append(rndMatrix)
-            # Use the last row and its next to last value
-            #-> 0/100% r/w and 4k for steady state detection
-            steadyValues.append(rndMatrix[-1][-2])
-            xranges.append(i)
-            if i > 4:
-                xranges.popleft()
-                steadyValues.popleft()
-            #check if the steady state has been reached in the last 5 rounds
-            if i >= 4:
-                steadyState = self.getStdyState().checkSteadyState(xranges,steadyValues,i)
-                if steadyState == True:
-                    break
+            #leave room for a full measurement window, the main steady state needs window full rounds
+            if probe != None and i >= maxRnds - window:
+                logging.warn("# 4k random write not steady, running the full matrix")
+                probe = None
+            if probe != None:
+                rndMatrix = self.doRound(False)
+                self.getRndMatrices().append(rndMatrix,self.getThermalNote())
+                cell = self.getRndMatrices()[-1].ravel()[self.getDetectionCell()]
+                if probe.addRound(i,[cell],0,self.isThrottled(),self.isRestored()) == True:
+                    logging.info("# 4k random write looks steady, running the full matrix")
+                    probe = None
+                elif probe.isAborted():
+                    #measure one window of the full matrix before stopping, the first phase
+                    #ends before maxRnds - window, so the window always fits
+                    logging.warn("# 4k random write will not get steady, running the full matrix once")
+                    probe = None
+                    last = i + window
+                continue
+            rndMatrix = self.doRound()
+            self.getRndMatrices().append(rndMatrix,self.getThermalNote())
+            #Track all cells, use 0/100% r/w and 4k for steady state detection
+            cells = self.getRndMatrices()[-1]
+            steadyState = self.getStdyState().addRound(i,cells.ravel(),self.getDetectionCell(),self.isThrottled(),self.isRestored())
+            if steadyState == True or self.getStdyState().isAborted():
+                break
         #Return current steady state
         return self.getStdyState().isSteady()
 
@@ -212,25 +658,28 @@ class SsdIopsTest(DeviceTest):
         Start the rounds, log the steady state infos.
         @return True if all tests were run
         '''
-        try: 
-            self.getDevice().secureErase()
-        except RuntimeError:
-            logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
-            raise
-        try:
-            if self.getOptions() == None:
-                self.getDevice().precondition(1,1)
-            else:
-                if self.getOptions().getNj() != None:
-                    nj = self.getOptions().getNj()
-                if self.getOptions().getIod() != None:
-                    iod = self.getOptions().getIod()
-                self.getDevice().precondition(nj,iod)
-        except RuntimeError:
-            logging.error("# Could not carry out preconditioning for "+self.getDevice().getDevPath())
-            raise
+        if self.hasProgress():
+            logging.info("# Resuming from journal, skipping secure erase and preconditioning")
+        else:
+            try: 
+                self.getDevice().secureErase()
+            except RuntimeError:
+                logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
+                raise
+            try:
+                if self.getOptions() == None:
+                    self.getDevice().precondition(1,1)
+                else:
+                    if self.getOptions().getNj() != None:
+                        nj = self.getOptions().getNj()
+                    if self.getOptions().getIod() != None:
+                        iod = self.getOptions().getIod()
+                    self.getDevice().precondition(nj,iod)
+            except RuntimeError:
+                logging.error("# Could not carry out preconditioning for "+self.getDevice().getDevPath())
+                raise
         logging.info("########### Starting IOPS Test ###########")
-        steadyState = self.runRounds()
+        steadyState = self.measureRounds()
         if steadyState == False:
             logging.info("# Steady State has not been reached for IOPS Test.")
         self.toLog()
@@ -247,9 +696,14 @@ class SsdIopsTest(DeviceTest):
         self.getFioJob().appendXml(r)
         # Add the options to xml
         self.getOptions().appendXml(r)
-        data = json.dumps(self.__roundMatrices)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        data = json.dumps(self.__roundMatrices.toList())
         e = etree.SubElement(r,'roundmat')
         e.text = data
+        self.appendNotesXml(r,[self.__roundMatrices])
+        self.appendCellConvXml(r)
         self.getStdyState().appendXml(r)
         return r
 
@@ -259,7 +713,13 @@ class SsdIopsTest(DeviceTest):
         @param root Name of root element from which to load values
         '''
         logging.info("########### Loading IOPS test from "+self.getTestname()+".xml ###########")
-        self.__roundMatrices = json.loads(root.findtext('roundmat'))
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        self.__roundMatrices.fromList(json.loads(root.findtext('roundmat')))
+        self.notesFromXml(root,[self.__roundMatrices])
+        self.cellConvFromXml(root)
+        self.resetTables()
         self.__stdyState.fromXml(root)
         self.getFioJob().fromXml(root)
         self.getOptions().fromXml(root)
@@ -281,34 +741,92 @@ class SsdLatencyTest(DeviceTest):
     mixWlds = [100,65,0]
     ##Labels of block sizes.
     bsLabels = ["8k","4k","512"]
+    ##Completion latency percentiles recorded per round.
+    latPcts = [50.0,90.0,99.0,99.9,99.99]
+    ##Table keys of the completion latency percentiles.
+    pctLabels = ['clat-p50','clat-p90','clat-p99','clat-p99.9','clat-p99.99']
+    ##Merging the histograms of both directions gives exact percentiles of mixed workloads.
+    jsonPlus = True
+    ##The rounds run until the steady state, fio may end a cell early.
+    fioSteady = True
 
-    def __init__(self,testname,device,options=None):
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Constructor.
         '''
         ## Keep user options
         self.__userOptions = options
+        wsoptions = None
         if options != None:
-            #For latency the specification says to use 1 job/thread, 1 outstanding IO
-            wsoptions = Options(1,1)
-            if options.getXargs() != None:
-                wsoptions.setXargs(options.getXargs())
-        super(SsdLatencyTest,self).__init__(testname,device,wsoptions)
-        ## A list of matrices with the collected fio measurement values of each round.
-        self.__roundMatrices = []
-        self.__stdyState = StdyState()
+            #For latency the specification says to use 1 job/thread, 1 outstanding IO,
+            #all other user options are kept
+            wsoptions = copy.copy(options)
+            wsoptions.setNj(1)
+            wsoptions.setIod(1)
+        super(SsdLatencyTest,self).__init__(testname,device,wsoptions,plan)
+        ## The collected fio measurement values of each round.
+        self.__roundMatrices = RoundStore((len(self.getMixWlds()),len(self.getBsLabels()),3),StdyState.testRnds)
+        ## The completion latency percentiles of each round.
+        self.__pctMatrices = RoundStore((len(self.getMixWlds()),len(self.getBsLabels()),len(SsdLatencyTest.latPcts)),
+                                        StdyState.testRnds)
+        ## The encoded completion latency histograms of each round, None per cell if not reported.
+        self.__histMatrices = []
+        self.__stdyState = self.newStdyState()
         self.getFioJob().addKVArg("rw","randrw")
 
     def getRndMatrices(self): return self.__roundMatrices
+    def getPctMatrices(self): return self.__pctMatrices
+    def getHistMatrices(self): return self.__histMatrices
+
+    def getWindowHist(self,mix,bs):
+        '''
+        Merge the latency histograms of a cell over the rounds of the measurement window.
+        @param mix The row index of the cell, cf. getMixWlds.
+        @param bs The column index of the cell, cf. getBsLabels.
+        @return A LatHistogram object or None if a round has no histogram.
+        '''
+        rnds = self.getStdyState().getStdyRnds()
+        if len(rnds) == 0 or rnds[-1] >= len(self.__histMatrices):
+            return None
+        encs = [self.__histMatrices[r][mix][bs] for r in rnds]
+        if None in encs:
+            return None
+        return LatHistogram.mergeAll([LatHistogram.decode(e) for e in encs])
     def getStdyState(self): return self.__stdyState
 
+    def calcTables(self):
+        '''
+        Calculate the latency tables of the measurement window in ms. The
+        max and min tables are taken from the max and min latencies, all
+        other statistics from the mean latencies.
+        '''
+        rnds = self.getStdyState().getStdyRnds()
+        window = self.__roundMatrices.window(rnds) / 1000.0
+        tables = mt.windowStats(window[...,2])
+        tables['max'] = mt.windowStat(window[...,1],'max')
+        tables['min'] = mt.windowStat(window[...,0],'min')
+        if len(self.__pctMatrices) > 0:
+            #the mean of the percentiles of the window rounds
+            pcts = mt.windowStat(self.__pctMatrices.window(rnds) / 1000.0,'mean')
+            #exact percentiles of the whole window from the merged histograms
+            for k in range(len(self.getMixWlds())):
+                for m in range(len(self.getBsLabels())):
+                    hist = self.getWindowHist(k,m)
+                    if hist != None:
+                        pcts[k][m] = [v / 1000.0 for v in hist.percentiles(SsdLatencyTest.latPcts)]
+            for n,label in enumerate(SsdLatencyTest.pctLabels):
+                tables[label] = pcts[...,n]
+        return tables
+
     def toLog(self):
         '''
         Log information about the steady state and how it 
         has been reached.
         '''
         logging.info("Round matrices: ")
-        logging.info(self.__roundMatrices)
+        logging.info(self.__roundMatrices.toList())
+        logging.info("Percentile matrices: ")
+        logging.info(self.__pctMatrices.toList())
         self.getStdyState().toLog()
 
     def testRound(self):
@@ -317,66 +835,64 @@ class SsdLatencyTest(DeviceTest):
         The round consists of two inner loops: one iterating over the
         percentage of random reads/writes in the mixed workload, the other
         over different block sizes.
-        @return A matrix containing [min,max,mean] latencies of the round.
-        '''
-        jobOut = ''
-        rndMatrix = []        
-        for i in SsdLatencyTest.mixWlds:
+        @return [matrix containing [min,max,mean] latencies of the round,
+        matrix containing the completion latency percentiles, cf. latPcts,
+        matrix containing the encoded completion latency histograms]
+        '''
+        cells = []
+        for i in self.getMixWlds():
+            for j in self.getBsLabels():
+                cells.append({"rwmixread":str(i),"bs":j})
+        outs = self.runCells(cells)
+        rndMatrix = []
+        pctMatrix = []
+        histMatrix = []
+        for k,i in enumerate(self.getMixWlds()):
             rwRow = []
-            for j in SsdLatencyTest.bsLabels:
-                self.getFioJob().addKVArg("rwmixread",str(i))
-                self.getFioJob().addKVArg("bs",j)
-                call,jobOut = self.getFioJob().start()
-                if call == False:
-                    exit(1)
-                logging.info("mixLoad: " +str(i))
-                logging.info("bs: "+j)
-                logging.info(jobOut)
-                logging.info("######")
-                if i == 65:
-                    #if we have a mixed workload weight the latencies
-                    l = [0,0,0]
-                    r = self.getFioJob().getReadLats(jobOut)
-                    w = self.getFioJob().getWriteLats(jobOut)
-                    #FIXME Is this also correct for Min and Max?
-                    l[0] = (0.65 * r[0]) + (0.35 * w[0])
-                    l[1] = (0.65 * r[1]) + (0.35 * w[1])
-                    l[2] = (0.65 * r[2]) + (0.35 * w[2])
+            pctRow = []
+            histRow = []
+            for m in range(len(self.getBsLabels())):
+                res = self.getFioJob().getResult(outs[k * len(self.getBsLabels()) + m])
+                if 0 < i < 100:
+                    #a mixed workload: min and max over both directions, the
+                    #mean weighted by the IOs fio completed per direction
+                    r = res.getReadLats()
+                    w = res.getWriteLats()
+                    l = [min(r[0],w[0]),max(r[1],w[1]),res.getMeanLat()]
                 else:
-                    l = self.getFioJob().getTotLats(jobOut)
+                    l = res.getTotLats()
                 rwRow.append(l)
+                pctRow.append(res.getClatPcts(SsdLatencyTest.latPcts,i > 0,i < 100))
+                hist = res.getClatHist(i > 0,i < 100)
+                histRow.append(hist.encode() if hist != None else None)
             rndMatrix.append(rwRow)
-        return rndMatrix
+            pctMatrix.append(pctRow)
+            histMatrix.append(histRow)
+        return [rndMatrix,pctMatrix,histMatrix]
 
     def runRounds(self):
         '''
         Carry out the latency test rounds and check if the steady state is reached.
-        For a maximum of 25 rounds the test loop is carried out. After each
-        test round we check for a measurement window of the last 5 rounds if
-        the steady state has been reached.
+        For a maximum number of rounds (25 per default) the test loop is carried
+        out. After each test round we check for the measurement window of the
+        last rounds (5 per default) if the steady state has been reached.
         @return True if the steady state has been reached, False if not.
         '''
         rndMatrix = []
-        steadyValues = deque([])
-        xranges = deque([])#Rounds of current measurement window
-        
-        for i in range(StdyState.testRnds):
+        for i in range(self.getStdyState().getMaxRnds()):
             logging.info("#################")
             logging.info("Round nr. "+str(i))
-            rndMatrix = self.testRound()
-            self.getRndMatrices().append(rndMatrix)
+            rndMatrix,pctMatrix,histMatrix = self.doRound()
+            self.getRndMatrices().append(rndMatrix,self.getThermalNote())
+            self.getPctMatrices().append(pctMatrix)
+            self.getHistMatrices().append(histMatrix)
             #Latencies always consist of [min,max,mean] latency
-            #Take mean/average for steady state detection
-            steadyValues.append(rndMatrix[-1][-2][2])
-            xranges.append(i)
-            if i > 4:
-                xranges.popleft()
-                steadyValues.popleft()
-            #check if the steady state has been reached in the last 5 rounds
-            if i >= 4:
-                steadyState = self.getStdyState().checkSteadyState(xranges,steadyValues,i)
-                if steadyState == True:
-                    break
+            #Track the mean latency of all cells, 0/100% r/w and 4k
+            #are used for steady state detection
+            cells = self.getRndMatrices()[-1][...,2]
+            steadyState = self.getStdyState().addRound(i,cells.ravel(),self.getDetectionCell(),self.isThrottled(),self.isRestored())
+            if steadyState == True or self.getStdyState().isAborted():
+                break
         #Return current steady state
         return self.getStdyState().isSteady()
 
@@ -385,25 +901,28 @@ class SsdLatencyTest(DeviceTest):
         Start the rounds, log the steady state infos.
         @return True if all tests were run
         '''
-        try: 
-            self.getDevice().secureErase()
-        except RuntimeError:
-            logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
-            raise
-        try:
-            if self.__userOptions == None:
-                self.getDevice().precondition(1,1)
-            else:
-                if self.__userOptions.getNj() != None:
-                    nj = self.__userOptions.getNj()
-                if self.__userOptions.getIod() != None:
-                    iod = self.__userOptions.getIod()
-                self.getDevice().precondition(nj,iod)
-        except RuntimeError:
-            logging.error("# Could not carry out preconditioning for "+self.getDevice().getDevPath())
-            raise
+        if self.hasProgress():
+            logging.info("# Resuming from journal, skipping secure erase and preconditioning")
+        else:
+            try: 
+                self.getDevice().secureErase()
+            except RuntimeError:
+                logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
+                raise
+            try:
+                if self.__userOptions == None:
+                    self.getDevice().precondition(1,1)
+                else:
+                    if self.__userOptions.getNj() != None:
+                        nj = self.__userOptions.getNj()
+                    if self.__userOptions.getIod() != None:
+                        iod = self.__userOptions.getIod()
+                    self.getDevice().precondition(nj,iod)
+            except RuntimeError:
+                logging.error("# Could not carry out preconditioning for "+self.getDevice().getDevPath())
+                raise
         logging.info("########### Starting Latency Test ###########")
-        steadyState = self.runRounds()
+        steadyState = self.measureRounds()
         if steadyState == False:
             logging.info("# Steady State has not been reached for Latency Test.")
         self.toLog()
@@ -420,9 +939,20 @@ class SsdLatencyTest(DeviceTest):
         self.getFioJob().appendXml(r)
         # Add the options to xml
         self.getOptions().appendXml(r)
-        data = json.dumps(self.__roundMatrices)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        data = json.dumps(self.__roundMatrices.toList())
         e = etree.SubElement(r,'roundmat')
         e.text = data
+        data = json.dumps(self.__pctMatrices.toList())
+        e = etree.SubElement(r,'pctmat')
+        e.text = data
+        data = json.dumps(self.__histMatrices)
+        e = etree.SubElement(r,'histmat')
+        e.text = data
+        self.appendNotesXml(r,[self.__roundMatrices])
+        self.appendCellConvXml(r)
         self.getStdyState().appendXml(r)
         return r
 
@@ -432,7 +962,18 @@ class SsdLatencyTest(DeviceTest):
         @param root Name of root element from which to load values
         '''
         logging.info("########### Loading latency test from "+self.getTestname()+".xml ###########")
-        self.__roundMatrices = json.loads(root.findtext('roundmat'))
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        self.__roundMatrices.fromList(json.loads(root.findtext('roundmat')))
+        self.notesFromXml(root,[self.__roundMatrices])
+        if root.findtext('pctmat'):
+            self.__pctMatrices.fromList(json.loads(root.findtext('pctmat')))
+        if root.findtext('histmat'):
+            self.__histMatrices = [[[str(e) if e != None else None for e in row] for row in rnd]
+                                   for rnd in json.loads(root.findtext('histmat'))]
+        self.cellConvFromXml(root)
+        self.resetTables()
         self.__stdyState.fromXml(root)
         self.getFioJob().fromXml(root)
         self.getOptions().fromXml(root)
@@ -453,26 +994,38 @@ class SsdTPTest(DeviceTest):
     '''
     ##Labels of block sizes for throughput test
     bsLabels = ["1024k","64k","8k","4k","512",]
+    ##Fio's steady state detection uses the bandwidth
+    ssMetric = 'bw'
+    ##The rounds run until the steady state, fio may end a cell early.
+    fioSteady = True
     
-    def __init__(self,testname,device,options):
+    def __init__(self,testname,device,options,plan=None):
         '''
         Constructor.
         '''
-        super(SsdTPTest,self).__init__(testname,device,options)
-        ## A list of matrices with the collected fio measurement values of each round.
+        super(SsdTPTest,self).__init__(testname,device,options,plan)
+        ## Per block size the collected [read,write] bandwidths of each round.
         self.__roundMatrices = []
-        self.__stdyState = StdyState()
+        self.__stdyState = self.newStdyState()
 
     def getRndMatrices(self): return self.__roundMatrices
     def getStdyState(self): return self.__stdyState
 
+    def calcTables(self):
+        '''
+        Calculate the throughput tables of the measurement window in MB/s,
+        the rows are read and write.
+        '''
+        rnds = self.getStdyState().getStdyRnds()
+        return mt.windowStats(mt.stackWindows(self.__roundMatrices,rnds) / 1024.0)
+
     def toLog(self):
         '''
         Log information about the steady state and how it 
         has been reached.
         '''
         logging.info("Round matrices: ")
-        logging.info(self.__roundMatrices)
+        logging.info([s.getArray().T.tolist() for s in self.__roundMatrices])
         self.getStdyState().toLog()
 
     def testRound(self,bs):
@@ -482,30 +1035,10 @@ class SsdTPTest(DeviceTest):
         @param bs The current block size to use.
         @return Read and Write bandwidths [tpRead,tpWrite]
         '''
-        self.getFioJob().addKVArg("bs",bs)
-        jobOut = ''
-        tpRead = 0 #read bandwidth
-        tpWrite = 0#write bandwidth
-
-        #start read tests
-        self.getFioJob().addKVArg("rw","read")
-        call,jobOut = self.getFioJob().start()
-        if call == False:
-            exit(1)
-        logging.info("Read TP test:")
-        logging.info(jobOut)
-        logging.info("######")
-        tpRead = self.getFioJob().getTPRead(jobOut)
-        
-        #start write tests
-        self.getFioJob().addKVArg("rw","write")
-        call,jobOut = self.getFioJob().start()
-        if call == False:
-            exit(1)
-        logging.info("Write TP test:")
-        logging.info(jobOut)
-        logging.info("######")
-        tpWrite = self.getFioJob().getTPWrite(jobOut)
+        #read test is carried out before write test
+        outs = self.runCells([{"bs":bs,"rw":"read"},{"bs":bs,"rw":"write"}])
+        tpRead = self.getFioJob().getResult(outs[0]).readBW
+        tpWrite = self.getFioJob().getResult(outs[1]).writeBW
         return [tpRead,tpWrite]
     
     def runRounds(self):
@@ -513,56 +1046,51 @@ class SsdTPTest(DeviceTest):
         Carry out the throughput/bandwidth test rounds and check if the steady state is reached.
          @return True if the steady state has been reached, False if not.
         '''
-        stdyValsWrite = deque([])#List of 1M sequential write IOPS
-        xrangesWrite = deque([])#Rounds of current measurement window
-        
         #rounds are the same for IOPS and throughput
-        for j in SsdTPTest.bsLabels:
-            try: 
-                self.getDevice().secureErase()
-            except RuntimeError:
-                logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
-                raise
-
-            tpRead_l = []
-            tpWrite_l = []
+        for j in self.getBsLabels():
+            #a block size resumed from the journal continues on the written device
+            if not self.isRestoring():
+                try: 
+                    self.getDevice().secureErase()
+                except RuntimeError:
+                    logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
+                    raise
+
+            tpRW = RoundStore((2,),self.getStdyState().getMaxRnds(),int)
             logging.info("#################")
             logging.info("Current block size. "+str(j))
             
-            for i in range(StdyState.testRnds):
+            for i in range(self.getStdyState().getMaxRnds()):
                 logging.info("######")
                 logging.info("Round nr. "+str(i))
-                tpRead,tpWrite = self.testRound(j)
-                tpRead_l.append(tpRead)
-                tpWrite_l.append(tpWrite)
+                tpRead,tpWrite = self.doRound(j)
+                tpRW.append([tpRead,tpWrite],self.getThermalNote())
                 
                 #if the rounds have been set by steady state for 1M block size
                 #we need to carry out only i rounds for the other block sizes
                 #as steady state has already been reached
                 if self.getStdyState().getRnds() != 0 and self.getStdyState().getRnds() == i:
-                    self.getRndMatrices().append([tpRead_l,tpWrite_l])
+                    self.getRndMatrices().append(tpRW)
                     break
                 
-                # Use 1M block sizes sequential write for steady state detection
-                if j == "1024k":
-                    stdyValsWrite.append(tpWrite)
-                    xrangesWrite.append(i)
-                    if i > 4:
-                        xrangesWrite.popleft()
-                        stdyValsWrite.popleft()
-                        #check if the steady state has been reached in the last 5 rounds
-                    if i >= 4:
-                        steadyState = self.getStdyState().checkSteadyState(xrangesWrite,stdyValsWrite,i)
+                # Use the first block size (1M per default) sequential write for steady state detection
+                if j == self.getBsLabels()[0]:
+                    #track read and write, write is the detection cell
+                    steadyState = self.getStdyState().addRound(i,[tpRead,tpWrite],1,self.isThrottled(),self.isRestored())
+                    #check if the steady state has been reached in the last 5 rounds
+                    if i >= self.getStdyState().getCriterion().getWindow() - 1:
                         #reached a steady state
                         if steadyState == True:
                             logging.info("Reached steady state at round %d",i)
-                        #running from 0 to 24
-                        if i == ((StdyState.testRnds) - 1):
+                        #running from 0 to max rounds - 1
+                        if i == (self.getStdyState().getMaxRnds() - 1):
                             self.getStdyState().setReachStdyState(False)
                             logging.warn("#Did not reach steady state for bs %s",j)
-                        #In both cases we are done with steady state checking
-                        if steadyState == True or i == ((StdyState.testRnds) - 1):
-                            self.getRndMatrices().append([tpRead_l,tpWrite_l])
+                        #In all cases we are done with steady state checking, the
+                        #other block sizes carry out as many rounds as 1M
+                        if steadyState == True or self.getStdyState().isAborted() or \
+                           i == (self.getStdyState().getMaxRnds() - 1):
+                            self.getRndMatrices().append(tpRW)
                             #Done with 1M block size
                             break
         #Return current steady state
@@ -574,7 +1102,7 @@ class SsdTPTest(DeviceTest):
         @return True if all tests were run
         '''
         logging.info("########### Starting Throughput Test ###########")
-        steadyState = self.runRounds()
+        steadyState = self.measureRounds()
         if steadyState == False:
             logging.info("# Steady State has not been reached for Throughput Test.")
         self.toLog()
@@ -591,9 +1119,15 @@ class SsdTPTest(DeviceTest):
         self.getFioJob().appendXml(r)
         # Add the options to xml
         self.getOptions().appendXml(r)
-        data = json.dumps(self.__roundMatrices)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        #keep the format of [read list,write list] per block size
+        data = json.dumps([s.getArray().T.tolist() for s in self.__roundMatrices])
         e = etree.SubElement(r,'roundmat')
         e.text = data
+        self.appendNotesXml(r,self.__roundMatrices)
+        self.appendCellConvXml(r)
         self.getStdyState().appendXml(r)
         return r
 
@@ -603,7 +1137,17 @@ class SsdTPTest(DeviceTest):
         @param root Name of root element from which to load values
         '''
         logging.info("########### Loading TP test from "+self.getTestname()+".xml ###########")
-        self.__roundMatrices = json.loads(root.findtext('roundmat'))
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        self.__roundMatrices = []
+        for rw in json.loads(root.findtext('roundmat')):
+            store = RoundStore((2,),StdyState.testRnds,int)
+            store.fromList(zip(*rw))
+            self.__roundMatrices.append(store)
+        self.notesFromXml(root,self.__roundMatrices)
+        self.cellConvFromXml(root)
+        self.resetTables()
         self.__stdyState.fromXml(root)
         self.getFioJob().fromXml(root)
         self.getOptions().fromXml(root)
@@ -620,20 +1164,26 @@ class SsdWriteSatTest(DeviceTest):
     '''
     A class to carry out the Write Saturation test.
     '''
-    def __init__(self,testname,device,options=None):
+    ## Max number of rounds, one round runs for 1 minute: 24h
+    maxRnds = 60*24
+
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Constructor.
         '''
-        super(SsdWriteSatTest,self).__init__(testname,device,options)
+        super(SsdWriteSatTest,self).__init__(testname,device,options,plan)
         ## Number of rounds until write saturation test ended
         self.__rounds = 0
-        ## Write saturation results: [iops_l,lats_l]
-        self.__roundMatrices = []
+        ## Write saturation results per round: [iops,min,max,mean lat]
+        self.__roundMatrices = RoundStore((4,),self.getMaxRnds())
+        ## Total written IO in KB
+        self.__totWriteIO = 0
         self.getFioJob().addKVArg("rw","randwrite")
         self.getFioJob().addKVArg("bs","4k")   
 
     def getRnds(self): return self.__rounds
     def getRndMatrices(self): return self.__roundMatrices
+    def getHostWritten(self): return self.__totWriteIO * 1024
 
     def toLog(self):
         '''
@@ -642,21 +1192,27 @@ class SsdWriteSatTest(DeviceTest):
         logging.info("Write Sat rounds: ")
         logging.info(self.__rounds)
         logging.info("Round matrices: ")
-        logging.info(self.__roundMatrices)
+        logging.info(self.__roundMatrices.toList())
 
-    def testRound(self):
+    def testRound(self,singlePass=False):
         '''
         Carry out one test round of the write saturation test.
         The round consists of random writing with 4k bs for one minute
+        @param singlePass Carry out the whole test in one pass, cf. testPass.
         @return [TotWriteIO,IOPS,[min,max,mean lats]]
         '''
+        if singlePass == True:
+            return self.testPass()
+        self.startTelemetry()
         (call,jobOut) = self.getFioJob().start()
         if call == False:
             exit(1)
+        self.stopTelemetry([jobOut])
         
-        writeIO = self.getFioJob().getTotIOWrite(jobOut)
-        iops = self.getFioJob().getIOPS(jobOut)
-        lats = self.getFioJob().getWriteLats(jobOut)
+        res = self.getFioJob().getResult(jobOut)
+        writeIO = res.writeIO
+        iops = res.getIOPS()
+        lats = res.getWriteLats()
         
         logging.info(jobOut)
         logging.info("#IOPS: " + str(iops))
@@ -665,19 +1221,68 @@ class SsdWriteSatTest(DeviceTest):
         logging.info("######")
         return [writeIO,iops,lats]
     
+    def testPass(self):
+        '''
+        Carry out the write saturation test as one fio job, writing 4 times the
+        device size without restarting fio. Fio logs the IOPS and latencies per
+        second, the logs are downsampled to rounds of one minute. The latencies
+        of a round are the min, max and mean of its per second mean latencies.
+        @return [TotWriteIO,list of [IOPS,min,max,mean lat] per round]
+        '''
+        devSzB = self.getDevice().getDevSizeB()
+        prefix = self.getTestname() + '-writesat'
+        job = self.getFioJob()
+        job.removeSglArg("time_based")
+        #the pass must write 4 times the device size, fio must not end it at a steady state
+        for k in ['steadystate','ss_dur','ss_ramp']:
+            job.removeKVArg(k)
+        job.addKVArg("io_size",str(devSzB * 4))
+        #the runtime is only an upper limit, one round runs for 1 minute
+        job.addKVArg("runtime",str(self.getMaxRnds() * 60))
+        job.addKVArg("write_iops_log",prefix)
+        job.addKVArg("write_lat_log",prefix)
+        job.addKVArg("log_avg_msec","1000")
+        def progress(result):
+            logging.info("#Written " + str(result.writeIO) + "KB of " + str((devSzB * 4) / 1024) + "KB")
+            return False
+        self.startTelemetry()
+        (call,jobOut) = job.startStream(60,progress)
+        if call == False:
+            exit(1)
+        self.stopTelemetry([jobOut])
+        res = job.getResult(jobOut)
+        logging.info(jobOut)
+        iops = fl.downsample(fl.readSamples(fl.logFiles(prefix,'iops')))
+        lats = fl.downsample(fl.readSamples(fl.logFiles(prefix,'lat'),'mean',
+                                            fl.latDivisor(job.getFioVersion())))
+        logging.info("#Downsampled " + str(len(iops)) + " rounds from the per second logs of " + prefix)
+        return [res.writeIO,[[i[2]] + l for i,l in zip(iops,lats)]]
+
+    def runPass(self):
+        '''
+        Carry out the write saturation test in one pass, cf. testPass.
+        '''
+        writeIO,rounds = self.doRound(True)
+        #the thermal note covers the whole pass
+        for rnd in rounds:
+            self.__roundMatrices.append(rnd,self.getThermalNote())
+        self.__rounds = max(len(rounds) - 1,0)
+        self.__totWriteIO = writeIO
+        logging.info("#Write saturation has written " + str(writeIO) + "KB")
+
     def runRounds(self):
         '''
         Carry out the write saturation test rounds
         '''
+        if self.getOptions() != None and self.getOptions().getSinglePass() == True:
+            return self.runPass()
         devSzB = self.getDevice().getDevSizeB()
         logging.info("#Device size in Byte: " + str(devSzB))
         totWriteIO = 0 #total written IO in KB, must be greater than 4xDevice 
         #carry out the test for a maximum of 24h, one round runs for 1 minute
-        maxRounds = 60*24
+        maxRounds = self.getMaxRnds()
         writeIO = 0
-        iops_l = [] #overall list of iops
         iops = 0 #IOPS per round
-        lats_l = []#overall list of latencies
         lats = []#latencies per round
         
         #range starts at 0, so 1 must be subtracted
@@ -686,9 +1291,8 @@ class SsdWriteSatTest(DeviceTest):
         for i in range(maxRounds):
             logging.info("#################")
             logging.info("Round nr. "+str(i))
-            writeIO,iops,lats = self.testRound()
-            iops_l.append(iops)
-            lats_l.append(lats)
+            writeIO,iops,lats = self.doRound()
+            self.__roundMatrices.append([iops] + lats,self.getThermalNote())
             totWriteIO += writeIO
             if i == 0:
                 logging.info("#If write IO stays steady, it will take "
@@ -697,8 +1301,7 @@ class SsdWriteSatTest(DeviceTest):
             if (totWriteIO * 1024) >= (devSzB * 4):
                 self.__rounds = i
                 break
-        self.__roundMatrices.append(iops_l)
-        self.__roundMatrices.append(lats_l)
+        self.__totWriteIO = totWriteIO
         logging.info("#Write saturation has written " + str(totWriteIO) + "KB")
 
     def run(self):
@@ -706,13 +1309,16 @@ class SsdWriteSatTest(DeviceTest):
         Start the rounds, log number of rounds until 4 times device size was written.
         @return True if all tests were run
         '''
-        try: 
-            self.getDevice().secureErase()
-        except RuntimeError:
-            logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
-            raise
+        if self.hasProgress():
+            logging.info("# Resuming from journal, skipping secure erase")
+        else:
+            try: 
+                self.getDevice().secureErase()
+            except RuntimeError:
+                logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
+                raise
         logging.info("########### Starting Write Saturation Test ###########")
-        self.runRounds()
+        self.measureRounds()
         self.toLog()
         return True
 
@@ -728,9 +1334,15 @@ class SsdWriteSatTest(DeviceTest):
         self.getFioJob().appendXml(r)
         # Add the options to xml
         self.getOptions().appendXml(r)
-        data = json.dumps(self.__roundMatrices)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        #keep the format of [iops list,latencies list]
+        rnds = self.__roundMatrices.getArray()
+        data = json.dumps([rnds[:,0].astype(int).tolist(),rnds[:,1:].tolist()])
         e = etree.SubElement(r,'roundmat')
         e.text = data
+        self.appendNotesXml(r,[self.__roundMatrices])
         data = json.dumps(self.__rounds)
         e = etree.SubElement(r,'rndnr')
         e.text = data
@@ -742,7 +1354,12 @@ class SsdWriteSatTest(DeviceTest):
         @param root Name of root element from which to load values
         '''
         logging.info("########### Loading write saturation test from "+self.getTestname()+".xml ###########")
-        self.__roundMatrices = json.loads(root.findtext('roundmat'))
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        iopsLats = json.loads(root.findtext('roundmat'))
+        self.__roundMatrices.fromList([[iops] + lats for iops,lats in zip(iopsLats[0],iopsLats[1])])
+        self.notesFromXml(root,[self.__roundMatrices])
         self.__rounds = json.loads(root.findtext('rndnr'))
         self.getFioJob().fromXml(root)
         self.getOptions().fromXml(root)
@@ -754,7 +1371,463 @@ class SsdWriteSatTest(DeviceTest):
         pgp.writeSatIOPSPlt(self)
         pgp.writeSatLatPlt(self)
 
-class HddIopsTest(DeviceTest):
+class SsdQosTest(DeviceTest):
+    '''
+    A class to carry out the QoS test, measuring the tail latency of 4k random
+    IO at a fixed offered load. For every workload the max IOPS are measured
+    first, then fio issues the IOs at fractions of it with poisson arrivals.
+    '''
+    ##Percentages of mixed workloads.
+    mixWlds = [100,70,0]
+    ##Offered loads in percent of the max IOPS of a workload.
+    loads = [10,20,30,40,50,60,70,80,90,100]
+    ##Latency objective in ms.
+    slo = 1.0
+    ##Completion latency percentile the objective holds for.
+    sloPct = 99.9
+    ##Merging the histograms of both directions gives exact percentiles of mixed workloads.
+    jsonPlus = True
+
+    def __init__(self,testname,device,options=None,plan=None):
+        '''
+        Constructor.
+        '''
+        super(SsdQosTest,self).__init__(testname,device,options,plan)
+        ## Max IOPS per workload, measured without a rate limit.
+        self.__maxIops = []
+        ## Per workload and load [offered IOPS,IOPS,completion latency percentiles].
+        self.__loadMatrices = []
+        ## Per workload and load the encoded completion latency histogram, None if not reported.
+        self.__histMatrices = []
+        self.getFioJob().addKVArg("rw","randrw")
+        self.getFioJob().addKVArg("bs","4k")
+        self.getFioJob().addKVArg("rate_process","poisson")
+
+    def getLoads(self): return self.getPlan().get('loads',self.loads)
+    def getSlo(self): return self.getPlan().get('slo',self.slo)
+    def getMaxIops(self): return self.__maxIops
+    def getLoadMatrices(self): return self.__loadMatrices
+    def getHistMatrices(self): return self.__histMatrices
+
+    def getSloIops(self):
+        '''
+        Return per workload the highest IOPS reached at an offered load whose
+        latency percentile, cf. sloPct, is within the objective.
+        @return A list of IOPS, 0 if no load met the objective.
+        '''
+        n = SsdLatencyTest.latPcts.index(self.sloPct)
+        sloIops = []
+        for row in self.__loadMatrices:
+            met = [l[1] for l in row if l[2 + n] <= self.getSlo() * 1000]
+            sloIops.append(max(met) if len(met) > 0 else 0)
+        return sloIops
+
+    def calcTables(self):
+        '''
+        Calculate the tables of the QoS test, rows are the workloads and columns
+        the offered loads. The 'iops' table holds the reached IOPS, the
+        percentile tables the completion latencies in ms.
+        '''
+        loads = np.array(self.__loadMatrices,dtype=float)
+        tables = {'iops':loads[...,1]}
+        for n,label in enumerate(SsdLatencyTest.pctLabels):
+            tables[label] = loads[...,2 + n] / 1000.0
+        return tables
+
+    def toLog(self):
+        '''
+        Log the max IOPS, the results per load and the IOPS within the objective.
+        '''
+        logging.info("Max IOPS: ")
+        logging.info(self.__maxIops)
+        logging.info("Load matrices: ")
+        logging.info(self.__loadMatrices)
+        logging.info("IOPS within the objective: ")
+        logging.info(self.getSloIops())
+
+    def testRound(self,mix,rate):
+        '''
+        Carry out 4k random IO of a workload at an offered load.
+        @param mix The percentage of reads of the workload.
+        @param rate The offered IOPS, 0 to run without a rate limit.
+        @return [IOPS,completion latency percentiles,encoded histogram or None]
+        '''
+        #split the offered IOPS like the workload, 0 means no limit
+        readRate = rate * mix // 100
+        writeRate = rate - readRate
+        #rate_iops limits every job, the max IOPS are reported for the whole group
+        nj = int(self.getFioJob().getKVArgs().get("numjobs","1"))
+        perJob = lambda r: max(r // nj,1) if r > 0 else 0
+        outs = self.runCells([{"rwmixread":str(mix),
+                               "rate_iops":str(perJob(readRate)) + "," + str(perJob(writeRate))}])
+        res = self.getFioJob().getResult(outs[0])
+        hist = res.getClatHist(mix > 0,mix < 100)
+        return [res.getIOPS(),res.getClatPcts(SsdLatencyTest.latPcts,mix > 0,mix < 100),
+                hist.encode() if hist != None else None]
+
+    def runRounds(self):
+        '''
+        Carry out the QoS test. For every workload the max IOPS are measured
+        without a rate limit, then every offered load is run.
+        '''
+        for mix in self.getMixWlds():
+            logging.info("#################")
+            logging.info("Workload " + str(mix) + "/" + str(100 - mix) + ", measuring max IOPS")
+            maxIops = self.doRound(mix,0)[0]
+            self.__maxIops.append(maxIops)
+            loadRow = []
+            histRow = []
+            for load in self.getLoads():
+                rate = max(maxIops * load // 100,1)
+                logging.info("Offered load " + str(load) + "%: " + str(rate) + " IOPS")
+                iops,pcts,hist = self.doRound(mix,rate)
+                loadRow.append([rate,iops] + pcts)
+                histRow.append(hist)
+            self.__loadMatrices.append(loadRow)
+            self.__histMatrices.append(histRow)
+        self.resetTables()
+
+    def run(self):
+        '''
+        Start the QoS test, log the IOPS within the objective.
+        @return True if all tests were run
+        '''
+        if self.hasProgress():
+            logging.info("# Resuming from journal, skipping secure erase and preconditioning")
+        else:
+            try:
+                self.getDevice().secureErase()
+            except RuntimeError:
+                logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
+                raise
+            try:
+                if self.getOptions() == None or self.getOptions().getNj() == None or self.getOptions().getIod() == None:
+                    self.getDevice().precondition(1,1)
+                else:
+                    self.getDevice().precondition(self.getOptions().getNj(),self.getOptions().getIod())
+            except RuntimeError:
+                logging.error("# Could not carry out preconditioning for "+self.getDevice().getDevPath())
+                raise
+        logging.info("########### Starting QoS Test ###########")
+        self.measureRounds()
+        self.toLog()
+        return True
+
+    def toXml(self,root):
+        '''
+        Get the Xml representation of the test.
+        @param root Name of the new root Xml node
+        @return An xml root element containing the information about the test
+        '''
+        r = etree.Element(root)
+        # Add Fio version to xml
+        self.getFioJob().appendXml(r)
+        # Add the options to xml
+        self.getOptions().appendXml(r)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        data = json.dumps(self.__maxIops)
+        e = etree.SubElement(r,'maxiops')
+        e.text = data
+        data = json.dumps(self.__loadMatrices)
+        e = etree.SubElement(r,'loadmat')
+        e.text = data
+        data = json.dumps(self.__histMatrices)
+        e = etree.SubElement(r,'histmat')
+        e.text = data
+        self.appendCellConvXml(r)
+        return r
+
+    def fromXml(self,root):
+        '''
+        Load and set from an XML representation of the QoS test.
+        @param root Name of root element from which to load values
+        '''
+        logging.info("########### Loading QoS test from "+self.getTestname()+".xml ###########")
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        self.__maxIops = json.loads(root.findtext('maxiops'))
+        self.__loadMatrices = json.loads(root.findtext('loadmat'))
+        if root.findtext('histmat'):
+            self.__histMatrices = [[str(e) if e != None else None for e in row]
+                                   for row in json.loads(root.findtext('histmat'))]
+        self.cellConvFromXml(root)
+        self.resetTables()
+        self.getFioJob().fromXml(root)
+        self.getOptions().fromXml(root)
+        self.toLog()
+
+    def genPlots(self):
+        ''' Generate plots for QoS. '''
+        import plots.genPlots as pgp
+        pgp.qosLoadPlt(self)
+
+class SsdScalingTest(DeviceTest):
+    '''
+    A class to carry out the scaling test, searching the lowest concurrency at
+    which 4k random IO reaches the saturation knee of the device. The iodepth
+    of one job and then the number of jobs are doubled until the IOPS stop
+    rising, then a binary search between the last two points of the doubling
+    finds the lowest point reaching a percentage of the peak IOPS.
+    '''
+    ##Percentages of mixed workloads.
+    mixWlds = [100,0]
+    ##Max iodepth of one job.
+    maxIod = 256
+    ##Max number of jobs.
+    maxNj = 64
+    ##Percentage of the peak IOPS the knee has to reach.
+    knee = 95
+    ##Min gain of IOPS in percent to go on doubling.
+    minGain = 5
+    ##Merging the histograms of both directions gives exact percentiles of mixed workloads.
+    jsonPlus = True
+
+    def __init__(self,testname,device,options=None,plan=None):
+        '''
+        Constructor.
+        '''
+        super(SsdScalingTest,self).__init__(testname,device,options,plan)
+        ## Per workload the measured points [numjobs,iodepth,IOPS,KB/s,mean lat,99th pct lat] in measured order.
+        self.__points = []
+        ## Per workload the point of the knee.
+        self.__knees = []
+        self.getFioJob().addKVArg("rw","randrw")
+        self.getFioJob().addKVArg("bs","4k")
+
+    def getMaxIod(self): return self.getPlan().get('maxiod',self.maxIod)
+    def getMaxNj(self): return self.getPlan().get('maxnj',self.maxNj)
+    def getKnee(self): return self.getPlan().get('knee',self.knee)
+    def getPoints(self): return self.__points
+    def getKnees(self): return self.__knees
+
+    def getPeaks(self):
+        ''' Return per workload the point with the highest IOPS. '''
+        return [max(points,key=lambda p: p[2]) for points in self.__points]
+
+    def toLog(self):
+        '''
+        Log the measured points and the knee of every workload.
+        '''
+        logging.info("Scaling points: ")
+        logging.info(self.__points)
+        logging.info("Knees: ")
+        logging.info(self.__knees)
+
+    def testRound(self,mix,nj,iod):
+        '''
+        Carry out 4k random IO of a workload at one concurrency.
+        @param mix The percentage of reads of the workload.
+        @param nj The number of jobs.
+        @param iod The iodepth of every job.
+        @return [numjobs,iodepth,IOPS,KB/s,mean lat,99th percentile completion lat]
+        '''
+        outs = self.runCells([{"rwmixread":str(mix),"numjobs":str(nj),"iodepth":str(iod)}])
+        res = self.getFioJob().getResult(outs[0])
+        return [nj,iod,res.getIOPS(),res.readBW + res.writeBW,res.getMeanLat(),
+                res.getClatPcts([99.0],mix > 0,mix < 100)[0]]
+
+    def measure(self,mix,nj,iod,points):
+        '''
+        Measure a point of the search, every point is only carried out once.
+        @param mix The percentage of reads of the workload.
+        @param nj The number of jobs.
+        @param iod The iodepth of every job.
+        @param points The points measured so far for the workload.
+        @return The result of testRound.
+        '''
+        for p in points:
+            if p[0] == nj and p[1] == iod:
+                return p
+        logging.info("#################")
+        logging.info("Workload " + str(mix) + "/" + str(100 - mix) + ", numjobs " + str(nj) + ", iodepth " + str(iod))
+        p = self.doRound(mix,nj,iod)
+        points.append(p)
+        return p
+
+    def searchKnee(self,mix,points):
+        '''
+        Search the knee of a workload. First the iodepth of one job is doubled,
+        then the number of jobs at the best iodepth, as long as the IOPS rise by
+        minGain percent. The knee is searched between the first point of the
+        doubling reaching the knee percentage of the peak IOPS and its
+        predecessor, by bisecting the doubled parameter.
+        @param mix The percentage of reads of the workload.
+        @param points The list the measured points are appended to.
+        @return The point of the knee.
+        '''
+        best = self.measure(mix,1,1,points)
+        path = [best]
+        #index 1 is the iodepth, index 0 the number of jobs
+        for k,limit in [(1,self.getMaxIod()),(0,self.getMaxNj())]:
+            while best[k] * 2 <= limit:
+                nxt = list(best[0:2])
+                nxt[k] *= 2
+                p = self.measure(mix,nxt[0],nxt[1],points)
+                path.append(p)
+                if p[2] < best[2] * (100 + self.minGain) / 100.0:
+                    break
+                best = p
+        target = max(p[2] for p in points) * self.getKnee() / 100.0
+        i = [p[2] >= target for p in path].index(True)
+        knee = path[i]
+        if i > 0:
+            #the predecessor halves the parameter the knee has been doubled in
+            k = 0 if knee[0] > 1 else 1
+            lo,hi = knee[k] // 2,knee[k]
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                coords = list(knee[0:2])
+                coords[k] = mid
+                p = self.measure(mix,coords[0],coords[1],points)
+                if p[2] >= target:
+                    hi = mid
+                    knee = p
+                else:
+                    lo = mid
+        logging.info("# Knee of workload " + str(mix) + "/" + str(100 - mix) + ": numjobs " + str(knee[0]) +
+                     ", iodepth " + str(knee[1]) + ", " + str(knee[2]) + " IOPS")
+        return knee
+
+    def runRounds(self):
+        '''
+        Search the knee of every workload.
+        '''
+        for mix in self.getMixWlds():
+            points = []
+            self.__knees.append(self.searchKnee(mix,points))
+            self.__points.append(points)
+
+    def run(self):
+        '''
+        Start the scaling test, log the knees.
+        @return True if all tests were run
+        '''
+        if self.hasProgress():
+            logging.info("# Resuming from journal, skipping secure erase and preconditioning")
+        else:
+            try:
+                self.getDevice().secureErase()
+            except RuntimeError:
+                logging.error("# Could not carry out secure erase for "+self.getDevice().getDevPath())
+                raise
+            try:
+                if self.getOptions() == None or self.getOptions().getNj() == None or self.getOptions().getIod() == None:
+                    self.getDevice().precondition(1,1)
+                else:
+                    self.getDevice().precondition(self.getOptions().getNj(),self.getOptions().getIod())
+            except RuntimeError:
+                logging.error("# Could not carry out preconditioning for "+self.getDevice().getDevPath())
+                raise
+        logging.info("########### Starting Scaling Test ###########")
+        self.measureRounds()
+        self.toLog()
+        return True
+
+    def toXml(self,root):
+        '''
+        Get the Xml representation of the test.
+        @param root Name of the new root Xml node
+        @return An xml root element containing the information about the test
+        '''
+        r = etree.Element(root)
+        # Add Fio version to xml
+        self.getFioJob().appendXml(r)
+        # Add the options to xml
+        self.getOptions().appendXml(r)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        data = json.dumps(self.__points)
+        e = etree.SubElement(r,'points')
+        e.text = data
+        data = json.dumps(self.__knees)
+        e = etree.SubElement(r,'knees')
+        e.text = data
+        self.appendCellConvXml(r)
+        return r
+
+    def fromXml(self,root):
+        '''
+        Load and set from an XML representation of the scaling test.
+        @param root Name of root element from which to load values
+        '''
+        logging.info("########### Loading scaling test from "+self.getTestname()+".xml ###########")
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        self.__points = json.loads(root.findtext('points'))
+        self.__knees = json.loads(root.findtext('knees'))
+        self.cellConvFromXml(root)
+        self.getFioJob().fromXml(root)
+        self.getOptions().fromXml(root)
+        self.toLog()
+
+    def genPlots(self):
+        ''' Generate plots for scaling. '''
+        import plots.genPlots as pgp
+        pgp.scalingPlt(self)
+
+class HddTest(DeviceTest):
+    '''
+    A test on HDDs dividing the device into getMaxRnds() zones, the zones can
+    be scanned by one Fio invocation per cell, cf. isZoned.
+    '''
+
+    def doZones(self,*args):
+        '''
+        Carry out one test cell on all zones of the device and journal its
+        result, cf. doRound.
+        @param args The arguments of testZones.
+        @return The result of testZones.
+        '''
+        return self.journaled(self.testZones,args)
+
+    def isZoned(self):
+        ''' Check if the zones of a device are scanned by one Fio invocation per cell. '''
+        return self.getOptions() != None and self.getOptions().getZoned() == True
+
+    def getZoneSize(self):
+        '''
+        Return the size of one zone in bytes if the device is divided into
+        getMaxRnds() zones. The size is aligned to 4096 bytes, as direct IO
+        must be aligned to the block size, this also holds for 512b sectors.
+        '''
+        size = self.getDevice().getDevSizeB() / self.getMaxRnds()
+        return size - (size % 4096)
+
+    def runZones(self,cell,size):
+        '''
+        Run a test cell on all zones of the device with one Fio invocation,
+        every zone is a section of the job file, cf. FioJob.startBatch.
+        @param cell A dictionary with the key value arguments of the cell.
+        @param size The size of a zone in bytes.
+        @return A list of Fio outputs, one output per zone.
+        '''
+        sections = []
+        for i in range(self.getMaxRnds()):
+            sec = dict(cell)
+            sec["offset"] = str(i * size)
+            sec["size"] = str(size)
+            sections.append(sec)
+        self.startTelemetry()
+        call,outs = self.getFioJob().startBatch(sections)
+        if call == False:
+            exit(1)
+        self.stopTelemetry(outs)
+        for k in sorted(cell.iterkeys()):
+            logging.info(k + ": " + cell[k])
+        logging.info("Zones: " + str(len(outs)) + ", zone size in byte: " + str(size))
+        logging.info("######")
+        return outs
+
+    @abstractmethod
+    def testZones(self,*args):
+        ''' Carry out one test cell on all zones, cf. runZones. '''
+
+class HddIopsTest(HddTest):
     '''
     A class to carry out the IOPS test on HDDs.
     '''
@@ -765,12 +1838,13 @@ class HddIopsTest(DeviceTest):
     ## Percentages of mixed workloads for IOPS test.
     mixWlds = [100,50,0]
     
-    def __init__(self,testname,device,options=None):
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Constructor.
         '''
-        super(HddIopsTest,self).__init__(testname,device,options)
-        self.__roundMatrices = []
+        super(HddIopsTest,self).__init__(testname,device,options,plan)
+        ## The collected fio measurement values of each round.
+        self.__roundMatrices = RoundStore((len(self.getMixWlds()),len(self.getBsLabels())),self.getMaxRnds(),int)
         self.getFioJob().addKVArg("rw","randrw")
 
     def getRndMatrices(self): return self.__roundMatrices
@@ -780,9 +1854,9 @@ class HddIopsTest(DeviceTest):
         Log information about IOPS test.
         '''
         logging.info("IOPS rounds: ")
-        logging.info(HddIopsTest.maxRnds)
+        logging.info(self.getMaxRnds())
         logging.info("Round matrices: ")
-        logging.info(self.__roundMatrices)
+        logging.info(self.__roundMatrices.toList())
 
     def toXml(self,root):
         '''
@@ -796,10 +1870,14 @@ class HddIopsTest(DeviceTest):
         self.getFioJob().appendXml(r)
         # Add the options to xml
         self.getOptions().appendXml(r)
-        data = json.dumps(self.__roundMatrices)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        data = json.dumps(self.__roundMatrices.toList())
         e = etree.SubElement(r,'roundmat')
         e.text = data
-        data = json.dumps(HddIopsTest.maxRnds)
+        self.appendCellConvXml(r)
+        data = json.dumps(self.getMaxRnds())
         e = etree.SubElement(r,'rndnr')
         e.text = data
         return r
@@ -810,7 +1888,11 @@ class HddIopsTest(DeviceTest):
         @param root Name of root element from which to load values
         '''
         logging.info("########### Loading IOPS test from "+self.getTestname()+".xml ###########")
-        self.__roundMatrices = json.loads(root.findtext('roundmat'))
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        self.__roundMatrices.fromList(json.loads(root.findtext('roundmat')))
+        self.cellConvFromXml(root)
         self.getFioJob().fromXml(root)
         self.getOptions().fromXml(root)
         self.toLog()
@@ -828,31 +1910,56 @@ class HddIopsTest(DeviceTest):
         self.getFioJob().addKVArg("size", str(size))
         #Iterate over mixed rand read and write and vary block size
         #save the output of fio for parsing and retreiving IOPS
-        jobOut = ''
+        cells = []
+        for i in self.getMixWlds():
+            for j in self.getBsLabels():
+                cells.append({"rwmixread":str(i),"bs":j})
+        outs = self.runCells(cells)
         rndMatrix = []
-        for i in HddIopsTest.mixWlds:
+        for i in range(len(self.getMixWlds())):
             rwRow = []
-            for j in HddIopsTest.bsLabels:
-                self.getFioJob().addKVArg("rwmixread",str(i))
-                self.getFioJob().addKVArg("bs",j)
-                call,jobOut = self.getFioJob().start()
-                if call == False:
-                    exit(1)
-                logging.info("mixLoad: " +str(i))
-                logging.info("bs: "+j)
-                logging.info(jobOut)
-                logging.info("######")
-                rwRow.append(self.getFioJob().getIOPS(jobOut))
+            for j in range(len(self.getBsLabels())):
+                res = self.getFioJob().getResult(outs[i * len(self.getBsLabels()) + j])
+                rwRow.append(res.getIOPS())
             rndMatrix.append(rwRow)
         return rndMatrix
 
+    def testZones(self,cell,size):
+        '''
+        Carry out one cell of the IOPS test on all zones of the device.
+        @param cell A dictionary with the mixed workload and block size.
+        @param size The size of a zone in bytes.
+        @return A list with the sum of average IOPS per zone.
+        '''
+        return [self.getFioJob().getResult(out).getIOPS() for out in self.runZones(cell,size)]
+
+    def runZoned(self):
+        '''
+        Run the IOPS HDD test as zoned scan, one Fio invocation per workload and
+        block size covers all zones. The results of the zones are the rounds.
+        '''
+        size = self.getZoneSize()
+        logging.info("Zone size in byte: "+str(size))
+        zones = []
+        for i in self.getMixWlds():
+            for j in self.getBsLabels():
+                zones.append(self.doZones({"rwmixread":str(i),"bs":j},size))
+        bsCount = len(self.getBsLabels())
+        for z in range(self.getMaxRnds()):
+            rndMatrix = []
+            for i in range(len(self.getMixWlds())):
+                rndMatrix.append([zones[i * bsCount + j][z] for j in range(bsCount)])
+            self.getRndMatrices().append(rndMatrix)
+
     def runRounds(self):
         '''
         Run the rounds for IOPS HDD test.
         '''
+        if self.isZoned():
+            return self.runZoned()
         rndMatrix = []
         devSizeKB = self.getDevice().getDevSizeKB()
-        increment = (devSizeKB * 1024) / self.maxRnds
+        increment = (devSizeKB * 1024) / self.getMaxRnds()
         #We must ensure that increment can be divided by 4096
         #as we need to align the direct IO to block size. If it
         #is an advanced sector format with 4k 4096 is ok, if the 
@@ -862,12 +1969,12 @@ class HddIopsTest(DeviceTest):
             increment = increment - rem
         logging.info("Increment in byte: "+str(increment))
         offset = 0
-        for i in range(HddIopsTest.maxRnds):
+        for i in range(self.getMaxRnds()):
             logging.info("#################")
             logging.info("Round nr. "+str(i))
             logging.info("Offset "+str(offset))
             #we read and write increment starting at the offset
-            rndMatrix = self.testRound(offset,increment)
+            rndMatrix = self.doRound(offset,increment)
             self.getRndMatrices().append(rndMatrix)
             offset += increment
         return
@@ -878,7 +1985,7 @@ class HddIopsTest(DeviceTest):
         @return True if all tests were run
         '''
         logging.info("########### Starting HDD IOPS Test ###########")
-        self.runRounds()
+        self.measureRounds()
         self.toLog()
         return True
 
@@ -887,7 +1994,7 @@ class HddIopsTest(DeviceTest):
         import plots.genPlots as pgp
         pgp.IOPSplot(self)
 
-class HddTPTest(DeviceTest):
+class HddTPTest(HddTest):
     '''
     A class to carry out the TP test on HDDs.
     '''
@@ -895,13 +2002,15 @@ class HddTPTest(DeviceTest):
     maxRnds = 128
     ##Labels of block sizes for throughput test
     bsLabels = ["1024k","4k"]
+    ##Fio's steady state detection uses the bandwidth
+    ssMetric = 'bw'
     
-    def __init__(self,testname,device,options=None):
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Constructor.
         '''
-        super(HddTPTest,self).__init__(testname,device,options)
-        ## A list of matrices with the collected fio measurement values of each round.
+        super(HddTPTest,self).__init__(testname,device,options,plan)
+        ## Per block size the collected [read,write] bandwidths of each round.
         self.__roundMatrices = []
 
     def getRndMatrices(self): return self.__roundMatrices
@@ -911,9 +2020,9 @@ class HddTPTest(DeviceTest):
         Log information about TP test.
         '''
         logging.info("TP rounds: ")
-        logging.info(HddTPTest.maxRnds)
+        logging.info(self.getMaxRnds())
         logging.info("Round matrices: ")
-        logging.info(self.__roundMatrices)
+        logging.info([s.getArray().T.tolist() for s in self.__roundMatrices])
 
     def toXml(self,root):
         '''
@@ -927,9 +2036,14 @@ class HddTPTest(DeviceTest):
         self.getFioJob().appendXml(r)
         # Add the options to xml
         self.getOptions().appendXml(r)
-        data = json.dumps(self.__roundMatrices)
+        self.appendPlanXml(r)
+        self.appendTelemetryXml(r)
+        self.appendWearXml(r)
+        #keep the format of [read list,write list] per block size
+        data = json.dumps([s.getArray().T.tolist() for s in self.__roundMatrices])
         e = etree.SubElement(r,'roundmat')
         e.text = data
+        self.appendCellConvXml(r)
         return r
 
     def fromXml(self,root):
@@ -938,7 +2052,15 @@ class HddTPTest(DeviceTest):
         @param root Name of root element from which to load values
         '''
         logging.info("########### Loading TP test from "+self.getTestname()+".xml ###########")
-        self.__roundMatrices = json.loads(root.findtext('roundmat'))
+        self.planFromXml(root)
+        self.telemetryFromXml(root)
+        self.wearFromXml(root)
+        self.__roundMatrices = []
+        for rw in json.loads(root.findtext('roundmat')):
+            store = RoundStore((2,),self.getMaxRnds(),int)
+            store.fromList(zip(*rw))
+            self.__roundMatrices.append(store)
+        self.cellConvFromXml(root)
         self.getFioJob().fromXml(root)
         self.getOptions().fromXml(root)
         self.toLog()
@@ -954,40 +2076,51 @@ class HddTPTest(DeviceTest):
         '''
         self.getFioJob().addKVArg("offset", str(offset))
         self.getFioJob().addKVArg("size", str(size))
-        self.getFioJob().addKVArg("bs",bs)
-        jobOut = ''
-        tpRead = 0 #read bandwidth
-        tpWrite = 0#write bandwidth
-
-        #start read tests
-        self.getFioJob().addKVArg("rw","read")
-        call,jobOut = self.getFioJob().start()
-        if call == False:
-            exit(1)
-        logging.info("Read TP test:")
-        logging.info(jobOut)
-        logging.info("######")
-        tpRead = self.getFioJob().getTPRead(jobOut)
-    
-        #start write tests
-        self.getFioJob().addKVArg("rw","write")
-        call,jobOut = self.getFioJob().start()
-        if call == False:
-            exit(1)
-        logging.info("Write TP test:")
-        logging.info(jobOut)
-        logging.info("######")
-        tpWrite = self.getFioJob().getTPWrite(jobOut)
+        #read test is carried out before write test
+        outs = self.runCells([{"bs":bs,"rw":"read"},{"bs":bs,"rw":"write"}])
+        tpRead = self.getFioJob().getResult(outs[0]).readBW
+        tpWrite = self.getFioJob().getResult(outs[1]).writeBW
         return [tpRead,tpWrite]
 
+    def testZones(self,cell,size):
+        '''
+        Carry out sequential read or write on all zones of the device.
+        @param cell A dictionary with the block size and read or write.
+        @param size The size of a zone in bytes.
+        @return A list with the read or write bandwidth per zone.
+        '''
+        outs = self.runZones(cell,size)
+        if cell["rw"] == "read":
+            return [self.getFioJob().getResult(out).readBW for out in outs]
+        return [self.getFioJob().getResult(out).writeBW for out in outs]
+
+    def runZoned(self):
+        '''
+        Run the TP HDD test as zoned scan, per block size one Fio invocation for
+        read and one for write covers all zones.
+        '''
+        size = self.getZoneSize()
+        logging.info("Zone size in byte: "+str(size))
+        for j in self.getBsLabels():
+            logging.info("#################")
+            logging.info("Current block size. "+str(j))
+            tpRead = self.doZones({"bs":j,"rw":"read"},size)
+            tpWrite = self.doZones({"bs":j,"rw":"write"},size)
+            tpRW = RoundStore((2,),self.getMaxRnds(),int)
+            for rw in zip(tpRead,tpWrite):
+                tpRW.append(rw)
+            self.getRndMatrices().append(tpRW)
+
     def runRounds(self):
         '''
         Run the rounds for TP HDD test.
         '''
+        if self.isZoned():
+            return self.runZoned()
         devSizeB = self.getDevice().getDevSizeB()
         #In each round the offset is incremented
         #if it can be divided by 512, we can also divide it by 128
-        increment = devSizeB / HddTPTest.maxRnds
+        increment = devSizeB / self.getMaxRnds()
         #we must ensure that increment can be divided by 4096
         #as we need to align the direct IO to block size. If it
         #is an advanced sector format with 4k 4096 is ok, if the 
@@ -997,24 +2130,22 @@ class HddTPTest(DeviceTest):
             increment = increment - rem
         logging.info("Increment in byte: "+str(increment))
         #Number of rounds are the same for IOPS and throughput
-        for j in HddTPTest.bsLabels:
-            tpRead_l = []
-            tpWrite_l = []
+        for j in self.getBsLabels():
+            tpRW = RoundStore((2,),self.getMaxRnds(),int)
             logging.info("#################")
             logging.info("Current block size. "+str(j))
             #set offset back for current bs
             offset = 0
-            for i in range(HddTPTest.maxRnds):
+            for i in range(self.getMaxRnds()):
                 logging.info("######")
                 logging.info("Round nr. "+str(i))
                 logging.info("Offset "+str(offset))
                 #we read and write increment starting at the offset
-                tpRead,tpWrite = self.testRound(j,offset,increment)
-                tpRead_l.append(tpRead)
-                tpWrite_l.append(tpWrite)
+                tpRead,tpWrite = self.doRound(j,offset,increment)
+                tpRW.append([tpRead,tpWrite])
                 offset += increment
             #finished current bs
-            self.getRndMatrices().append([tpRead_l,tpWrite_l])
+            self.getRndMatrices().append(tpRW)
 
     def run(self):
         '''
@@ -1022,7 +2153,7 @@ class HddTPTest(DeviceTest):
         @return True if all tests were run
         '''
         logging.info("########### Starting HDD TP Test ###########")
-        self.runRounds()
+        self.measureRounds()
         self.toLog()
         return True
 
@@ -14,6 +14,7 @@ from time import sleep
 from fio.FioJob import FioJob
 from system.OS import Storcli
 from system.OS import Mdadm
+from system.Discovery import BlockInfo
 
 
 class Device(object):
@@ -53,6 +54,12 @@ class Device(object):
         self.__devismounted = None
         ## Check if a valid partition is used
         self.__devisavailable = None
+        ## A fio server used for fio jobs run on the device, e.g. preconditioning
+        self.__fioServer = None
+        ## Waits until the device is idle, None to sleep for fixed times
+        self.__idleWaiter = None
+        ## Information about the block device from sysfs, read once per run
+        self.__blockInfo = BlockInfo(path)
 
     def getDevType(self): return self.__devtype
     def getDevPath(self): return self.__path
@@ -63,6 +70,9 @@ class Device(object):
     def getIntfce(self): return self.__intfce
     def getDevInfo(self): return self.__devinfo
     def getFeatureMatrix(self): return self.__featureMatrix
+    def getFioServer(self): return self.__fioServer
+    def getIdleWaiter(self): return self.__idleWaiter
+    def getBlockInfo(self): return self.__blockInfo
 
     def setDevInfo(self,dInfo):
         self.__devinfo = dInfo
@@ -78,6 +88,23 @@ class Device(object):
         self.__devismounted = im
     def setInterface(self,intf):
         self.__intfce = intf
+    def setFioServer(self,server):
+        self.__fioServer = server
+    def setIdleWaiter(self,waiter):
+        self.__idleWaiter = waiter
+
+    def waitIdle(self,label,fallback):
+        '''
+        Wait until previous operations on the device are finished. If an idle
+        waiter is set, wait until the device is idle, else sleep.
+        @param label A description of the wait, e.g. 'secure erase'.
+        @param fallback Seconds to sleep if the device statistics are not available.
+        '''
+        if self.__idleWaiter == None:
+            logging.info("# Sleeping for " + str(fallback) + " seconds...")
+            sleep(fallback)
+        else:
+            self.__idleWaiter.wait(label,fallback)
 
     def initialize(self):
         '''
@@ -106,93 +133,71 @@ class Device(object):
     def isMounted(self): return self.__devismounted
     def isAvailable(self): return self.__devisavailable
 
+    def readBlockInfo(self):
+        '''
+        Return the cached information about the block device, cf. BlockInfo.
+        @exception RuntimeError if the device is no block device.
+        '''
+        try:
+            return self.__blockInfo.get()
+        except (IOError,OSError),e:
+            logging.error("# Reading the block device information failed: " + str(e))
+            raise RuntimeError, "sysfs error"
+
     def calcDevSizeKB(self):
         '''
         Get the device size in KByte.
-        The function calls 'blockdev' to determine device sector size
-        and sector count.
+        The size and the logical block size are read from sysfs.
         @return Size on success
-        @exception RuntimeError if blockdev fails
-        '''
-        out = subprocess.Popen(['blockdev','--getss',self.__path],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        (stdout,stderr) = out.communicate()
-        if stderr != '':
-            logging.error("blockdev --getss encountered an error: " + stderr)
-            raise RuntimeError, "blockdev error"
-        else:
-            sectorSize = int(stdout)
-            out = subprocess.Popen(['blockdev','--getsz',self.__path],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-            (stdout,stderr) = out.communicate()
-            if stderr != '':
-                logging.error("blockdev --getsz encountered an error: " + stderr)
-                raise RuntimeError, "blockdev error"
-            else:
-                sectorCount = long(stdout)
-                if ((sectorCount * sectorSize) % 1024) != 0:
-                        logging.error("blockdev sector count cannot be divided by 1024")
-                        raise RuntimeError, "blockdev error"
-                devSzKB = (sectorCount * sectorSize) / 1024
-                logging.info("#Device" + self.__path + " sector count: " + str(sectorCount))
-                logging.info("#Device" + self.__path + " sector size: " + str(sectorSize))
-                logging.info("#Device" + self.__path + " size in KB: " + str(devSzKB))
-                return devSzKB
+        @exception RuntimeError if the size cannot be read
+        '''
+        info = self.readBlockInfo()
+        if (info['size'] % 1024) != 0:
+            logging.error("device size cannot be divided by 1024")
+            raise RuntimeError, "device size error"
+        devSzKB = info['size'] / 1024
+        logging.info("#Device" + self.__path + " sector count: " + str(info['size'] / info['logical']))
+        logging.info("#Device" + self.__path + " sector size: " + str(info['logical']))
+        logging.info("#Device" + self.__path + " size in KB: " + str(devSzKB))
+        return devSzKB
 
     def calcDevSizeB(self):
         '''
         Get the device size in Byte.
-        The function calls 'blockdev' to determine device sector size
-        and sector count.
+        The size is read from sysfs.
         @return Size on success
-        @exception RuntimeError if blockdev fails
+        @exception RuntimeError if the size cannot be read or is zero
         '''
-        out = subprocess.Popen(['blockdev','--getsize64',self.__path],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        (stdout,stderr) = out.communicate()
-        if stderr != '':
-            logging.error("blockdev --getss encountered an error: " + stderr)
-            raise RuntimeError, "blockdev error"
-        else:
-            byteSize = long(stdout)
-            if byteSize == 0:
-                logging.error("blockdev --getsize64 returned zero.")
-                raise RuntimeError, "blockdev error"
-            return byteSize
+        byteSize = self.readBlockInfo()['size']
+        if byteSize == 0:
+            logging.error("sysfs reports a size of zero.")
+            raise RuntimeError, "device size error"
+        return byteSize
 
     def checkDevIsMounted(self):
         '''
-        Check if the given device is mounted. As we work as
-        super user it is slightly dangerous to overwrite
-        a mounted partition.
+        Check if the given device or one of its partitions is mounted, or if
+        it is held by another device, e.g. a logical volume. As we work as
+        super user it is slightly dangerous to overwrite a mounted partition.
         @return True if device is mounted, False if not
-        @exception RuntimeError if mount command fails
+        @exception RuntimeError if the mounts cannot be read
         '''
-        out = subprocess.Popen(['mount','-l'],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        (stdout,stderr) = out.communicate()
-        if stderr != '':
-            logging.error("mount -l encountered an error: " + stderr)
-            raise RuntimeError, "mount command error"
-        else:
-            for line in stdout.split('\n'):
-                if line.find(self.__path) > -1:
-                    logging.info("#"+line)
-                    return True
-            return False
+        info = self.readBlockInfo()
+        for mount in info['mounts']:
+            logging.info("#" + mount[1] + " mounted on " + mount[0])
+        for holder in info['holders']:
+            logging.info("#" + self.__path + " is held by " + holder)
+        return len(info['mounts']) > 0 or len(info['holders']) > 0
 
     def checkDevIsAvbl(self):
         '''
         Check if the given device is a valid partition.
         @return True if yes, False if not.
         '''
-        out = subprocess.Popen(['cat','/proc/partitions'],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        (stdout,stderr) = out.communicate()
-        if stderr != '':
-            logging.error("cat /proc/partitions encountered an error: " + stderr)
-            raise RuntimeError, "cat /proc/partitions command error"
-        else:
-            for line in stdout.split('\n'):
-                if line.find(self.__path[5:]) > -1:
-                    logging.info("#"+line)
-                    return True
-            return False
+        info = self.readBlockInfo()
+        if info['listed']:
+            logging.info("#" + info['name'] + " is listed in /proc/partitions")
+        return info['listed']
 
     def readDevInfoFile(self,fd):
         '''
@@ -315,6 +320,12 @@ class Device(object):
         data = json.dumps(self.__devinfo)
         e = etree.SubElement(root,'devinfo')
         e.text = data
+        try:
+            data = json.dumps(self.__blockInfo.get())
+            e = etree.SubElement(root,'blockinfo')
+            e.text = data
+        except (IOError,OSError):
+            logging.warn("# No block device information for " + self.__path)
         if self.__featureMatrix != None:
             data = json.dumps(self.__featureMatrix)
             e = etree.SubElement(root,'featmatrix')
@@ -327,6 +338,8 @@ class Device(object):
         the object to be initialized.
         '''
         self.__devinfo = json.loads(root.findtext('devinfo'))
+        if root.findtext('blockinfo'):
+            self.__blockInfo.setInfo(json.loads(root.findtext('blockinfo')))
         if(root.findtext('featmatrix')):
             self.__devinfo = json.loads(root.findtext('featmatrix'))
         logging.info("# Loading device info from xml")
@@ -350,9 +363,8 @@ class SSD(Device):
         frozen = True
         security = False
         logging.info("# Starting Secure Erase for device: "+self.getDevPath())
-        #before starting the erase sleep, to ensure previous device operations are finished
-        logging.info("# Sleeping for 10 seconds...")
-        sleep(10)
+        #before starting the erase wait, to ensure previous device operations are finished
+        self.waitIdle('secure erase',10)
         if self.getIntfce() == None:
             out = subprocess.Popen(['hdparm','-I',self.getDevPath()],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
             (stdout,stderr) = out.communicate()
@@ -508,6 +520,7 @@ class SSD(Device):
         '''
         job = FioJob()
         job.initialize()
+        job.setServer(self.getFioServer())
         job.addKVArg("filename",self.getDevPath())
         job.addKVArg("bs","128k")
         job.addKVArg("rw","write")
@@ -580,6 +593,8 @@ class RAID(Device):
             # Create raid if it doesn't exist
             if not self.__raidTec.checkRaidPath():
                 self.__raidTec.createVD()
+            #read the block device information of the created raid on next use
+            self.getBlockInfo().setInfo(None)
             self.setDevSizeB(self.calcDevSizeB())
             self.setDevSizeKB(self.calcDevSizeKB())
             self.setDevIsMounted(self.checkDevIsMounted())
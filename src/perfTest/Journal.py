@@ -0,0 +1,104 @@
+''' @package Journal
+A module realizing an append-only journal of completed test rounds.
+'''
+import logging
+import json
+import os
+
+class Journal(object):
+    '''
+    An append-only journal, each line is a json record of one completed test
+    round. Records are written and synced to disk right after a round has
+    finished, so a crashed or interrupted performance test can be resumed
+    from its last completed round.
+    '''
+
+    def __init__(self,testname):
+        '''
+        Constructor
+        @param testname Name of the performance test, the journal is written
+        to 'testname.journal'.
+        '''
+        ## Path of the journal file
+        self.__path = testname + '.journal'
+        ## Records read from an existing journal, per test key
+        self.__records = {}
+        ## Information describing the journaled run, e.g. the device path
+        self.__header = None
+
+    def getPath(self): return self.__path
+    def getHeader(self): return self.__header
+
+    def getRecords(self,key):
+        '''
+        Return the journaled records of a test.
+        @param key The key of the test, e.g. 'iops'.
+        @return A list of records in the order they have been written.
+        '''
+        return self.__records.get(key,[])
+
+    def hasRecords(self):
+        ''' Check if any round has been journaled. '''
+        return len(self.__records) > 0
+
+    def create(self,header):
+        '''
+        Start a new, empty journal. An existing journal is overwritten.
+        @param header A dictionary describing the run, e.g. the device path.
+        '''
+        self.__records = {}
+        self.__header = header
+        fd = open(self.__path,'w')
+        fd.write(json.dumps({'header':header}) + '\n')
+        fd.flush()
+        os.fsync(fd.fileno())
+        fd.close()
+        logging.info("# Journaling completed rounds to " + self.__path)
+
+    def load(self):
+        '''
+        Read the records of an existing journal. A truncated last line, e.g.
+        from a crash during writing, is ignored.
+        @exception RuntimeError if the journal does not exist.
+        '''
+        if not os.path.isfile(self.__path):
+            logging.error("# Error: journal " + self.__path + " does not exist, cannot resume.")
+            raise RuntimeError, "journal file error"
+        self.__records = {}
+        fd = open(self.__path,'r+')
+        valid = 0
+        for line in iter(fd.readline,''):
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                logging.warn("# Ignoring incomplete journal record: " + line.strip())
+                break
+            valid = fd.tell()
+            if 'header' in rec:
+                self.__header = rec['header']
+            else:
+                self.__records.setdefault(rec['test'],[]).append(rec)
+        #cut off an incomplete record, new records are appended after the valid ones
+        fd.truncate(valid)
+        fd.close()
+        for k,v in self.__records.iteritems():
+            logging.info("# Journal holds " + str(len(v)) + " rounds of test " + k)
+
+    def append(self,key,data,cellConv=None,thermal=None):
+        '''
+        Append a completed round to the journal and sync it to disk.
+        @param key The key of the test, e.g. 'iops'.
+        @param data The result of the round as returned by testRound.
+        @param cellConv The early stop information of the round's cells.
+        @param thermal The thermal note of the round, cf. SmartProbe.compare.
+        '''
+        rec = {'test':key,'data':data}
+        if cellConv != None:
+            rec['cellconv'] = cellConv
+        if thermal != None:
+            rec['thermal'] = thermal
+        fd = open(self.__path,'a')
+        fd.write(json.dumps(rec) + '\n')
+        fd.flush()
+        os.fsync(fd.fileno())
+        fd.close()
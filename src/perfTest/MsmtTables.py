@@ -0,0 +1,46 @@
+''' @package MsmtTables
+A module calculating the measurement overview tables of the measurement window.
+'''
+import numpy as np
+
+## Statistics calculated for every cell of a measurement overview table.
+stats = ['mean','max','min','std','p50','p90','p99']
+
+def windowStat(window,stat):
+    '''
+    Calculate a statistic over the rounds of a measurement window.
+    @param window An array of the window rounds, the first axis are the rounds.
+    @param stat The statistic: 'mean', 'max', 'min', 'std' or a percentile like 'p99'.
+    @return An array of the round shape holding the statistic per cell.
+    @exception ValueError if the statistic is unknown.
+    '''
+    if stat == 'mean':
+        return np.mean(window,axis=0)
+    if stat == 'max':
+        return np.max(window,axis=0)
+    if stat == 'min':
+        return np.min(window,axis=0)
+    if stat == 'std':
+        return np.std(window,axis=0)
+    if stat.startswith('p'):
+        return np.percentile(window,float(stat[1:]),axis=0)
+    raise ValueError("unknown statistic " + stat)
+
+def windowStats(window):
+    '''
+    Calculate all statistics over the rounds of a measurement window.
+    @param window An array of the window rounds, the first axis are the rounds.
+    @return A dictionary of tables keyed by statistic, cf. stats.
+    '''
+    window = np.asarray(window,dtype=float)
+    return dict((s,windowStat(window,s)) for s in stats)
+
+def stackWindows(stores,rnds):
+    '''
+    Stack the measurement windows of multiple round stores, e.g. of one
+    [read,write] store per block size, to one window.
+    @param stores A list of RoundStore objects with the same round shape.
+    @param rnds The round numbers of the measurement window.
+    @return An array of shape (rounds,) + round shape + (len(stores),).
+    '''
+    return np.concatenate([s.window(rnds)[...,np.newaxis] for s in stores],axis=-1)
@@ -13,12 +13,32 @@ class Options(object):
     A class holding user defined options on command line.
     '''
 
-    def __init__(self, nj=1, iod=1, runtime=60, xargs=None):
+    def __init__(self, nj=1, iod=1, runtime=60, xargs=None, batch=False, server=False,
+                 earlyStop=None, fioSteady=False, stdyCrit=None, stdyWindow=None, stdyRnds=None,
+                 stdyAbort=False, twoPhase=False, singlePass=False, zoned=False,
+                 idleTime=None, idleTimeout=None, telemetry=False, smartProbe=None,
+                 exclThrottled=False):
         '''
         Constructor
         @param nj Number of jobs
         @param iod Number for io depth
         @param xargs Further argument as list for all fio jobs in tests
+        @param batch Run all cells of a test round in one fio invocation
+        @param server Send all fio jobs to a persistent fio server
+        @param earlyStop Tolerance in percent to stop a cell once its IOPS converged
+        @param fioSteady Let fio stop a cell once it detects a steady state
+        @param stdyCrit Name of the steady state criterion, cf. StdyCriteria
+        @param stdyWindow Number of rounds in the steady state measurement window
+        @param stdyRnds Max number of rounds until the steady state must be reached
+        @param stdyAbort Abort a test if the steady state forecast exceeds the max rounds
+        @param twoPhase Converge on 4k random write first, then run the full IOPS matrix
+        @param singlePass Run the write saturation as one fio job with per second logs
+        @param zoned Scan all zones of a hdd with one fio invocation per test cell
+        @param idleTime Seconds the device has to be idle between the tests
+        @param idleTimeout Max seconds to wait for the device to get idle
+        @param telemetry Sample host and device statistics while fio runs
+        @param smartProbe Name of the probe taking SMART snapshots per round, cf. SmartProbe
+        @param exclThrottled Exclude throttled rounds from the steady state window
         '''
         ## Number of jobs for fio.
         self.__nj = nj
@@ -28,15 +48,79 @@ class Options(object):
         self.__runtime = runtime
         ## Further single arguments as list for fio.
         self.__xargs = xargs
+        ## Run the cells of a round as one fio job file.
+        self.__batch = batch
+        ## Use a persistent fio server per device.
+        self.__server = server
+        ## Tolerance in percent for stopping a converged cell early.
+        self.__earlyStop = earlyStop
+        ## Use fio's steady state detection for every cell.
+        self.__fioSteady = fioSteady
+        ## Name of the steady state criterion.
+        self.__stdyCrit = stdyCrit
+        ## Rounds of the steady state measurement window.
+        self.__stdyWindow = stdyWindow
+        ## Max number of steady state test rounds.
+        self.__stdyRnds = stdyRnds
+        ## Abort tests not reaching the steady state by forecast.
+        self.__stdyAbort = stdyAbort
+        ## Run the IOPS test in two phases.
+        self.__twoPhase = twoPhase
+        ## Run the write saturation test in one pass.
+        self.__singlePass = singlePass
+        ## Run the hdd tests as zoned scans.
+        self.__zoned = zoned
+        ## Seconds of idleness to wait for between the tests.
+        self.__idleTime = idleTime
+        ## Max seconds to wait for the device to get idle.
+        self.__idleTimeout = idleTimeout
+        ## Sample host and device statistics while fio runs.
+        self.__telemetry = telemetry
+        ## Probe taking SMART snapshots per round, None if disabled.
+        self.__smartProbe = smartProbe
+        ## Don't accept a steady state window holding throttled rounds.
+        self.__exclThrottled = exclThrottled
 
     def getNj(self): return self.__nj
     def getIod(self): return self.__iod
     def getRuntime(self): return self.__runtime
     def getXargs(self): return self.__xargs
+    def getBatch(self): return self.__batch
+    def getServer(self): return self.__server
+    def getEarlyStop(self): return self.__earlyStop
+    def getFioSteady(self): return self.__fioSteady
+    def getStdyCrit(self): return self.__stdyCrit
+    def getStdyWindow(self): return self.__stdyWindow
+    def getStdyRnds(self): return self.__stdyRnds
+    def getStdyAbort(self): return self.__stdyAbort
+    def getTwoPhase(self): return self.__twoPhase
+    def getSinglePass(self): return self.__singlePass
+    def getZoned(self): return self.__zoned
+    def getIdleTime(self): return self.__idleTime
+    def getIdleTimeout(self): return self.__idleTimeout
+    def getTelemetry(self): return self.__telemetry
+    def getSmartProbe(self): return self.__smartProbe
+    def getExclThrottled(self): return self.__exclThrottled
     def setNj(self,nj): self.__nj = nj
     def setIod(self,iod): self.__iod = iod
     def setRuntime(self,rt): self.__runtime = rt
     def setXargs(self,xargs): self.__xargs = xargs
+    def setBatch(self,batch): self.__batch = batch
+    def setServer(self,server): self.__server = server
+    def setEarlyStop(self,es): self.__earlyStop = es
+    def setFioSteady(self,fs): self.__fioSteady = fs
+    def setStdyCrit(self,sc): self.__stdyCrit = sc
+    def setStdyWindow(self,sw): self.__stdyWindow = sw
+    def setStdyRnds(self,sr): self.__stdyRnds = sr
+    def setStdyAbort(self,sa): self.__stdyAbort = sa
+    def setTwoPhase(self,tp): self.__twoPhase = tp
+    def setSinglePass(self,sp): self.__singlePass = sp
+    def setZoned(self,z): self.__zoned = z
+    def setIdleTime(self,it): self.__idleTime = it
+    def setIdleTimeout(self,ito): self.__idleTimeout = ito
+    def setTelemetry(self,tm): self.__telemetry = tm
+    def setSmartProbe(self,sp): self.__smartProbe = sp
+    def setExclThrottled(self,xt): self.__exclThrottled = xt
     
     def appendXml(self,r):
         '''
@@ -60,6 +144,77 @@ class Options(object):
             e = etree.SubElement(r,'xargs')
             e.text = data
 
+        data = json.dumps(self.__batch)
+        e = etree.SubElement(r,'batch')
+        e.text = data
+
+        data = json.dumps(self.__server)
+        e = etree.SubElement(r,'fioserver')
+        e.text = data
+
+        if self.__earlyStop != None:
+            data = json.dumps(self.__earlyStop)
+            e = etree.SubElement(r,'earlystop')
+            e.text = data
+
+        data = json.dumps(self.__fioSteady)
+        e = etree.SubElement(r,'fiosteady')
+        e.text = data
+
+        if self.__stdyCrit != None:
+            data = json.dumps(self.__stdyCrit)
+            e = etree.SubElement(r,'stdycrit')
+            e.text = data
+
+        if self.__stdyWindow != None:
+            data = json.dumps(self.__stdyWindow)
+            e = etree.SubElement(r,'stdywindow')
+            e.text = data
+
+        if self.__stdyRnds != None:
+            data = json.dumps(self.__stdyRnds)
+            e = etree.SubElement(r,'stdyrnds')
+            e.text = data
+
+        data = json.dumps(self.__stdyAbort)
+        e = etree.SubElement(r,'stdyabort')
+        e.text = data
+
+        data = json.dumps(self.__twoPhase)
+        e = etree.SubElement(r,'twophase')
+        e.text = data
+
+        data = json.dumps(self.__singlePass)
+        e = etree.SubElement(r,'singlepass')
+        e.text = data
+
+        data = json.dumps(self.__zoned)
+        e = etree.SubElement(r,'zoned')
+        e.text = data
+
+        data = json.dumps(self.__telemetry)
+        e = etree.SubElement(r,'telemetry')
+        e.text = data
+
+        data = json.dumps(self.__exclThrottled)
+        e = etree.SubElement(r,'exclthrottled')
+        e.text = data
+
+        if self.__smartProbe != None:
+            data = json.dumps(self.__smartProbe)
+            e = etree.SubElement(r,'smartprobe')
+            e.text = data
+
+        if self.__idleTime != None:
+            data = json.dumps(self.__idleTime)
+            e = etree.SubElement(r,'idletime')
+            e.text = data
+
+        if self.__idleTimeout != None:
+            data = json.dumps(self.__idleTimeout)
+            e = etree.SubElement(r,'idletimeout')
+            e.text = data
+
     def fromXml(self,root):
         '''
         Loads the information about options from XML.
@@ -74,6 +229,38 @@ class Options(object):
             self.__runtime = json.loads(root.findtext('runtime'))
         if root.findtext('xargs'):
                 self.__xargs = json.loads(root.findtext('xargs'))
+        if root.findtext('batch'):
+            self.__batch = json.loads(root.findtext('batch'))
+        if root.findtext('fioserver'):
+            self.__server = json.loads(root.findtext('fioserver'))
+        if root.findtext('earlystop'):
+            self.__earlyStop = json.loads(root.findtext('earlystop'))
+        if root.findtext('fiosteady'):
+            self.__fioSteady = json.loads(root.findtext('fiosteady'))
+        if root.findtext('stdycrit'):
+            self.__stdyCrit = json.loads(root.findtext('stdycrit'))
+        if root.findtext('stdywindow'):
+            self.__stdyWindow = json.loads(root.findtext('stdywindow'))
+        if root.findtext('stdyrnds'):
+            self.__stdyRnds = json.loads(root.findtext('stdyrnds'))
+        if root.findtext('stdyabort'):
+            self.__stdyAbort = json.loads(root.findtext('stdyabort'))
+        if root.findtext('twophase'):
+            self.__twoPhase = json.loads(root.findtext('twophase'))
+        if root.findtext('singlepass'):
+            self.__singlePass = json.loads(root.findtext('singlepass'))
+        if root.findtext('zoned'):
+            self.__zoned = json.loads(root.findtext('zoned'))
+        if root.findtext('telemetry'):
+            self.__telemetry = json.loads(root.findtext('telemetry'))
+        if root.findtext('exclthrottled'):
+            self.__exclThrottled = json.loads(root.findtext('exclthrottled'))
+        if root.findtext('smartprobe'):
+            self.__smartProbe = json.loads(root.findtext('smartprobe'))
+        if root.findtext('idletime'):
+            self.__idleTime = json.loads(root.findtext('idletime'))
+        if root.findtext('idletimeout'):
+            self.__idleTimeout = json.loads(root.findtext('idletimeout'))
         logging.info("# Loading options from xml")
         logging.info("# Options nj:"+str(self.__nj))
         logging.info("# Options iod: "+str(self.__iod))
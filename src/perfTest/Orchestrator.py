@@ -0,0 +1,218 @@
+'''
+Created on Oct 18, 2026
+
+@author: gschoenb
+'''
+
+import logging
+import json
+import multiprocessing
+import os
+
+from perfTest.Devices import SSD
+from perfTest.Devices import HDD
+from perfTest.PerfTest import SsdPerfTest
+from perfTest.PerfTest import HddPerfTest
+from perfTest.TestPlan import TestPlan
+
+def getController(path):
+    '''
+    Get the controller (host adapter) a block device is attached to.
+    The controller is read from the sysfs path of the device, e.g. 'host2'
+    for SCSI/SATA devices or the PCI address of a NVMe controller.
+    @param path The device path, e.g. /dev/sdb
+    @return The controller name or the device path if it cannot be determined.
+    '''
+    dev = os.path.basename(os.path.realpath(path))
+    sysPath = os.path.realpath('/sys/block/' + dev + '/device')
+    parts = sysPath.split('/')
+    for p in parts:
+        if p.startswith('host'):
+            return p
+    #nvme namespaces: the controller is the pci device before 'nvme'
+    for i,p in enumerate(parts):
+        if p == 'nvme' and i > 0:
+            return parts[i - 1]
+    return path
+
+def runDevice(mode,dev,options,plan,resume,genReport,sems):
+    '''
+    Run the performance test of one device, used as target of a process.
+    Each device writes its own log, xml, journal and rst report named after its test name.
+    @param mode The test mode, 'ssd' or 'hdd'.
+    @param dev A dictionary describing the device, cf. Orchestrator.addDevice.
+    @param options The options used for the tests.
+    @param plan The TestPlan of the device.
+    @param resume Continue an interrupted test from its journal.
+    @param genReport Command to generate the pdf report, None to skip it.
+    @param sems A list of semaphores that must be acquired in order before testing.
+    '''
+    # Each process logs to its own file
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    logging.basicConfig(filename=dev['testname']+'.log',level=root.level,
+                        format='%(asctime)s %(name)-8s %(levelname)-8s %(message)s',
+                        datefmt='%Y%m%d %H:%M')
+    for s in sems:
+        s.acquire()
+    try:
+        if mode == 'ssd':
+            device = SSD(mode,dev['device'],dev['testname'])
+        else:
+            device = HDD(mode,dev['device'],dev['testname'])
+        if dev.get('interface') != None:
+            device.setInterface(dev['interface'])
+        if mode == 'ssd':
+            test = SsdPerfTest(dev['testname'],device,options,plan)
+        else:
+            test = HddPerfTest(dev['testname'],device,options,plan)
+        test.setResume(resume)
+        test.initialize()
+        test.setCmdLineArgs("tkperf-multi " + mode + " " + dev['testname'] + " " + dev['device'])
+        if dev.get('desc_file') != None:
+            device.readDevInfoFile(open(dev['desc_file'],'r'))
+        if not device.isInitialized():
+            logging.error("# Error: no device information for " + dev['device'] + ", use a description file.")
+            raise RuntimeError, "device info error"
+        if device.isMounted():
+            logging.error("# Error: " + dev['device'] + " is mounted, skipping the device.")
+            raise RuntimeError, "device mounted error"
+        test.run()
+        if genReport != None:
+            test.getRstReport().toPDF(genReport)
+    except RuntimeError:
+        logging.error("# Running the tests of " + dev['device'] + " failed.")
+        exit(1)
+    finally:
+        for s in reversed(sems):
+            s.release()
+
+class Orchestrator(object):
+    '''
+    Runs the performance tests of multiple devices concurrently. Each device
+    is tested in its own process. The number of devices tested at the same
+    time can be limited per controller, to keep shared links from saturating.
+    '''
+
+    def __init__(self,mode,options,maxPerCtrl=None,maxParallel=None,plan=None,resume=False):
+        '''
+        Constructor
+        @param mode The test mode for all devices, 'ssd' or 'hdd'.
+        @param options The options used for the tests of all devices.
+        @param maxPerCtrl Max number of devices tested at once per controller.
+        @param maxParallel Max number of devices tested at once overall.
+        @param plan The TestPlan of devices without an own plan, None for the defaults.
+        @param resume Continue interrupted tests from their journals.
+        '''
+        ## The test mode of the devices
+        self.__mode = mode
+        ## User defined options
+        self.__options = options
+        ## Concurrency limit per controller
+        self.__maxPerCtrl = maxPerCtrl
+        ## Overall concurrency limit
+        self.__maxParallel = maxParallel
+        ## Test plan of devices without an own plan
+        self.__plan = TestPlan(mode) if plan == None else plan
+        ## Continue interrupted tests from their journals
+        self.__resume = resume
+        ## List of device dictionaries to test
+        self.__devices = []
+        ## Exit codes of the device processes, per test name
+        self.__results = {}
+
+    def getDevices(self): return self.__devices
+    def getResults(self): return self.__results
+    def getPlan(self): return self.__plan
+
+    def getPlans(self):
+        ''' Return the test plans of all devices, a device without an own plan uses the common one. '''
+        return [self.__plan] + [d['plan'] for d in self.__devices if d['plan'] != None]
+
+    def addDevice(self,path,testname,ctrl=None,intfce=None,descFile=None,plan=None):
+        '''
+        Add a device to test.
+        @param path The device path, e.g. /dev/sdb
+        @param testname Name of the test, specifies the output files.
+        @param ctrl The controller of the device, detected via sysfs if None.
+        @param intfce A specific device interface, e.g. sas or nvme.
+        @param descFile Path to a description file of the device.
+        @param plan A TestPlan for the device, None to use the common plan.
+        '''
+        for d in self.__devices:
+            if d['testname'] == testname:
+                logging.error("# Error: test name " + testname + " is used twice.")
+                raise RuntimeError, "duplicate test name error"
+        if ctrl == None:
+            ctrl = getController(path)
+        self.__devices.append({'device':path,'testname':testname,'controller':ctrl,
+                               'interface':intfce,'desc_file':descFile,'plan':plan})
+
+    def fromConfig(self,fd):
+        '''
+        Add the devices from a json config file, e.g.
+        {"maxperctrl": 4, "devices": [{"device": "/dev/sdb", "testname": "bay1",
+        "controller": "hba0", "test_plan": "plan.json"}]}
+        @param fd An already opened file descriptor for the config file.
+        @exception ValueError if the test plan of a device is invalid.
+        '''
+        decoded = json.load(fd)
+        if "maxperctrl" in decoded:
+            self.__maxPerCtrl = decoded["maxperctrl"]
+        if "maxparallel" in decoded:
+            self.__maxParallel = decoded["maxparallel"]
+        if "devices" not in decoded:
+            logging.error("# Error: config file does not contain any devices.")
+            raise RuntimeError, "config file error"
+        for d in decoded["devices"]:
+            plan = None
+            if d.get("test_plan") != None:
+                planFd = open(d["test_plan"],'r')
+                try:
+                    plan = TestPlan.fromFile(self.__mode,planFd)
+                except ValueError,e:
+                    logging.error("# Error: invalid test plan " + d["test_plan"] + ": " + str(e))
+                    raise
+                finally:
+                    planFd.close()
+            self.addDevice(d["device"],d["testname"],d.get("controller"),
+                           d.get("interface"),d.get("desc_file"),plan)
+
+    def run(self,genReport=None):
+        '''
+        Test all devices concurrently and wait for all of them to finish.
+        @param genReport Command to generate the pdf reports, None to skip it.
+        @return True if all device tests succeeded, False if not.
+        '''
+        ctrlSems = {}
+        allSem = None
+        if self.__maxParallel != None:
+            allSem = multiprocessing.Semaphore(self.__maxParallel)
+        ps = []
+        for d in self.__devices:
+            #the controller slot is taken first, else a device waiting for its busy
+            #controller would hold a global slot and block devices on idle controllers
+            sems = []
+            if self.__maxPerCtrl != None:
+                if d['controller'] not in ctrlSems:
+                    ctrlSems[d['controller']] = multiprocessing.Semaphore(self.__maxPerCtrl)
+                sems.append(ctrlSems[d['controller']])
+            if allSem != None:
+                sems.append(allSem)
+            logging.info("# Starting test " + d['testname'] + " on " + d['device'] +
+                         " (controller " + d['controller'] + ")")
+            p = multiprocessing.Process(target=runDevice,name=d['testname'],
+                                        args=(self.__mode,d,self.__options,
+                                              d['plan'] if d['plan'] != None else self.__plan,
+                                              self.__resume,genReport,sems))
+            ps.append(p)
+            p.start()
+        for p in ps:
+            p.join()
+            self.__results[p.name] = p.exitcode
+            if p.exitcode != 0:
+                logging.error("# Test " + p.name + " failed with exit code " + str(p.exitcode))
+            else:
+                logging.info("# Test " + p.name + " finished")
+        return all(c == 0 for c in self.__results.itervalues())
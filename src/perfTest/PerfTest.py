@@ -6,17 +6,20 @@ Created on 07.08.2012
 __version__ = '2.1'
 
 import logging
-import subprocess
 from lxml import etree
 import json
 import datetime
-import os
-import time
 
 import perfTest.DeviceTests as dt
 from perfTest.Devices import SSD
 from perfTest.Devices import HDD
 from perfTest.Options import Options
+from perfTest.Journal import Journal
+from perfTest.TestPlan import TestPlan
+from fio.FioJob import FioJob
+from fio.FioServer import FioServer
+from system.IdleWaiter import IdleWaiter
+from system.Discovery import osInfo
 from reports.XmlReport import XmlReport
 from reports.RstReport import RstReport
 
@@ -25,11 +28,13 @@ class PerfTest(object):
     A performance test, consists of multiple Device Tests.
     '''
     
-    def __init__(self,testname,device):
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         A performance test has several reports and plots.
         @param testname Name of the performance test.
         @param device A Device object, the device to run tests on.
+        @param options User defined options for the tests.
+        @param plan The TestPlan stating which tests are run and how.
         '''
         ## The output file for the fio job test results.
         self.__testname = testname
@@ -59,6 +64,21 @@ class PerfTest(object):
         ## Hold the command line used to call the test
         self.__cmdLineArgs = None
 
+        ## User defined options
+        self.__options = options
+
+        ## A fio server running all fio jobs on the device
+        self.__fioServer = None
+
+        ## Journal of the completed test rounds
+        self.__journal = None
+
+        ## Resume the tests from the rounds of an existing journal
+        self.__resume = False
+
+        ## Plan of the tests to carry out
+        self.__plan = plan
+
     def getTestname(self): return self.__testname
     def getDevice(self): return self.__device
     def getTestDate(self): return self.__testDate
@@ -68,31 +88,21 @@ class PerfTest(object):
     def getTests(self): return self.__tests
     def getXmlReport(self): return self.__xmlReport
     def getRstReport(self): return self.__rstReport
+    def getOptions(self): return self.__options
+    def getFioServer(self): return self.__fioServer
+    def getJournal(self): return self.__journal
+    def isResume(self): return self.__resume
+    def getPlan(self): return self.__plan
+
+    def setResume(self,r): self.__resume = r
 
     def collOSInfos(self):
         '''
-        Collects some information about the current OS in use.
+        Collects some information about the current OS in use, cf. Discovery.osInfo.
         @return True if all infos are present, False on error.
         '''
-        out = subprocess.Popen(['uname','-r'],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        (stdout,stderr) = out.communicate()
-        if stderr != '':
-            logging.error("uname -r encountered an error: " + stderr)
-            return False
-        else:
-            self.__OSInfo['kernel'] = stdout
-        #Check if we are on red hat based distributions
-        if os.path.isfile('/etc/redhat-release'):
-            out = subprocess.Popen(['cat','/etc/redhat-release'],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        else:
-            out = subprocess.Popen(['lsb_release','-d'],stdout=subprocess.PIPE,stderr=subprocess.PIPE)
-        (stdout,stderr) = out.communicate()
-        if stderr != '':
-            logging.error("getting OS information encountered an error: " + stderr)
-            return False
-        else:
-            self.__OSInfo['lsb'] = stdout
-        return True
+        self.__OSInfo.update(osInfo())
+        return 'lsb' in self.__OSInfo
 
     def readCmdLineArgs(self,argv):
         '''
@@ -159,6 +169,62 @@ class PerfTest(object):
             logging.info("# Initialiazing test "+k)
             v.initialize()
 
+    def startFioServer(self):
+        '''
+        Start a persistent fio server for the device if requested in the options.
+        All tests and the device send their fio jobs to this server.
+        '''
+        if self.__options == None or not self.__options.getServer():
+            return
+        self.__fioServer = FioServer(self.__testname)
+        self.__fioServer.start(FioJob.cachedPath)
+        self.__device.setFioServer(self.__fioServer)
+        for v in self.__tests.itervalues():
+            v.getFioJob().setServer(self.__fioServer)
+
+    def stopFioServer(self):
+        ''' Stop the fio server if one has been started. '''
+        if self.__fioServer == None:
+            return
+        self.__device.setFioServer(None)
+        for v in self.__tests.itervalues():
+            v.getFioJob().setServer(None)
+        self.__fioServer.stop()
+        self.__fioServer = None
+
+    def initIdleWaiter(self):
+        '''
+        Let the device wait until it is idle between the tests, instead of
+        sleeping for fixed times. The idle period and timeout are taken from
+        the options.
+        '''
+        idle = None
+        timeout = None
+        if self.__options != None:
+            idle = self.__options.getIdleTime()
+            timeout = self.__options.getIdleTimeout()
+        self.__device.setIdleWaiter(IdleWaiter(self.__device.getDevPath(),idle,timeout))
+
+    def openJournal(self):
+        '''
+        Open the journal of completed test rounds for all tests. If the test is
+        resumed, the rounds of the existing journal are restored, else a new
+        journal is started.
+        @exception RuntimeError if the journal belongs to another device.
+        '''
+        self.__journal = Journal(self.__testname)
+        header = {'device':self.__device.getDevPath()}
+        if self.__resume:
+            self.__journal.load()
+            old = self.__journal.getHeader()
+            if old != None and old['device'] != header['device']:
+                logging.error("# Error: journal " + self.__journal.getPath() + " has been written for " + old['device'])
+                raise RuntimeError, "journal device error"
+        else:
+            self.__journal.create(header)
+        for k,v in self.__tests.iteritems():
+            v.setJournal(self.__journal,k)
+
     def runTests(self):
         '''
         Call the run method of every test in the test dictionary. The run method
@@ -168,10 +234,9 @@ class PerfTest(object):
         sorted(self.__tests.items())
         for k,v in self.__tests.items():
             print "Starting test: " + k
-            #before each test sleep, to ensure device operations of previous
+            #before each test wait, to ensure device operations of previous
             #tests are finished
-            logging.info("# Sleeping for 5 seconds...")
-            time.sleep(5)
+            self.__device.waitIdle('test ' + k,5)
             v.run()
 
     def genPlots(self):
@@ -212,6 +277,10 @@ class PerfTest(object):
         if self.__cmdLineArgs != None:
             dev = etree.SubElement(e,'cmdline')
             dev.text = json.dumps(self.__cmdLineArgs)
+        # Add the measured waits for the device to get idle
+        if self.getDevice().getIdleWaiter() != None:
+            dev = etree.SubElement(e,'idlewaits')
+            dev.text = json.dumps(self.getDevice().getIdleWaiter().getWaits())
         # Call the xml function for every test in the dictionary
         sorted(self.__tests.items())
         for k,v in tests.iteritems():
@@ -267,6 +336,10 @@ class PerfTest(object):
                         test = dt.SsdTPTest(self.getTestname(),device,options)
                     if elem.tag == SsdPerfTest.wrKey:
                         test = dt.SsdWriteSatTest(self.getTestname(),device,options)
+                    if elem.tag == SsdPerfTest.qosKey:
+                        test = dt.SsdQosTest(self.getTestname(),device,options)
+                    if elem.tag == SsdPerfTest.scaleKey:
+                        test = dt.SsdScalingTest(self.getTestname(),device,options)
                     #we found a tag in the xml file, now we can read the data from xml
                     if test != None:
                         test.fromXml(elem)
@@ -287,7 +360,13 @@ class PerfTest(object):
 
     def run(self):
         ''' The main run method, runs tests, generates plots and rst report. '''
-        self.runTests()
+        self.initIdleWaiter()
+        self.openJournal()
+        self.startFioServer()
+        try:
+            self.runTests()
+        finally:
+            self.stopFioServer()
         self.toXml()
         self.genPlots()
         self.toRst()
@@ -301,27 +380,35 @@ class SsdPerfTest(PerfTest):
     latKey = 'lat'
     tpKey = 'tp'
     wrKey = 'writesat'
+    qosKey = 'qos'
+    scaleKey = 'scale'
     ## Keys for the tests carried out
-    testKeys = [iopsKey,latKey,tpKey,wrKey]
+    testKeys = [iopsKey,latKey,tpKey,wrKey,qosKey,scaleKey]
 
-    def __init__(self,testname,device,options=None):
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Cf. super constructor.
         '''
-        PerfTest.__init__(self, testname, device)
+        if plan == None:
+            plan = TestPlan('ssd')
+        PerfTest.__init__(self, testname, device, options, plan)
         #Add current date to test
         now = datetime.datetime.now()
         self.setTestDate(now.strftime("%Y-%m-%d"))
         #Add every test to the performance test
-        for testType in SsdPerfTest.testKeys:
+        for testType in plan.getTestKeys():
             if testType == SsdPerfTest.iopsKey:
-                test = dt.SsdIopsTest(testname,device,options)
+                test = dt.SsdIopsTest(testname,device,options,plan.getSettings(testType))
             if testType == SsdPerfTest.latKey:
-                test = dt.SsdLatencyTest(testname,device,options)
+                test = dt.SsdLatencyTest(testname,device,options,plan.getSettings(testType))
             if testType == SsdPerfTest.tpKey:
-                test = dt.SsdTPTest(testname,device,options)
+                test = dt.SsdTPTest(testname,device,options,plan.getSettings(testType))
             if testType == SsdPerfTest.wrKey:
-                test = dt.SsdWriteSatTest(testname,device,options)
+                test = dt.SsdWriteSatTest(testname,device,options,plan.getSettings(testType))
+            if testType == SsdPerfTest.qosKey:
+                test = dt.SsdQosTest(testname,device,options,plan.getSettings(testType))
+            if testType == SsdPerfTest.scaleKey:
+                test = dt.SsdScalingTest(testname,device,options,plan.getSettings(testType))
             #Add the test to the key/value structure
             self.addTest(testType, test)
 
@@ -338,6 +425,7 @@ class SsdPerfTest(PerfTest):
         #add the device information and the feature matrix for one device
         for keys in tests.iterkeys():
             rst.addDevInfo(tests[keys].getDevice().getDevInfo(),tests[keys].getDevice().getFeatureMatrix())
+            rst.addBlockInfo(tests[keys].getDevice().getBlockInfo().getInfo())
             break
         rst.addCmdLine(self.getCmdLineArgs())
         
@@ -358,7 +446,7 @@ class SsdPerfTest(PerfTest):
             for i,fig in enumerate(tests['iops'].getFigures()):
                 rst.addFigure(fig,'ssd','iops',i)
             rst.addSection("Measurement Window Summary Table")
-            rst.addTable(tests['iops'].getTables()[0],dt.SsdIopsTest.bsLabels,'iops')
+            rst.addTable(tests['iops'].getTable('mean'),tests['iops'].getBsLabels(),'iops',tests['iops'].getMixWlds())
         if SsdPerfTest.tpKey in tests:
             rst.addChapter("Throughput")
             rst.addTestInfo('ssd','tp',tests['tp'])
@@ -366,7 +454,7 @@ class SsdPerfTest(PerfTest):
             for i,fig in enumerate(tests['tp'].getFigures()):
                 rst.addFigure(fig,'ssd','tp',i)
             rst.addSection("Measurement Window Summary Table")    
-            rst.addTable(tests['tp'].getTables()[0],dt.SsdTPTest.bsLabels,'tp')
+            rst.addTable(tests['tp'].getTable('mean'),tests['tp'].getBsLabels(),'tp')
         if SsdPerfTest.latKey in tests:
             rst.addChapter("Latency")
             rst.addTestInfo('ssd','lat',tests['lat'])
@@ -377,14 +465,37 @@ class SsdPerfTest(PerfTest):
                 if i == 2 or i == 3: continue
                 rst.addFigure(fig,'ssd','lat',i)
             rst.addSection("Measurement Window Summary Table")    
-            rst.addTable(tests['lat'].getTables()[0],dt.SsdLatencyTest.bsLabels,'avg-lat')#avg lat 
-            rst.addTable(tests['lat'].getTables()[1],dt.SsdLatencyTest.bsLabels,'max-lat')#max lat
+            rst.addTable(tests['lat'].getTable('mean'),tests['lat'].getBsLabels(),'avg-lat',tests['lat'].getMixWlds())#avg lat 
+            rst.addTable(tests['lat'].getTable('max'),tests['lat'].getBsLabels(),'max-lat',tests['lat'].getMixWlds())#max lat
+            #tail latencies, not available if loaded from an older xml
+            for pct in ['clat-p99','clat-p99.99']:
+                if pct in tests['lat'].getTables():
+                    rst.addTable(tests['lat'].getTable(pct),tests['lat'].getBsLabels(),pct,tests['lat'].getMixWlds())
         if SsdPerfTest.wrKey in tests:
             rst.addChapter("Write Saturation")
             rst.addTestInfo('ssd','writesat',tests['writesat'])
             rst.addSection("Measurement Plots")
             for i,fig in enumerate(tests['writesat'].getFigures()):
                 rst.addFigure(fig,'ssd','writesat',i)
+        if SsdPerfTest.qosKey in tests:
+            rst.addChapter("QoS")
+            rst.addTestInfo('ssd','qos',tests['qos'])
+            rst.addSection("Measurement Plots")
+            for i,fig in enumerate(tests['qos'].getFigures()):
+                rst.addFigure(fig,'ssd','qos',i)
+            rst.addSection("Measurement Summary Table")
+            loads = [str(l) + '%' for l in tests['qos'].getLoads()]
+            rst.addTable(tests['qos'].getTable('clat-p99.9'),loads,'qos-lat',tests['qos'].getMixWlds())
+        if SsdPerfTest.scaleKey in tests:
+            rst.addChapter("Scaling")
+            rst.addTestInfo('ssd','scale',tests['scale'])
+            rst.addSection("Measurement Plots")
+            for i,fig in enumerate(tests['scale'].getFigures()):
+                rst.addFigure(fig,'ssd','scale',i)
+        wears = [[k,tests[k].getWear()] for k in SsdPerfTest.testKeys if k in tests and tests[k].getWear() != None]
+        if len(wears) > 0:
+            rst.addChapter("Endurance")
+            rst.addWearInfo(wears)
 
         rst.toRstFile()
 
@@ -398,20 +509,22 @@ class HddPerfTest(PerfTest):
     ## Keys valid for test dictionary and xml file
     testKeys = [iopsKey,tpKey]
 
-    def __init__(self,testname,device,options=None):
+    def __init__(self,testname,device,options=None,plan=None):
         '''
         Cf. super constructor.
         '''
-        PerfTest.__init__(self, testname, device)
+        if plan == None:
+            plan = TestPlan('hdd')
+        PerfTest.__init__(self, testname, device, options, plan)
         #Add current date
         now = datetime.datetime.now()
         self.setTestDate(now.strftime("%Y-%m-%d"))
         #Add every test to the performance test
-        for testType in HddPerfTest.testKeys:
+        for testType in plan.getTestKeys():
             if testType == HddPerfTest.iopsKey:
-                test = dt.HddIopsTest(testname,device,options)
+                test = dt.HddIopsTest(testname,device,options,plan.getSettings(testType))
             if testType == HddPerfTest.tpKey:
-                test = dt.HddTPTest(testname,device,options)
+                test = dt.HddTPTest(testname,device,options,plan.getSettings(testType))
             #add the test to the key/value structure
             self.addTest(testType, test)
 
@@ -427,6 +540,7 @@ class HddPerfTest(PerfTest):
         #add the device information and the feature matrix for one device
         for keys in tests.iterkeys():
             rst.addDevInfo(tests[keys].getDevice().getDevInfo(),tests[keys].getDevice().getFeatureMatrix())
+            rst.addBlockInfo(tests[keys].getDevice().getBlockInfo().getInfo())
             break
         rst.addCmdLine(self.getCmdLineArgs())
         
@@ -0,0 +1,109 @@
+''' @package RoundStore
+A module holding the round results of a device test in a NumPy array.
+'''
+import numpy as np
+
+class RoundStore(object):
+    '''
+    A container for the results of the test rounds. The results of all rounds
+    are kept in one preallocated array of shape (rounds,) + shape, e.g.
+    (rounds, workloads, block sizes) for IOPS or (rounds, workloads, block
+    sizes, [min,max,mean]) for latencies. The array grows by doubling its
+    capacity, so appending a round does not copy the previous rounds. Every
+    round can carry a note, e.g. the thermal state of the device in the round.
+    '''
+
+    def __init__(self,shape,capacity=32,dtype=float):
+        '''
+        Constructor
+        @param shape The shape of the result of one round, a tuple.
+        @param capacity Number of rounds to preallocate.
+        @param dtype The data type of the values, e.g. int for IOPS.
+        '''
+        ## Shape of one round
+        self.__shape = tuple(shape)
+        ## Data type of the stored values
+        self.__dtype = dtype
+        ## Preallocated array holding the rounds
+        self.__data = np.zeros((max(capacity,1),) + self.__shape,dtype=dtype)
+        ## Number of stored rounds
+        self.__len = 0
+        ## Note per round, None if the round is not annotated
+        self.__notes = []
+
+    def getShape(self): return self.__shape
+    def getCapacity(self): return self.__data.shape[0]
+    def getNotes(self): return self.__notes
+
+    def getArray(self):
+        ''' Return a view of the stored rounds, shaped (rounds,) + shape. '''
+        return self.__data[:self.__len]
+
+    def append(self,rnd,note=None):
+        '''
+        Append the result of a round.
+        @param rnd The result of the round, a (nested) list or an array of the round shape.
+        @param note A dictionary annotating the round, None if not annotated.
+        @exception ValueError if the shape of the round does not fit.
+        '''
+        if self.__len == self.__data.shape[0]:
+            grown = np.zeros((max(2 * self.__len,1),) + self.__shape,dtype=self.__dtype)
+            grown[:self.__len] = self.__data
+            self.__data = grown
+        self.__data[self.__len] = rnd
+        self.__len += 1
+        self.__notes.append(note)
+
+    def setNotes(self,notes):
+        '''
+        Replace the notes of the stored rounds, e.g. when loading from xml.
+        @param notes A list of one note or None per round.
+        @exception ValueError if the number of notes does not fit.
+        '''
+        if len(notes) != self.__len:
+            raise ValueError("got " + str(len(notes)) + " notes for " + str(self.__len) + " rounds")
+        self.__notes = list(notes)
+
+    def flagged(self,key):
+        '''
+        Return the rounds whose note sets a flag.
+        @param key The key of the flag in the notes, e.g. 'throttled'.
+        @return A list of round numbers.
+        '''
+        return [i for i,n in enumerate(self.__notes) if n != None and n.get(key) == True]
+
+    def window(self,rnds):
+        '''
+        Return a view of the rounds of a measurement window.
+        @param rnds The consecutive round numbers of the window, e.g. [3,4,5,6].
+        @return An array of shape (len(rnds),) + shape.
+        '''
+        if len(rnds) == 0:
+            return self.__data[0:0]
+        return self.__data[rnds[0]:rnds[-1] + 1]
+
+    def toList(self):
+        ''' Return the rounds as nested lists, e.g. to dump them as json. '''
+        return self.getArray().tolist()
+
+    def fromList(self,l):
+        '''
+        Replace the stored rounds by the rounds in a nested list.
+        @param l A list of rounds, each with the round shape.
+        '''
+        data = np.array(l,dtype=self.__dtype)
+        if len(l) == 0:
+            data = np.zeros((0,) + self.__shape,dtype=self.__dtype)
+        self.__shape = data.shape[1:]
+        self.__len = data.shape[0]
+        self.__data = data
+        self.__notes = [None] * self.__len
+
+    def __len__(self):
+        return self.__len
+
+    def __getitem__(self,i):
+        return self.getArray()[i]
+
+    def __iter__(self):
+        return iter(self.getArray())
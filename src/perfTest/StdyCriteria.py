@@ -0,0 +1,205 @@
+''' @package StdyCriteria
+A module holding the criteria deciding if the measurement window of a test is steady.
+'''
+from abc import ABCMeta, abstractmethod
+import numpy as np
+
+class StdyCriterion(object):
+    '''
+    A steady state criterion, checks the measurement window of a StdyTracker.
+    '''
+    __metaclass__ = ABCMeta
+
+    ## Name of the criterion, used in the options and the xml.
+    name = None
+
+    def __init__(self,window=5):
+        '''
+        Constructor
+        @param window Number of rounds in the measurement window.
+        '''
+        ## Number of rounds in the measurement window
+        self.__window = window
+
+    def getWindow(self): return self.__window
+
+    def getParams(self):
+        ''' Return the parameters of the criterion as a dictionary. '''
+        return {'window':self.__window}
+
+    def toDict(self):
+        ''' Return name and parameters of the criterion, e.g. to dump them to json. '''
+        d = self.getParams()
+        d['name'] = self.name
+        return d
+
+    def describe(self):
+        ''' Return a human readable description of the criterion. '''
+        params = self.getParams()
+        return self.name + ' (' + ', '.join(k + '=' + str(params[k]) for k in sorted(params)) + ')'
+
+    @abstractmethod
+    def isSteady(self,tracker):
+        '''
+        Check the steady state of every cell in the window of a tracker.
+        @param tracker A full StdyTracker.
+        @return An array of booleans, one per cell.
+        '''
+
+class SniaCriterion(StdyCriterion):
+    '''
+    The rule of the SNIA PTS: the data excursion (max - min) and the excursion of
+    the linear best fit line must stay inside a band around the window average.
+    '''
+    name = 'snia'
+    ## Allowed data excursion (max - min) in the window, relative to the average.
+    maxExcursion = 0.20
+    ## Allowed slope excursion of the best fit line in the window, relative to the average.
+    maxSlopeExcursion = 0.10
+
+    def __init__(self,window=5,maxExcursion=None,maxSlopeExcursion=None):
+        '''
+        Constructor
+        @param window Number of rounds in the measurement window.
+        @param maxExcursion Allowed data excursion relative to the average.
+        @param maxSlopeExcursion Allowed slope excursion relative to the average.
+        '''
+        super(SniaCriterion,self).__init__(window)
+        ## Allowed data excursion of this criterion
+        self.__maxExc = SniaCriterion.maxExcursion if maxExcursion == None else maxExcursion
+        ## Allowed slope excursion of this criterion
+        self.__maxSlopeExc = SniaCriterion.maxSlopeExcursion if maxSlopeExcursion == None else maxSlopeExcursion
+
+    def getParams(self):
+        d = super(SniaCriterion,self).getParams()
+        d['maxExcursion'] = self.__maxExc
+        d['maxSlopeExcursion'] = self.__maxSlopeExc
+        return d
+
+    def isSteady(self,tracker):
+        return tracker.isSteady(self.__maxExc,self.__maxSlopeExc)
+
+class CovCriterion(StdyCriterion):
+    '''
+    The coefficient of variation (standard deviation / average) in the window
+    must not exceed a threshold.
+    '''
+    name = 'cov'
+
+    def __init__(self,window=5,maxCov=0.05):
+        '''
+        Constructor
+        @param window Number of rounds in the measurement window.
+        @param maxCov Allowed coefficient of variation.
+        '''
+        super(CovCriterion,self).__init__(window)
+        ## Allowed coefficient of variation
+        self.__maxCov = maxCov
+
+    def getParams(self):
+        d = super(CovCriterion,self).getParams()
+        d['maxCov'] = self.__maxCov
+        return d
+
+    def isSteady(self,tracker):
+        return tracker.getStd() <= np.abs(tracker.getAvg()) * self.__maxCov
+
+class CusumCriterion(StdyCriterion):
+    '''
+    A tabular CUSUM change detection on the deviations from the window average,
+    relative to the average. The window is steady if neither the upper nor the
+    lower cumulative sum exceeds the threshold, i.e. no level shift is detected.
+    '''
+    name = 'cusum'
+
+    def __init__(self,window=5,threshold=0.20,drift=0.05):
+        '''
+        Constructor
+        @param window Number of rounds in the measurement window.
+        @param threshold Decision threshold h, relative to the average.
+        @param drift Allowed drift k per round, relative to the average.
+        '''
+        super(CusumCriterion,self).__init__(window)
+        ## Decision threshold
+        self.__threshold = threshold
+        ## Allowed drift per round
+        self.__drift = drift
+
+    def getParams(self):
+        d = super(CusumCriterion,self).getParams()
+        d['threshold'] = self.__threshold
+        d['drift'] = self.__drift
+        return d
+
+    def isSteady(self,tracker):
+        avg = tracker.getAvg()
+        scale = np.where(avg == 0,1.0,np.abs(avg))
+        dev = (tracker.getArray() - avg) / scale
+        upper = np.zeros(tracker.getCells())
+        lower = np.zeros(tracker.getCells())
+        steady = np.ones(tracker.getCells(),dtype=bool)
+        for z in dev:
+            upper = np.maximum(0,upper + z - self.__drift)
+            lower = np.maximum(0,lower - z - self.__drift)
+            steady &= (upper <= self.__threshold) & (lower <= self.__threshold)
+        return steady
+
+class MannKendallCriterion(StdyCriterion):
+    '''
+    The Mann-Kendall trend test, the window is steady if there is no
+    significant monotonic trend in it.
+    '''
+    name = 'mk'
+
+    def __init__(self,window=5,zCrit=1.96):
+        '''
+        Constructor
+        @param window Number of rounds in the measurement window.
+        @param zCrit Critical value of the normal distribution, 1.96 is a two
+        sided significance level of 5%.
+        '''
+        super(MannKendallCriterion,self).__init__(window)
+        ## Critical value of the test statistic
+        self.__zCrit = zCrit
+
+    def getParams(self):
+        d = super(MannKendallCriterion,self).getParams()
+        d['zCrit'] = self.__zCrit
+        return d
+
+    def isSteady(self,tracker):
+        y = tracker.getArray()
+        n = y.shape[0]
+        #sum of the signs of all pairwise later minus earlier values
+        signs = np.sign(y[np.newaxis,:,:] - y[:,np.newaxis,:])
+        s = np.triu(np.ones((n,n)),1)[:,:,np.newaxis] * signs
+        s = s.sum(axis=(0,1))
+        var = n * (n - 1) * (2 * n + 5) / 18.0
+        z = (s - np.sign(s)) / np.sqrt(var)
+        return np.abs(z) < self.__zCrit
+
+## Available criteria per name.
+criteria = dict((c.name,c) for c in [SniaCriterion,CovCriterion,CusumCriterion,MannKendallCriterion])
+
+def getCriterion(name,window=None):
+    '''
+    Create a criterion with its default parameters.
+    @param name The name of the criterion, cf. criteria.
+    @param window Number of rounds in the measurement window, None for the default.
+    @exception ValueError if the criterion is unknown.
+    '''
+    if name not in criteria:
+        raise ValueError("unknown steady state criterion " + name)
+    if window == None:
+        return criteria[name]()
+    return criteria[name](window)
+
+def fromDict(d):
+    '''
+    Create a criterion from its dictionary, cf. StdyCriterion.toDict.
+    @param d A dictionary holding the name and the parameters.
+    '''
+    params = dict((str(k),v) for k,v in d.iteritems() if k != 'name')
+    if d['name'] not in criteria:
+        raise ValueError("unknown steady state criterion " + d['name'])
+    return criteria[d['name']](**params)
@@ -5,10 +5,15 @@ Created on Aug 26, 2014
 '''
 
 import logging
-import numpy as np
 import json
+import math
+import time
+import numpy as np
 from lxml import etree
 
+from perfTest.StdyTracker import StdyTracker
+import perfTest.StdyCriteria as sc
+
 class StdyState(object):
     '''
     Used to define a stable state of a device
@@ -17,11 +22,37 @@ class StdyState(object):
     testRnds = 25
     ## Always use a sliding window of 4 to measure performance values.
     testMesWindow = 4
+    ## Allowed data excursion (max - min) in the window, relative to the average.
+    maxExcursion = sc.SniaCriterion.maxExcursion
+    ## Allowed slope excursion of the best fit line in the window, relative to the average.
+    maxSlopeExcursion = sc.SniaCriterion.maxSlopeExcursion
+    ## Remaining change of the forecast model over the window, relative to its limit, seen as converged.
+    forecastTol = 0.10
+    ## Decay rates per round tried when fitting the forecast model.
+    forecastRates = np.linspace(0.05,0.98,94)
 
-    def __init__(self):
+    def __init__(self,criterion=None,maxRnds=None,abort=False,exclThrottled=False):
         '''
         Constructor
+        @param criterion The StdyCriterion deciding the steady state, None for
+        the SNIA rule over a window of testMesWindow + 1 rounds.
+        @param maxRnds Max number of test rounds, None for testRnds.
+        @param abort Stop the test if the forecast shows that the steady state
+        cannot be reached within the max number of rounds.
+        @param exclThrottled Don't accept a steady state if a round of the
+        measurement window has been throttled.
         '''
+        if criterion == None:
+            criterion = sc.SniaCriterion(StdyState.testMesWindow + 1)
+        if maxRnds == None:
+            maxRnds = StdyState.testRnds
+        if maxRnds < criterion.getWindow():
+            logging.warn("# Max. number of rounds is smaller than the measurement window, using " + str(criterion.getWindow()))
+            maxRnds = criterion.getWindow()
+        ## Criterion deciding if the measurement window is steady
+        self.__criterion = criterion
+        ## Max number of test rounds
+        self.__maxRnds = maxRnds
         ## Number of rounds until steady state has been reached
         self.__rounds = 0
         ## Number of round where steady state has been reached.
@@ -34,15 +65,53 @@ class StdyState(object):
         self.__stdySlope = []
         ##States if the steady state has been reached or not
         self.__reachStdyState = None
+        ##Sliding window over the cells of the test rounds
+        self.__tracker = None
+        ##Per tracked cell if it has been steady in the last checked window
+        self.__cellsSteady = []
+        ##Abort if the steady state is not reachable within the max rounds
+        self.__abort = abort
+        ##Rounds and values of the detection cell, used for the forecast
+        self.__histRnds = []
+        self.__histValues = []
+        ##Time stamps the rounds have been added, None for restored rounds
+        self.__histTimes = []
+        ##Forecast: predicted round of the steady state (None if not reachable), ETA in seconds
+        self.__forecast = {}
+        ##Don't accept a measurement window containing throttled rounds
+        self.__exclThrottled = exclThrottled
+        ##Rounds the device has throttled in
+        self.__throttledRnds = []
 
     def getRnds(self): return self.__rounds
     def getStdyRnds(self): return self.__stdyRnds
     def getStdyAvg(self): return self.__stdyAvg
     def getStdyValues(self): return self.__stdyValues
     def getStdySlope(self): return self.__stdySlope
+    def getCellsSteady(self): return self.__cellsSteady
+    def getCriterion(self): return self.__criterion
+    def getMaxRnds(self): return self.__maxRnds
+    def getForecast(self): return self.__forecast
+    def getThrottledRnds(self): return self.__throttledRnds
 
     def setReachStdyState(self,s): self.__reachStdyState = s
 
+    @staticmethod
+    def getFioArgs(metric,runtime):
+        '''
+        Map the steady state criteria to fio's own steady state detection.
+        Fio stops a job as soon as all values of metric in the last ss_dur
+        seconds stay inside the allowed excursion from their mean. As the steady
+        state allows an excursion of max - min, the half of it is used.
+        @param metric The fio steady state metric, 'iops' or 'bw'.
+        @param runtime The maximum runtime of a job in seconds.
+        @return A dictionary of fio key value arguments.
+        '''
+        excursion = StdyState.maxExcursion * 100 / 2
+        return {'steadystate':metric + ':' + str(excursion) + '%',
+                'ss_dur':str(max(runtime // 4,5)),
+                'ss_ramp':str(max(runtime // 12,1))}
+
     def isSteady(self):
         '''
         Return if the current state is steady.
@@ -53,50 +122,150 @@ class StdyState(object):
             raise RuntimeError, "steady state is none"
         return self.__reachStdyState
 
+    def addRound(self,rnd,values,cell,throttled=False,restored=False):
+        '''
+        Add the values of all cells of a test round to the sliding measurement
+        window. All cells are tracked, the steady state of the test is decided
+        by one detection cell as soon as the window is full. A window holding
+        throttled rounds is reported, if throttled rounds are excluded it is
+        not accepted as steady state.
+        @param rnd The number of the round.
+        @param values The values of all cells of the round, a list or array.
+        @param cell The index of the cell used to detect the steady state.
+        @param throttled If the device has throttled in the round.
+        @param restored If the round has been restored from a journal, its
+        time stamp is not used for the ETA.
+        @return True if the steady state is reached, False if not or if the
+        window is not yet full.
+        '''
+        if throttled:
+            self.__throttledRnds.append(rnd)
+        if self.__tracker == None:
+            self.__tracker = StdyTracker(self.__criterion.getWindow(),len(values))
+        self.__tracker.add(rnd,values)
+        self.__histRnds.append(rnd)
+        self.__histValues.append(float(np.ravel(values)[cell]))
+        self.__histTimes.append(None if restored else time.time())
+        if not self.__tracker.isFull():
+            self.forecast()
+            return False
+        steady = self.checkTracker(self.__tracker,cell,rnd)
+        hot = [r for r in self.__stdyRnds if r in self.__throttledRnds]
+        if steady and len(hot) > 0:
+            if self.__exclThrottled:
+                logging.info("# Steady state not accepted, the device throttled in rounds " + str(hot))
+                self.__reachStdyState = steady = False
+            else:
+                logging.warn("# The device throttled in rounds " + str(hot) + " of the steady state window")
+        if not steady:
+            self.forecast()
+        else:
+            self.__forecast = {'round':rnd,'eta':0,'aborted':False}
+        return steady
+
+    @staticmethod
+    def fitDecay(xs,ys):
+        '''
+        Fit the model y = a + b * r^x to the values, as a device's performance
+        decays exponentially towards its steady level. For every decay rate r
+        of forecastRates a and b are fitted by least squares, the rate with the
+        smallest error is taken.
+        @param xs The rounds, starting at 0.
+        @param ys The values of the rounds.
+        @return [a,b,r] of the best fit.
+        '''
+        x = np.asarray(xs,dtype=float)
+        y = np.asarray(ys,dtype=float)
+        best = None
+        for rate in StdyState.forecastRates:
+            A = np.vstack([np.ones(len(x)),rate ** x]).T
+            coef,res,rank,sv = np.linalg.lstsq(A,y)
+            err = np.sum((A.dot(coef) - y) ** 2)
+            if best == None or err < best[0]:
+                best = [err,coef[0],coef[1],rate]
+        return best[1:]
+
+    def forecast(self):
+        '''
+        Forecast the round the steady state will be reached, from a decay model
+        fitted to the detection cell. The steady state is expected once the
+        model changes by less than forecastTol of its limit over the measurement
+        window. The ETA is estimated from the duration of the last round, it
+        is unknown while rounds are restored from a journal.
+        @return The forecast dictionary: predicted 'round' (None if it cannot
+        be reached), 'eta' in seconds (None if unknown) and 'aborted'.
+        '''
+        if len(self.__histValues) < 4:
+            return self.__forecast
+        window = self.__criterion.getWindow()
+        first = self.__histRnds[0]
+        last = self.__histRnds[-1]
+        a,b,rate = StdyState.fitDecay([x - first for x in self.__histRnds],self.__histValues)
+        pred = None
+        if rate < StdyState.forecastRates[-1]:
+            change = abs(b) * (1 - rate ** (window - 1))
+            if change <= StdyState.forecastTol * abs(a):
+                pred = first + window - 1
+            elif a != 0:
+                q = StdyState.forecastTol * abs(a) / change
+                pred = first + int(math.ceil(math.log(q) / math.log(rate))) + window - 1
+            #a level of 0 is never reached within the tolerance
+            if pred != None:
+                pred = max(pred,last + 1)
+        eta = None
+        if pred != None and len(self.__histTimes) > 1 and None not in self.__histTimes[-2:]:
+            eta = (pred - last) * (self.__histTimes[-1] - self.__histTimes[-2])
+        aborted = self.__abort and len(self.__histRnds) >= 2 * window and \
+                  (pred == None or pred >= self.__maxRnds)
+        self.__forecast = {'round':pred,'eta':eta,'aborted':aborted}
+        if pred == None:
+            logging.info("# Steady state forecast: not reachable, no decay towards a steady level")
+        else:
+            logging.info("# Steady state forecast: round " + str(pred) + ", ETA " +
+                         (str(int(eta // 60)) + " min" if eta != None else "unknown"))
+        if aborted:
+            logging.warn("# Steady state cannot be reached within " + str(self.__maxRnds) + " rounds, aborting")
+        return self.__forecast
+
+    def isAborted(self):
+        ''' Check if the test should be aborted, cf. forecast. '''
+        return self.__forecast.get('aborted',False)
+
     def checkSteadyState(self,xs,ys,rounds):
         '''
-        Checks if the steady is reached for the given values.
-        The steady state is defined by the allowed data excursion from the average (+-10%), and
-        the allowed slope excursion of the linear regression best fit line (+-5%).
+        Checks if the steady is reached for the given values, the criterion
+        is applied to all values. For the SNIA rule the steady state is defined
+        by the allowed data excursion from the average (+-10%), and the allowed
+        slope excursion of the linear regression best fit line (+-5%).
         @param xs Values on x axis
         @param ys Corresponding values for xs on y axis
         @param rounds Number of carried out rounds
         @return True (k*x+d is slope line) if steady state is reached, False if not
         '''
-        stdyState = True
-        maxY = max(ys)
-        minY = min(ys)
-        avg = sum(ys)/len(ys)#calc average of values
-        #allow max excursion of 20% of average
-        avgRange = avg * 0.20
-        if (maxY - minY) > avgRange:
-            stdyState = False
-        
-        #do linear regression to calculate slope of linear best fit
-        y = np.array(ys)
-        x = np.array(xs)
-        A = np.vstack([x, np.ones(len(x))]).T
-        #calculate k*x+d
-        k, d = np.linalg.lstsq(A, y)[0]
-        
-        #as we have a measurement window of 4, we calculate
-        #the slope excursion in  the window
-        slopeExc = k * self.testMesWindow
-        if slopeExc < 0:
-            slopeExc *= -1
-        maxSlopeExc = avg * 0.10 #allowed are 10% of avg
-        if slopeExc > maxSlopeExc:
-            stdyState = False
+        tracker = StdyTracker(len(xs))
+        for x,y in zip(xs,ys):
+            tracker.add(x,[y])
+        return self.checkTracker(tracker,0,rounds)
 
+    def checkTracker(self,tracker,cell,rounds):
+        '''
+        Checks if the steady state is reached in the window of a tracker with
+        the criterion, cf. checkSteadyState. The steady state of all cells is kept.
+        @param tracker A StdyTracker holding the measurement window.
+        @param cell The index of the cell used to detect the steady state.
+        @param rounds Number of carried out rounds
+        @return True if steady state is reached for the cell, False if not
+        '''
+        steady = self.__criterion.isSteady(tracker)
+        k,d = tracker.getSlope()
         self.__rounds = rounds
-        self.__stdyRnds = xs
-        self.__stdyValues = ys
-        self.__stdyAvg = avg
-        # Clear previous slope
-        self.__stdySlope = []
-        self.__stdySlope.extend([k,d])
-        self.__reachStdyState = stdyState
-        return stdyState
+        self.__stdyRnds = tracker.getRounds()
+        self.__stdyValues = tracker.getValues(cell)
+        self.__stdyAvg = float(tracker.getAvg()[cell])
+        self.__stdySlope = [float(k[cell]),float(d[cell])]
+        self.__cellsSteady = steady.tolist()
+        self.__reachStdyState = bool(steady[cell])
+        return self.__reachStdyState
 
     def appendXml(self,r):
         '''
@@ -127,6 +296,29 @@ class StdyState(object):
         e = etree.SubElement(r,'rndnr')
         e.text = data
 
+        data = json.dumps(self.__criterion.toDict())
+        e = etree.SubElement(r,'stdycriterion')
+        e.text = data
+
+        data = json.dumps(self.__maxRnds)
+        e = etree.SubElement(r,'stdymaxrounds')
+        e.text = data
+
+        if len(self.__forecast) > 0:
+            data = json.dumps(self.__forecast)
+            e = etree.SubElement(r,'stdyforecast')
+            e.text = data
+
+        if len(self.__cellsSteady) > 0:
+            data = json.dumps(self.__cellsSteady)
+            e = etree.SubElement(r,'stdycells')
+            e.text = data
+
+        if len(self.__throttledRnds) > 0:
+            data = json.dumps(self.__throttledRnds)
+            e = etree.SubElement(r,'stdythrottled')
+            e.text = data
+
     def fromXml(self,root):
         '''
         Loads the information about a steady state from XML.
@@ -139,6 +331,16 @@ class StdyState(object):
         self.__stdyAvg = json.loads(root.findtext('stdyavg'))
         self.__reachStdyState = json.loads(root.findtext('reachstdystate'))
         self.__rounds = json.loads(root.findtext('rndnr'))
+        if root.findtext('stdycriterion'):
+            self.__criterion = sc.fromDict(json.loads(root.findtext('stdycriterion')))
+        if root.findtext('stdymaxrounds'):
+            self.__maxRnds = json.loads(root.findtext('stdymaxrounds'))
+        if root.findtext('stdyforecast'):
+            self.__forecast = json.loads(root.findtext('stdyforecast'))
+        if root.findtext('stdycells'):
+            self.__cellsSteady = json.loads(root.findtext('stdycells'))
+        if root.findtext('stdythrottled'):
+            self.__throttledRnds = json.loads(root.findtext('stdythrottled'))
         logging.info("########### Loading steady state from xml ###########")
         self.toLog()
 
@@ -147,6 +349,8 @@ class StdyState(object):
         Log information about the steady state and how it 
         has been reached.
         '''
+        logging.info("Steady state criterion:")
+        logging.info(self.__criterion.describe())
         logging.info("Rounds of steady state:")
         logging.info(self.__stdyRnds)
         logging.info("Steady values:")
@@ -158,4 +362,8 @@ class StdyState(object):
         logging.info("Stopped after round number:")
         logging.info(self.__rounds)
         logging.info("Reached steady state:")
-        logging.info(self.__reachStdyState)
\ No newline at end of file
+        logging.info(self.__reachStdyState)
+        logging.info("Steady state of all cells:")
+        logging.info(self.__cellsSteady)
+        logging.info("Steady state forecast:")
+        logging.info(self.__forecast)
\ No newline at end of file
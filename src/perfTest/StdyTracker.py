@@ -0,0 +1,153 @@
+''' @package StdyTracker
+A module realizing a sliding measurement window for steady state detection.
+'''
+from collections import deque
+import numpy as np
+
+class StdyTracker(object):
+    '''
+    A sliding window over the last test rounds of many cells at once, e.g. all
+    workload/block size combinations of a round. Running sums of x, x^2, y and
+    x*y and monotonic deques for the minimum and maximum are updated per
+    round, so average, deviation, excursion and the best fit line of the
+    window are available in constant time per value.
+    '''
+
+    def __init__(self,window,cells=1):
+        '''
+        Constructor
+        @param window Number of rounds in the measurement window.
+        @param cells Number of cells tracked per round.
+        '''
+        ## Number of rounds in the window
+        self.__window = window
+        ## Number of tracked cells
+        self.__cells = cells
+        ## Round numbers (x values) in the window
+        self.__xs = deque([])
+        ## Values of the cells per round in the window
+        self.__ys = deque([])
+        ## Sequence number of the next added round
+        self.__seq = 0
+        ## Running sums of x and x^2
+        self.__sx = 0.0
+        self.__sxx = 0.0
+        ## Running sums of y, y^2 and x*y per cell
+        self.__sy = np.zeros(cells)
+        self.__syy = np.zeros(cells)
+        self.__sxy = np.zeros(cells)
+        ## Per cell deques of (seq,value), decreasing for max and increasing for min
+        self.__maxDq = [deque([]) for c in range(cells)]
+        self.__minDq = [deque([]) for c in range(cells)]
+
+    def getWindow(self): return self.__window
+    def getCells(self): return self.__cells
+    def getRounds(self): return list(self.__xs)
+
+    def isFull(self):
+        ''' Check if the window holds the configured number of rounds. '''
+        return len(self.__xs) == self.__window
+
+    def add(self,x,values):
+        '''
+        Add the values of a round, the oldest round is dropped from a full window.
+        @param x The round number.
+        @param values The values of all cells in the round.
+        @exception ValueError if the number of values does not match the cells.
+        '''
+        y = np.asarray(values,dtype=float).ravel()
+        if len(y) != self.__cells:
+            raise ValueError("expected " + str(self.__cells) + " values, got " + str(len(y)))
+        if self.isFull():
+            self.__drop()
+        seq = self.__seq
+        self.__seq += 1
+        self.__xs.append(x)
+        self.__ys.append(y)
+        self.__sx += x
+        self.__sxx += x * x
+        self.__sy += y
+        self.__syy += y * y
+        self.__sxy += x * y
+        for c in range(self.__cells):
+            maxDq = self.__maxDq[c]
+            while len(maxDq) > 0 and maxDq[-1][1] <= y[c]:
+                maxDq.pop()
+            maxDq.append((seq,y[c]))
+            minDq = self.__minDq[c]
+            while len(minDq) > 0 and minDq[-1][1] >= y[c]:
+                minDq.pop()
+            minDq.append((seq,y[c]))
+
+    def __drop(self):
+        ''' Drop the oldest round of the window. '''
+        seq = self.__seq - len(self.__xs)
+        x = self.__xs.popleft()
+        y = self.__ys.popleft()
+        self.__sx -= x
+        self.__sxx -= x * x
+        self.__sy -= y
+        self.__syy -= y * y
+        self.__sxy -= x * y
+        for c in range(self.__cells):
+            if self.__maxDq[c][0][0] == seq:
+                self.__maxDq[c].popleft()
+            if self.__minDq[c][0][0] == seq:
+                self.__minDq[c].popleft()
+
+    def getValues(self,cell):
+        '''
+        Return the values of one cell in the window.
+        @param cell The index of the cell.
+        '''
+        return [float(y[cell]) for y in self.__ys]
+
+    def getArray(self):
+        ''' Return the window as an array of shape (rounds, cells). '''
+        return np.array(self.__ys)
+
+    def getAvg(self):
+        ''' Return the average of every cell in the window. '''
+        return self.__sy / len(self.__xs)
+
+    def getStd(self):
+        ''' Return the (population) standard deviation of every cell in the window. '''
+        n = len(self.__xs)
+        var = self.__syy / n - (self.__sy / n) ** 2
+        return np.sqrt(np.maximum(var,0))
+
+    def getMax(self):
+        ''' Return the maximum of every cell in the window. '''
+        return np.array([dq[0][1] for dq in self.__maxDq])
+
+    def getMin(self):
+        ''' Return the minimum of every cell in the window. '''
+        return np.array([dq[0][1] for dq in self.__minDq])
+
+    def getSlope(self):
+        '''
+        Return the least squares best fit line k*x+d of every cell in the window.
+        @return [k,d], two arrays with one value per cell.
+        '''
+        n = len(self.__xs)
+        denom = n * self.__sxx - self.__sx * self.__sx
+        if denom == 0:
+            return [np.zeros(self.__cells),self.getAvg()]
+        k = (n * self.__sxy - self.__sx * self.__sy) / denom
+        d = (self.__sy - k * self.__sx) / n
+        return [k,d]
+
+    def isSteady(self,maxExcursion,maxSlopeExcursion):
+        '''
+        Check the steady state of every cell in the window. A cell is steady if
+        max - min stays inside maxExcursion of the average and the best fit
+        line changes by at most maxSlopeExcursion of the average over the window.
+        @param maxExcursion Allowed data excursion relative to the average.
+        @param maxSlopeExcursion Allowed slope excursion relative to the average.
+        @return An array of booleans, one per cell.
+        '''
+        avg = self.getAvg()
+        k = self.getSlope()[0]
+        slopeExc = np.abs(k) * (self.__xs[-1] - self.__xs[0])
+        return ((self.getMax() - self.getMin()) <= avg * maxExcursion) & \
+               (slopeExc <= avg * maxSlopeExcursion)
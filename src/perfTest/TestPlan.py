@@ -0,0 +1,214 @@
+''' @package TestPlan
+A module holding declarative test plans: the tests that are run and per test
+the workload matrix, round limit, runtime, ramp time and steady state rule.
+'''
+import json
+import re
+
+import perfTest.StdyCriteria as sc
+
+## Tests of a plan per mode, in the order they are run.
+modeTests = {'ssd':['iops','lat','tp','writesat','qos','scale'],
+             'hdd':['iops','tp']}
+
+## Tests of a mode that are only run if they are planned or selected.
+optionalTests = {'ssd':['qos','scale'],
+                 'hdd':[]}
+
+## Settings a test of a mode can define.
+testSettings = {('ssd','iops'):['bs','mix','rounds','runtime','ramp','stdy'],
+                ('ssd','lat'):['bs','mix','rounds','runtime','ramp','stdy'],
+                ('ssd','tp'):['bs','rounds','runtime','ramp','stdy'],
+                ('ssd','writesat'):['rounds','runtime','ramp'],
+                ('ssd','qos'):['mix','loads','slo','runtime','ramp'],
+                ('ssd','scale'):['mix','maxiod','maxnj','knee','runtime','ramp'],
+                ('hdd','iops'):['bs','mix','rounds','runtime','ramp'],
+                ('hdd','tp'):['bs','rounds','runtime','ramp']}
+
+## Cells a matrix must contain as they are used for steady state detection.
+detectionCells = {('ssd','iops'):{'mix':0,'bs':'4k'},
+                  ('ssd','lat'):{'mix':0,'bs':'4k'}}
+
+## Valid block size labels, e.g. 512, 4k or 1m.
+bsPattern = re.compile(r'^[1-9][0-9]*[km]?$')
+
+class TestPlan(object):
+    '''
+    A test plan, for every planned test a dictionary of settings. Settings not
+    given in the plan are taken from the defaults of the test classes.
+    A plan file is a json object like:
+
+    {"mode": "ssd",
+     "tests": {"iops": {"bs": ["4k","8k"], "mix": [100,50,0], "rounds": 15,
+                        "runtime": 30, "ramp": 5,
+                        "stdy": {"criterion": "cov", "window": 4}},
+               "tp": {}}}
+    '''
+
+    def __init__(self,mode,tests=None):
+        '''
+        Constructor
+        @param mode The mode of the performance test, 'ssd' or 'hdd'.
+        @param tests A dictionary of settings per test key, None for all
+        tests of the mode except the optional ones with their default settings.
+        '''
+        ## Mode of the performance test
+        self.__mode = mode
+        ## Settings per test key
+        self.__tests = tests
+        if tests == None:
+            self.__tests = dict((k,{}) for k in modeTests[mode] if k not in optionalTests[mode])
+
+    def getMode(self): return self.__mode
+    def getTests(self): return self.__tests
+
+    def getTestKeys(self):
+        ''' Return the keys of the planned tests in the order they are run. '''
+        return [k for k in modeTests[self.__mode] if k in self.__tests]
+
+    def getSettings(self,key):
+        '''
+        Return the settings of a test.
+        @param key The key of the test, e.g. 'iops'.
+        @return A dictionary of settings, empty if the defaults are used.
+        '''
+        return dict(self.__tests.get(key,{}))
+
+    def select(self,keys):
+        '''
+        Restrict the plan to some tests, e.g. chosen on the command line.
+        @param keys A list of test keys.
+        '''
+        for k in keys:
+            if k not in self.__tests:
+                self.__tests[k] = {}
+        for k in self.__tests.keys():
+            if k not in keys:
+                del self.__tests[k]
+
+    def setSetting(self,name,value):
+        '''
+        Set a setting for all planned tests supporting it, e.g. the number of
+        rounds given on the command line.
+        @param name The name of the setting, e.g. 'rounds'.
+        @param value The value of the setting.
+        '''
+        for k,settings in self.__tests.iteritems():
+            if name in testSettings[(self.__mode,k)]:
+                settings[name] = value
+
+    def validate(self):
+        '''
+        Check the tests of the plan and all of their settings.
+        @exception ValueError with a description of the first invalid setting.
+        '''
+        if self.__mode not in modeTests:
+            raise ValueError("unknown mode " + str(self.__mode))
+        if len(self.__tests) == 0:
+            raise ValueError("no tests planned")
+        for key,settings in self.__tests.iteritems():
+            if key not in modeTests[self.__mode]:
+                raise ValueError("unknown " + self.__mode + " test " + str(key))
+            if not isinstance(settings,dict):
+                raise ValueError(key + ": settings must be an object")
+            valid = testSettings[(self.__mode,key)]
+            for s in settings:
+                if s not in valid:
+                    raise ValueError(key + ": unknown setting " + str(s) + ", valid are " + ', '.join(valid))
+            self.__checkSettings(key,settings)
+
+    def __checkSettings(self,key,settings):
+        '''
+        Check the values of the settings of one test.
+        @param key The key of the test.
+        @param settings The settings of the test.
+        @exception ValueError if a value is invalid.
+        '''
+        if 'bs' in settings:
+            bs = settings['bs']
+            if not isinstance(bs,list) or len(bs) == 0:
+                raise ValueError(key + ": bs must be a non empty list")
+            for b in bs:
+                if not isinstance(b,basestring) or not bsPattern.match(b):
+                    raise ValueError(key + ": invalid block size " + str(b))
+            if len(set(bs)) != len(bs):
+                raise ValueError(key + ": duplicate block sizes")
+        if 'mix' in settings:
+            mix = settings['mix']
+            if not isinstance(mix,list) or len(mix) == 0:
+                raise ValueError(key + ": mix must be a non empty list")
+            for m in mix:
+                if not isinstance(m,int) or m < 0 or m > 100:
+                    raise ValueError(key + ": invalid read percentage " + str(m))
+            if len(set(mix)) != len(mix):
+                raise ValueError(key + ": duplicate read percentages")
+        if 'loads' in settings:
+            loads = settings['loads']
+            if not isinstance(loads,list) or len(loads) == 0:
+                raise ValueError(key + ": loads must be a non empty list")
+            for l in loads:
+                if not isinstance(l,int) or l < 1 or l > 100:
+                    raise ValueError(key + ": invalid load percentage " + str(l))
+            if len(set(loads)) != len(loads):
+                raise ValueError(key + ": duplicate load percentages")
+        if 'slo' in settings and (not isinstance(settings['slo'],(int,float)) or settings['slo'] <= 0):
+            raise ValueError(key + ": slo must be a positive latency in ms")
+        if 'knee' in settings and (not isinstance(settings['knee'],int) or settings['knee'] < 1 or settings['knee'] > 100):
+            raise ValueError(key + ": knee must be a percentage of the peak IOPS")
+        for s in ['rounds','runtime','maxiod','maxnj']:
+            if s in settings and (not isinstance(settings[s],int) or settings[s] < 1):
+                raise ValueError(key + ": " + s + " must be a positive integer")
+        if 'ramp' in settings and (not isinstance(settings['ramp'],int) or settings['ramp'] < 0):
+            raise ValueError(key + ": ramp must be a non negative integer")
+        if 'stdy' in settings:
+            stdy = settings['stdy']
+            if not isinstance(stdy,dict):
+                raise ValueError(key + ": stdy must be an object")
+            for s in stdy:
+                if s not in ['criterion','window']:
+                    raise ValueError(key + ": unknown steady state setting " + str(s))
+            if 'criterion' in stdy and stdy['criterion'] not in sc.criteria:
+                raise ValueError(key + ": unknown steady state criterion " + str(stdy['criterion']))
+            if 'window' in stdy:
+                if not isinstance(stdy['window'],int) or stdy['window'] < 2:
+                    raise ValueError(key + ": the steady state window must be at least 2 rounds")
+                if 'rounds' in settings and stdy['window'] > settings['rounds']:
+                    raise ValueError(key + ": the steady state window exceeds the rounds")
+        cells = detectionCells.get((self.__mode,key),{})
+        if 'mix' in settings and 'mix' in cells and cells['mix'] not in settings['mix']:
+            raise ValueError(key + ": mix must contain " + str(cells['mix']) + " for steady state detection")
+        if 'bs' in settings and 'bs' in cells and cells['bs'] not in settings['bs']:
+            raise ValueError(key + ": bs must contain " + cells['bs'] + " for steady state detection")
+
+    def toDict(self):
+        ''' Return the plan as a dictionary, e.g. to dump it to json. '''
+        return {'mode':self.__mode,'tests':self.__tests}
+
+    @staticmethod
+    def fromDict(mode,d):
+        '''
+        Create a plan from a dictionary, cf. toDict.
+        @param mode The mode of the performance test.
+        @param d The dictionary of the plan.
+        @exception ValueError if the plan is for another mode.
+        '''
+        if not isinstance(d,dict) or 'tests' not in d:
+            raise ValueError("a test plan must be an object holding tests")
+        if d.get('mode',mode) != mode:
+            raise ValueError("the test plan is for mode " + str(d['mode']))
+        tests = dict((str(k),dict((str(s),v) for s,v in t.iteritems()) if isinstance(t,dict) else t)
+                     for k,t in d['tests'].iteritems())
+        return TestPlan(mode,tests)
+
+    @staticmethod
+    def fromFile(mode,fd):
+        '''
+        Read and validate a plan from a json file.
+        @param mode The mode of the performance test.
+        @param fd The opened plan file.
+        @return A validated TestPlan object.
+        @exception ValueError if the file is no valid plan.
+        '''
+        plan = TestPlan.fromDict(mode,json.load(fd))
+        plan.validate()
+        return plan
@@ -4,11 +4,34 @@ Created on Oct 3, 2013
 @author: gschoenb
 '''
 from __future__ import division
+import logging
 import plots.genPlots as pgp
 import matplotlib.pyplot as plt
 
 __colorTable__ = ['#0000FF','#32cd32','#ffff00','#00ffff','#b22222','#9932cc','#ff4500']
 
+def sharedCells(labels, preferred):
+    """
+    Return the cells all compared tests share. The matrices of the tests are
+    defined by their test plans, so only common cells can be compared.
+
+    Keyword arguments:
+    labels -- a list of label lists, one per test
+    preferred -- the labels plotted if all tests have them
+    """
+    shared = [l for l in labels[0] if all(l in other for other in labels[1:])]
+    if all(l in shared for l in preferred):
+        return list(preferred)
+    return shared
+
+def wldLabel(wld):
+    """ Return the x label of a mixed workload given as percentage of reads. """
+    if wld == 100:
+        return 'Read'
+    if wld == 0:
+        return 'Write'
+    return str(wld) + '/' + str(100 - wld)
+
 def compWriteSatIOPSPlt(testsToPlot, subfolder=None):
     """
     Compare multiple tests and create a write saturation IOPS plot.
@@ -25,8 +48,8 @@ def compWriteSatIOPSPlt(testsToPlot, subfolder=None):
         test = tests.getTests()['writesat']
         rnds = test.getRnds()
         x = range(rnds + 1)
-        #first elem in matrix are iops
-        iops_l = test.getRndMatrices()[0]
+        #first column are iops
+        iops_l = test.getRndMatrices().getArray()[:,0]
         plt.plot(x,iops_l,'-',label=test.getTestname(), color = __colorTable__[i])
         #fetch new min and max from current test values
         min_y,max_y = pgp.getMinMax(iops_l, min_y, max_y)
@@ -54,43 +77,48 @@ def compILPlt(testsToPlot, mode, subfolder=None):
     
     Keyword arguments:
     testsToPlot -- an array of perfTest objects
-    mode -- the desired test mode (IOPS or Latency)
+    mode -- the desired test mode (IOPS, LAT or a latency percentile like P99)
     """
     plt.clf()#clear plot
-    x = range(3)
+    if mode == "IOPS":
+        tests = [t.getTests()['iops'] for t in testsToPlot]
+        wlds = sharedCells([t.getMixWlds() for t in tests], [100,50,0])
+    if mode == "LAT" or mode.startswith("P"):
+        tests = [t.getTests()['lat'] for t in testsToPlot]
+        wlds = sharedCells([t.getMixWlds() for t in tests], [100,65,0])
+    #the matrices are defined by the test plans, plot the 4k cells if all tests have them
+    bsl = sharedCells([t.getBsLabels() for t in tests], ['4k'])
+    if len(wlds) == 0 or len(bsl) == 0:
+        logging.warn("# The " + mode + " tests share no cells, skipping the compare plot")
+        return
+    bsl = bsl[0]
     width = 1/len(testsToPlot)
+    x = [i + (i * width) for i in range(len(wlds))]
     max_y = 0
-    for i in range(len(x)):
-        x[i] = x[i] + (i * width)
-    for i,tests in enumerate(testsToPlot):
-        if mode == "IOPS":
-            test = tests.getTests()['iops']
-            pgp.calcMsmtTable(test, 'IOPS')
-        if mode == "LAT":
-            test = tests.getTests()['lat']
-            pgp.calcMsmtTable(test, 'avg-LAT')
-        mixWLds = test.getTables()[0]
-        if mode == "IOPS":
-            testVal = [mixWLds[0][6],mixWLds[3][6],mixWLds[6][6]]
-        if mode == "LAT":
-            testVal = [mixWLds[0][1],mixWLds[1][1],mixWLds[2][1]]
+    for i,test in enumerate(tests):
+        if mode.startswith("P"):
+            mixWLds = test.getTable('clat-' + mode.lower())
+        else:
+            mixWLds = test.getTable('mean')
+        bs = test.getBsLabels().index(bsl)
+        testVal = [mixWLds[test.getMixWlds().index(w)][bs] for w in wlds]
         plt.bar(x, testVal, width,label=test.getTestname(),color = __colorTable__[i])
         x = [v + width for v in x]
         if max(testVal) > max_y:
             max_y = max(testVal)
-    ticksx = [(len(testsToPlot)/2) * width, 1 + width + 0.5, 2 + (2 * width) + 0.5 ]
-    if mode == "IOPS":
-        labelsx = ['Read','50/50','Write']
-    if mode == "LAT":
-        labelsx = ['Read','65/35','Write']
+    ticksx = [i + (i * width) + 0.5 for i in range(len(wlds))]
+    labelsx = [wldLabel(w) for w in wlds]
     plt.xticks(ticksx, labelsx)
     plt.ylim(0, max_y * 1.15)
     if mode == "IOPS":
         title = "IOPS"
-        plt.ylabel("Avg. " + title + " at 4k Block Size")
+        plt.ylabel("Avg. " + title + " at " + bsl + " Block Size")
     if mode == "LAT":
         title = "LAT"
-        plt.ylabel("Avg. "+ title + " (ms) at 4k Block Size")
+        plt.ylabel("Avg. "+ title + " (ms) at " + bsl + " Block Size")
+    if mode.startswith("P"):
+        title = mode
+        plt.ylabel(title + " Completion LAT (ms) at " + bsl + " Block Size")
     plt.suptitle(title + " Measurement Test",fontweight='bold')
     plt.xlabel("R/W Workload")
     plt.legend(loc='upper center', bbox_to_anchor=(0.5, 1.07),
@@ -109,21 +137,21 @@ def compTPPlt(testsToPlot, subfolder=None):
     testsToPlot -- an array of perfTest objects
     """
     plt.clf()#clear plot
+    tests = [t.getTests()['tp'] for t in testsToPlot]
+    labelsy = sharedCells([t.getBsLabels() for t in tests], ['8k','64k','1024k'])
+    if len(labelsy) == 0:
+        logging.warn("# The TP tests share no block sizes, skipping the compare plot")
+        return
     height = 1/len(testsToPlot)
-    ticksy = [(len(testsToPlot)/2) * height, 1 + height + 0.5, 2 + (2 * height) + 0.5 ]
-    labelsy = ['8k','64k','1024k']
+    ticksy = [i + (i * height) + 0.5 for i in range(len(labelsy))]
     max_x = 0
     fig = plt.figure()
     # Plot read throughput
     ax = fig.add_subplot(2, 1, 2)
-    y = range(3)
-    for i in range(len(y)):
-        y[i] = y[i] + (i * height)
-    for i,tests in enumerate(testsToPlot):
-        test = tests.getTests()['tp']
-        pgp.calcMsmtTPTable(test)
-        wlds = test.getTables()[0]
-        testRTP = [wlds[0][2],wlds[0][1],wlds[0][0]]
+    y = [i + (i * height) for i in range(len(labelsy))]
+    for i,test in enumerate(tests):
+        wlds = test.getTable('mean')
+        testRTP = [wlds[0][test.getBsLabels().index(b)] for b in labelsy]
         ax.barh(y, testRTP, height, label=test.getTestname(),color = __colorTable__[i])
         y = [v + height for v in y]
         if max(testRTP) > max_x:
@@ -136,13 +164,10 @@ def compTPPlt(testsToPlot, subfolder=None):
     
     # Plot write throughput
     ax = fig.add_subplot(2, 1, 1)
-    y = range(3)
-    for i in range(len(y)):
-        y[i] = y[i] + (i * height)
-    for i,tests in enumerate(testsToPlot):
-        test = tests.getTests()['tp']
-        wlds = test.getTables()[0]
-        testRTP = [wlds[1][2],wlds[1][1],wlds[1][0]]
+    y = [i + (i * height) for i in range(len(labelsy))]
+    for i,test in enumerate(tests):
+        wlds = test.getTable('mean')
+        testRTP = [wlds[1][test.getBsLabels().index(b)] for b in labelsy]
         ax.barh(y, testRTP, height, label=test.getTestname(),color = __colorTable__[i])
         y = [v + height for v in y]
     plt.xlabel("Write Bandwidth (MB/s)")
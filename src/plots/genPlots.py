@@ -11,9 +11,8 @@ import matplotlib.ticker as ticker
 from mpl_toolkits.mplot3d import Axes3D
 
 import numpy as np
-from copy import deepcopy
 
-import perfTest.DeviceTests as dt
+import perfTest.TestPlan as tp
 
 __matplotVersion__=float('.'.join(matplotlib.__version__.split('.')[0:2]))
 
@@ -72,44 +71,31 @@ def stdyStConvPlt(toPlot,mode):
     Generate a steady state convergence plot.
     The plot consists of:
     IOPS:
-        -Measured IOPS of pure random write
+        -Measured IOPS of pure random write, the steady state detection workload
     LAT:
-        -Avg latency of read, mixed, write
+        -Avg latency of every mixed workload of the test
     -All lines are the different block sizes
     -IOPS/Latencies of all the rounds are plotted
+    -Rounds the device has throttled in are shaded
     The figure is saved as SsdTest.Testname-stdyStConvPlt.png.
     @param toPlot A SsdTest object.
     @param mode A string representing the test mode (IOPS|LAT)
     '''
     rnds = toPlot.getStdyState().getRnds()
-    matrices = toPlot.getRndMatrices()
-    bsLens = len(matrices[0][-1])#fetch the number of bs of the first matrix
+    #rounds x workloads x block sizes (x [min,max,mean] for latencies)
+    matrices = toPlot.getRndMatrices().getArray()
     
-    #initialize matrix for plotting
+    #switch to one line per block size, holding the values of all rounds
+    #the workloads are defined by the test plan, look up their rows
+    wlds = toPlot.getMixWlds()
     if mode == "IOPS":
-        lines = []
-        for i in range(bsLens):
-            lines.append([])
-        for rndMat in matrices:
-            row = rndMat[-1]#last row is random write
-            for i in range(len(row)):
-                lines[i].append(row[i])#switch from row to column wise ordering of values
+        #random write is the detection workload, hide cells not run in two phase mode
+        row = wlds.index(tp.detectionCells[('ssd','iops')]['mix'])
+        lines = np.ma.masked_equal(matrices[:,row,:].T,0)
     
     if mode == "LAT":
-        readLines = []
-        writeLines = []
-        mixLines = []
-        for i in range(bsLens):
-            readLines.append([])
-            writeLines.append([])
-            mixLines.append([])
-        for rndMat in matrices:
-            #take read mat len, every elem has the same len
-            for i in range(len(rndMat[0])):
-                #also convert it from us to ms
-                readLines[i].append((rndMat[0][i][2]) / 1000)#mean latency
-                mixLines[i].append((rndMat[1][i][2]) / 1000)#mean latency
-                writeLines[i].append((rndMat[2][i][2]) / 1000)#mean latency
+        #mean latency per workload, also convert it from us to ms
+        wldLines = [matrices[:,wlds.index(m),:,2].T / 1000 for m in wlds]
     
     plt.clf()#clear
 
@@ -119,18 +105,17 @@ def stdyStConvPlt(toPlot,mode):
     min_y = 0
     if mode == "IOPS":
         for i in range(len(lines)):
-            min_y,max_y = getMinMax(lines[i], min_y, max_y)
-            plt.plot(x,lines[i],'o-',label='bs='+dt.SsdIopsTest.bsLabels[i])
+            if lines[i].count() > 0:
+                min_y,max_y = getMinMax(lines[i].compressed(), min_y, max_y)
+            plt.plot(x,lines[i],'o-',label='bs='+toPlot.getBsLabels()[i])
     if mode == "LAT":
-        for i in range(len(readLines)):
-            min_y,max_y = getMinMax(readLines[i], min_y, max_y)
-            plt.plot(x,readLines[i],'s-',label='bs='+dt.SsdLatencyTest.bsLabels[i]+' read')
-        for i in range(len(mixLines)):
-            min_y,max_y = getMinMax(mixLines[i], min_y, max_y)
-            plt.plot(x,mixLines[i],'^-',label='bs='+dt.SsdLatencyTest.bsLabels[i]+' mixed')
-        for i in range(len(writeLines)):
-            min_y,max_y = getMinMax(writeLines[i], min_y, max_y)
-            plt.plot(x,writeLines[i],'o-',label='bs='+dt.SsdLatencyTest.bsLabels[i]+' write')
+        markers = ['s-','^-','o-','D-','v-','p-','*-']
+        for n,m in enumerate(wlds):
+            for i in range(len(wldLines[n])):
+                min_y,max_y = getMinMax(wldLines[n][i], min_y, max_y)
+                plt.plot(x,wldLines[n][i],markers[n % len(markers)],
+                         label='bs='+toPlot.getBsLabels()[i]+' '+str(m)+'/'+str(100 - m))
+    markThrottled(plt.gca(),toPlot.getRndMatrices().flagged('throttled'))
     
     plt.xticks(x)
     plt.suptitle(mode+" Steady State Convergence Plot",fontweight='bold')
@@ -160,25 +145,23 @@ def mes2DPlt(toPlot,mode):
     @param toPlot A SsdTest object.
     @param mode A string representing the test mode (IOPS|max-LAT|avg-LAT)
     '''
-    # Generate the measurement table
-    calcMsmtTable(toPlot, mode)
     if mode == "IOPS":
-        wlds = dt.SsdIopsTest.mixWlds
-        bsLabels = dt.SsdIopsTest.bsLabels
-        mixWLds = toPlot.getTables()[0]
+        wlds = toPlot.getMixWlds()
+        bsLabels = toPlot.getBsLabels()
+        mixWLds = toPlot.getTable('mean')
     if mode == "avg-LAT" or mode == "max-LAT":
-        wlds = dt.SsdLatencyTest.mixWlds
-        bsLabels = dt.SsdLatencyTest.bsLabels
+        wlds = toPlot.getMixWlds()
+        bsLabels = toPlot.getBsLabels()
         if mode == "avg-LAT":
-            mixWLds = toPlot.getTables()[0]
+            mixWLds = toPlot.getTable('mean')
         if mode == "max-LAT":
-            mixWLds = toPlot.getTables()[1]
+            mixWLds = toPlot.getTable('max')
 
     plt.clf()#clear plot
     if mode == "IOPS":
-        x = getBS(dt.SsdIopsTest.bsLabels)
+        x = getBS(toPlot.getBsLabels())
     if mode == "avg-LAT" or mode == "max-LAT":
-        x = getBS(dt.SsdLatencyTest.bsLabels)
+        x = getBS(toPlot.getBsLabels())
         
     max_y = 0
     min_y = 0
@@ -214,15 +197,10 @@ def mes3DPlt(toPlot,mode):
     '''
     colorTable = ['#0000FF','#008080','#00FFFF','#FFFF00','#00FF00','#FF00FF','#800000']
     if mode == 'IOPS':
-        #Iops have only one measurement table
-        matrix = deepcopy(toPlot.getTables()[0])
-        #reverse to start with 0/100
-        matrix.reverse()
-        #reverse the block size in each table row, to start with 512B
-        for row in matrix:
-            row.reverse()
-        bsLabels = list(dt.SsdIopsTest.bsLabels)
-        mixWlds = list(dt.SsdIopsTest.mixWlds)
+        #reverse to start with 0/100 and the block sizes to start with 512B
+        matrix = toPlot.getTable('mean')[::-1,::-1]
+        bsLabels = list(toPlot.getBsLabels())
+        mixWlds = list(toPlot.getMixWlds())
     
     #define positions for bars
     ypos = np.array([0.25] * len(bsLabels)) 
@@ -241,7 +219,7 @@ def mes3DPlt(toPlot,mode):
     else:
         ax = Axes3D(fig)
     for j,wl in enumerate(matrix):
-        ax.bar3d(xpos,ypos,zpos, dx, dy, wl, color = colorTable[j])
+        ax.bar3d(xpos,ypos,zpos, dx, dy, wl, color = colorTable[j % len(colorTable)])
         for pos in range(len(ypos)):
             ypos[pos] += 1
             
@@ -273,11 +251,11 @@ def latMes3DPlt(toPlot):
     @param toPlot A SsdTest object.
     '''
     colorTable = ['#0000FF','#008080','#00FFFF']
-    mixWlds = list(dt.SsdLatencyTest.mixWlds)
-    bsLabels = list(dt.SsdLatencyTest.bsLabels)
+    mixWlds = list(toPlot.getMixWlds())
+    bsLabels = list(toPlot.getBsLabels())
 
-    avgMatrix = deepcopy(toPlot.getTables()[0])
-    maxMatrix = deepcopy(toPlot.getTables()[1])
+    avgMatrix = toPlot.getTable('mean')
+    maxMatrix = toPlot.getTable('max')
     
     #define positions for bars
     ypos = np.array([0.25] * len(bsLabels)) 
@@ -297,7 +275,7 @@ def latMes3DPlt(toPlot):
         rect = fig.add_subplot(2, 1, 1).get_position()
         ax = Axes3D(fig, rect)
     for j,wl in enumerate(avgMatrix):
-        ax.bar3d(xpos,ypos,zpos, dx, dy, wl, color = colorTable[j])
+        ax.bar3d(xpos,ypos,zpos, dx, dy, wl, color = colorTable[j % len(colorTable)])
         for pos in range(len(ypos)):
             ypos[pos] += 1
     ax.xaxis.set_ticks([]) 
@@ -313,7 +291,7 @@ def latMes3DPlt(toPlot):
     #reset ypos
     ypos = np.array([0.25] * len(bsLabels)) 
     for j,wl in enumerate(maxMatrix):
-        ax.bar3d(xpos,ypos,zpos, dx, dy, wl, color = colorTable[j])
+        ax.bar3d(xpos,ypos,zpos, dx, dy, wl, color = colorTable[j % len(colorTable)])
         for pos in range(len(ypos)):
             ypos[pos] += 1
             
@@ -341,10 +319,11 @@ def writeSatIOPSPlt(toPlot):
     rnds = toPlot.getRnds()
     x = range(rnds + 1)
     
-    iops_l = toPlot.getRndMatrices()[0]#first elem in matrix are iops
+    iops_l = toPlot.getRndMatrices().getArray()[:,0]#first column are iops
 
     plt.clf()#clear plot        
     plt.plot(x,iops_l,'-',label='Avg IOPS')
+    markThrottled(plt.gca(),toPlot.getRndMatrices().flagged('throttled'))
     plt.ylim(min(iops_l)*0.75,max(iops_l)*1.25)
     #every 10 rounds print the round number
     x = range(0,rnds + 1,50)
@@ -361,16 +340,12 @@ def writeSatLatPlt(toPlot):
     rnds = toPlot.getRnds()
     x = range(rnds + 1)
     
-    lats_l = toPlot.getRndMatrices()[1]#second elem in matrix are latencies
-    
-    #get the average latencies from the lat list (last elem)
-    av_lats = []
-    for i in lats_l:
-        #convert from us to ms
-        av_lats.append((i[2]) / 1000)
+    #get the average latencies from the last column, convert from us to ms
+    av_lats = toPlot.getRndMatrices().getArray()[:,3] / 1000
     
     plt.clf()#clear plot
     plt.plot(x,av_lats,'-',label='Avg latency')
+    markThrottled(plt.gca(),toPlot.getRndMatrices().flagged('throttled'))
     #set the y axes to start at 3/4 of mininum
     plt.ylim(min(av_lats)*0.75,max(av_lats)*1.25)
     #every 50 rounds print the round number
@@ -384,6 +359,64 @@ def writeSatLatPlt(toPlot):
     plt.savefig(toPlot.getTestname()+'-writeSatLatPlt.png',dpi=300)
     toPlot.addFigure(toPlot.getTestname()+'-writeSatLatPlt.png')
     
+def qosLoadPlt(toPlot):
+    '''
+    Generate a latency vs. load plot of the QoS test.
+    The plot consists of:
+    -The 99th and 99.9th percentile completion latency per workload
+    -x axes is the reached IOPS of an offered load
+    -y axes is the latency in ms
+    -The horizontal line is the latency objective
+    The figure is saved as SsdTest.Testname-qosLoadPlt.png.
+    @param toPlot A SsdQosTest object.
+    '''
+    iops = toPlot.getTable('iops')
+    p99 = toPlot.getTable('clat-p99')
+    p999 = toPlot.getTable('clat-p99.9')
+    colorTable = ['#0000FF','#008080','#FF00FF','#800000','#00FF00']
+    plt.clf()#clear plot
+    for i,mix in enumerate(toPlot.getMixWlds()):
+        color = colorTable[i % len(colorTable)]
+        label = str(mix) + '/' + str(100 - mix)
+        plt.plot(iops[i],p999[i],'o-',color=color,label=label)
+        plt.plot(iops[i],p99[i],'--',color=color)
+    plt.axhline(toPlot.getSlo(),color='k',linestyle=':')
+    plt.suptitle("QoS Latency vs. Load",fontweight='bold')
+    plt.xlabel("IOPS")
+    plt.ylabel("Completion Latency (ms)")
+    plt.legend(loc='upper center', bbox_to_anchor=(0.5, 1.07),
+               ncol=3, fancybox=True, shadow=True,prop={'size':12})
+    plt.savefig(toPlot.getTestname()+'-qosLoadPlt.png',dpi=300)
+    toPlot.addFigure(toPlot.getTestname()+'-qosLoadPlt.png')
+
+def scalingPlt(toPlot):
+    '''
+    Generate the plot of the scaling test.
+    The plot consists of:
+    -The IOPS of every measured point per workload
+    -x axes is the number of outstanding IOs, numjobs x iodepth
+    -The knee of every workload is marked
+    The figure is saved as SsdTest.Testname-scalingPlt.png.
+    @param toPlot A SsdScalingTest object.
+    '''
+    colorTable = ['#0000FF','#008080','#FF00FF','#800000','#00FF00']
+    plt.clf()#clear plot
+    for i,mix in enumerate(toPlot.getMixWlds()):
+        color = colorTable[i % len(colorTable)]
+        points = sorted(toPlot.getPoints()[i],key=lambda p: (p[0] * p[1],p[0]))
+        plt.plot([p[0] * p[1] for p in points],[p[2] for p in points],'o-',color=color,
+                 label=str(mix) + '/' + str(100 - mix))
+        knee = toPlot.getKnees()[i]
+        plt.plot([knee[0] * knee[1]],[knee[2]],'*',color=color,markersize=15)
+    plt.xscale('log',basex=2)
+    plt.suptitle("Scaling Test",fontweight='bold')
+    plt.xlabel("Outstanding IOs (numjobs x iodepth)")
+    plt.ylabel("IOPS")
+    plt.legend(loc='upper center', bbox_to_anchor=(0.5, 1.07),
+               ncol=3, fancybox=True, shadow=True,prop={'size':12})
+    plt.savefig(toPlot.getTestname()+'-scalingPlt.png',dpi=300)
+    toPlot.addFigure(toPlot.getTestname()+'-scalingPlt.png')
+
 def tpRWStdyStConvPlt(toPlot):
     '''
     Generate one steady state convergence plot for throughput read and write measurements.
@@ -392,19 +425,15 @@ def tpRWStdyStConvPlt(toPlot):
     -All lines are the different block sizes
     -x axes is the number of all rounds
     -y axes is the bw of the corresponding round
+    -Rounds the device has throttled in with the first block size are shaded
     The top plot is write, below read
     The figure is saved as SsdTest.Testname-TP-RW-stdyStConvPlt.png.
     @param toPlot A SsdTest object.
     '''
-    matrices = deepcopy(toPlot.getRndMatrices())
+    #one round store of [read,write] per block size
+    matrices = toPlot.getRndMatrices()
     rnds = toPlot.getStdyState().getRnds()#fetch the number of total rounds
-    bsLens = len(matrices)#fetch the number of bs, each row is a bs in the matrix
-    bsLabels = dt.SsdTPTest.bsLabels
-    
-    #initialize matrix for plotting
-    lines = []
-    for i in range(bsLens):
-        lines.append([])
+    bsLabels = toPlot.getBsLabels()
     
     #values for scaling the axes
     max_y = 0
@@ -417,13 +446,11 @@ def tpRWStdyStConvPlt(toPlot):
     fig = plt.figure()
     ax = fig.add_subplot(2, 1, 1)
     for i,rndMat in enumerate(matrices):
-        row = rndMat[1]#plot the write row
-        #convert to MB/s
-        for v in range(len(row)):
-            row[v] = row[v] / 1024
+        row = rndMat.getArray()[:,1] / 1024#plot the write row in MB/s
         #calc min,man to scale axes
         min_y,max_y = getMinMax(row, min_y, max_y)
         ax.plot(x,row,'o-',label='bs='+bsLabels[i])
+    markThrottled(ax,matrices[0].flagged('throttled'))
     plt.xticks(x)
     plt.ylim((0,max_y*1.15))
     plt.legend()
@@ -433,13 +460,11 @@ def tpRWStdyStConvPlt(toPlot):
      
     ax = fig.add_subplot(2, 1, 2)
     for i,rndMat in enumerate(matrices):
-        row = rndMat[0]#plot the read row
-        #convert to MB/s
-        for v in range(len(row)):
-            row[v] = row[v] / 1024
+        row = rndMat.getArray()[:,0] / 1024#plot the read row in MB/s
         #calc min,man to scale axes
         min_y,max_y = getMinMax(row, min_y, max_y)
         ax.plot(x,row,'o-',label='bs='+bsLabels[i])
+    markThrottled(ax,matrices[0].flagged('throttled'))
     plt.xticks(x)
     plt.ylim((0,max_y*1.15))
     plt.ylabel("Read TP (MB/s)")
@@ -462,11 +487,10 @@ def tpMes2DPlt(toPlot):
     The figure is saved as SsdTest.Testname-bw-mes2DPlt.png.
     @param toPlot A SsdTest object.
     '''
-    calcMsmtTPTable(toPlot)
-    wlds = toPlot.getTables()[0]
+    wlds = toPlot.getTable('mean')
     #start plotting
     plt.clf()#clear
-    x = getBS(dt.SsdTPTest.bsLabels)
+    x = getBS(toPlot.getBsLabels())
     for i in range(len(wlds)):
         if i == 0:
             label = "read"
@@ -478,7 +502,7 @@ def tpMes2DPlt(toPlot):
     plt.suptitle("TP Measurement Plot",fontweight='bold')
     plt.xlabel("Block Size (Byte)")
     plt.ylabel("Bandwidth (MB/s)")
-    plt.xticks(x,dt.SsdTPTest.bsLabels)
+    plt.xticks(x,toPlot.getBsLabels())
     plt.legend(loc='upper center', bbox_to_anchor=(0.5, 1.07),
                ncol=3, fancybox=True, shadow=True,prop={'size':12})
     plt.savefig(toPlot.getTestname()+'-TP-mes2DPlt.png',dpi=300)
@@ -495,10 +519,10 @@ def TPplot(toPlot):
     The figure is saved as TPTest.Testname-TP-RW-Plt.png.
     @param toPlot A hdd TPTest object.
     '''
-    #As the values are converted to KB, copy the matrices
-    matrices = deepcopy(toPlot.getRndMatrices())
-    rnds = dt.HddTPTest.maxRnds
-    bsLabels = dt.HddTPTest.bsLabels
+    #one round store of [read,write] per block size
+    matrices = toPlot.getRndMatrices()
+    rnds = toPlot.getMaxRnds()
+    bsLabels = toPlot.getBsLabels()
     
     #values for scaling the axes
     max_y = 0
@@ -507,17 +531,14 @@ def TPplot(toPlot):
     plt.clf()#clear
     x = range(rnds)
     for i,rndMat in enumerate(matrices):
-        #convert to MB/S
-        for v in range(len(rndMat[0])):
-            rndMat[0][v] = (rndMat[0][v]) / 1024
+        #convert to MB/S, read and write are rows
+        rw = rndMat.getArray().T / 1024
         #plot the read row for current BS
-        min_y,max_y = getMinMax(rndMat[0], min_y, max_y)
-        plt.plot(x,rndMat[0],'o-',label='read bs='+bsLabels[i])
+        min_y,max_y = getMinMax(rw[0], min_y, max_y)
+        plt.plot(x,rw[0],'o-',label='read bs='+bsLabels[i])
         #plot the write row for current BS
-        for v in range(len(rndMat[1])):
-            rndMat[1][v] = (rndMat[1][v]) / 1024
-        min_y,max_y = getMinMax(rndMat[1], min_y, max_y)
-        plt.plot(x,rndMat[1],'o-',label='write bs='+bsLabels[i])
+        min_y,max_y = getMinMax(rw[1], min_y, max_y)
+        plt.plot(x,rw[1],'o-',label='write bs='+bsLabels[i])
     
     x = range(0,rnds+1,16)
     plt.xticks(x)
@@ -538,26 +559,14 @@ def IOPSplot(toPlot):
     out. In each round the mixed workloads and all block sizes are plotted.
     @param toPlot An hdd IopsTest object.
     '''
-    rnds = dt.HddIopsTest.maxRnds
-    matrices = toPlot.getRndMatrices()
+    rnds = toPlot.getMaxRnds()
     
-    wlds = dt.HddIopsTest.mixWlds
-    bsLabels = dt.HddIopsTest.bsLabels
+    wlds = toPlot.getMixWlds()
+    bsLabels = toPlot.getBsLabels()
     
-    #each row will be a workload percentage
-    mixWLds = []
-    for i in range(len(wlds)):
-        mixWLds.append([])
-        #in each row will be the different block sizes
-        for bs in range(len(bsLabels)):
-            mixWLds[i].append([])
-            
-    for rnd in matrices:
-        #each round has its workloads
-        for i,row in enumerate(rnd):
-            #each workload has its block sizes
-            for j,bs in enumerate(row):
-                mixWLds[i][j].append(bs)
+    #each row will be a workload percentage, each column a block size
+    #holding the IOPS of all rounds
+    mixWLds = np.transpose(toPlot.getRndMatrices().getArray(),(1,2,0))
 
     plt.clf()#clear
     x = range(rnds)
@@ -602,19 +611,17 @@ def TPBoxPlot(toPlot):
     The figure is saved as TPTest.Testname-TP-RW-Plt.png.
     @param toPlot A hdd TPTest object.
     '''
-    #As the values are converted to KB, copy the matrices
-    matrices = deepcopy(toPlot.getRndMatrices())
-    bsLabels = dt.HddTPTest.bsLabels
+    #one round store of [read,write] per block size
+    matrices = toPlot.getRndMatrices()
+    bsLabels = toPlot.getBsLabels()
     
     plt.clf()#clear
     boxes = []
     min_y = 0
     max_y = 0
-    for bsRows in matrices:
-        #For each BS we have read and write, both rows have equal length
-        for v in range(len(bsRows[0])):
-            bsRows[0][v] = (bsRows[0][v]) / 1024
-            bsRows[1][v] = (bsRows[1][v]) / 1024
+    for rndMat in matrices:
+        #For each BS we have read and write, convert to MB/s
+        bsRows = rndMat.getArray().T / 1024
         boxes.append(bsRows[0])
         min_y,max_y = getMinMax(bsRows[0], min_y, max_y)
         boxes.append(bsRows[1])
@@ -643,106 +650,6 @@ def TPBoxPlot(toPlot):
     toPlot.addFigure(toPlot.getTestname()+'-TP-Boxplt.png')
 
 ######### HELPER FUNCTIONS TO GENERATE PLOTS #########
-def calcMsmtTable(toPlot,mode):
-    '''
-    Generate the measurement overview table for IOPS and Latency. The table is
-    an overview over the average values in the measurement window. For latency
-    the values are converted from us to ms also.
-    @param toPlot A SsdTest object.
-    @param mode A string representing the test mode (IOPS|max-LAT|avg-LAT)
-    '''
-    mixWLds = []
-    mesWin = toPlot.getStdyState().getStdyRnds() #get measurement window, only include these values
-    if mode == "IOPS":
-        wlds = dt.SsdIopsTest.mixWlds
-        bsLabels = dt.SsdIopsTest.bsLabels
-    if mode == "avg-LAT" or mode == "max-LAT":
-        wlds = dt.SsdLatencyTest.mixWlds
-        bsLabels = dt.SsdLatencyTest.bsLabels
-
-    #each row will be a workload percentage
-    for i in range(len(wlds)):
-        mixWLds.append([])
-        #in each row will be the different block sizes
-        for bs in range(len(bsLabels)):
-            mixWLds[i].append(0)
-    matrices = toPlot.getRndMatrices()
-
-    #as j does not necessarily start from 0, we need k
-    #to calculate the average iteratively
-    k = 0
-    #limit the matrices to the measurement window
-    for j in mesWin:
-        rndMat = matrices[j]
-        #each row is a percentage of a workload
-        for i,row in enumerate(rndMat):
-            #in each row are the different block sizes
-            for bs in range(len(row)):
-                #calculate average iteratively
-                if mixWLds[i][bs] != 0:
-                    #calculate max latency or continue with average
-                    if mode == "max-LAT":
-                        if row[bs][1] > mixWLds[i][bs]:
-                            mixWLds[i][bs] = row[bs][1]#max latency
-                    else:
-                        mixWLds[i][bs] *= k
-                        if mode == "IOPS":
-                            mixWLds[i][bs] += row[bs]#IOPS
-                        if mode == "avg-LAT":
-                            mixWLds[i][bs] += row[bs][2]#mean latency
-                        mixWLds[i][bs] = (mixWLds[i][bs]) / (k+1)
-                else:
-                    if mode == "IOPS":
-                        mixWLds[i][bs] = row[bs]#IOPS
-                    if mode == "max-LAT":
-                        mixWLds[i][bs] = row[bs][1]#max latency
-                    if mode == "avg-LAT":
-                        mixWLds[i][bs] = row[bs][2]#mean latency
-        k += 1
-    #for latency convert to ms
-    for i in range(len(mixWLds)):
-        if mode == "avg-LAT" or mode == "max-LAT":
-            for v in range(len(mixWLds[i])):
-                mixWLds[i][v] = (mixWLds[i][v]) / 1000
-    toPlot.addTable(mixWLds)
-
-def calcMsmtTPTable(toPlot):
-    '''
-    Generate the measurement overview table for Throughput. The table is
-    an overview over the average values in the measurement window. 
-    @param toPlot A SsdTest object.
-    '''
-    wlds = [] #read and write workload mode
-    #one row for read, one for write
-    for i in range(2):
-        wlds.append([])
-        #in each row will be the different block sizes
-        for bs in range(len(dt.SsdTPTest.bsLabels)):
-            wlds[i].append(0)
-    matrices = deepcopy(toPlot.getRndMatrices())
-    #each row of the matrix is a block size
-    for j,bs in enumerate(matrices):
-        #each block size has read and write
-        for i,row in enumerate(bs):
-            #as rnd does not need to start at 0
-            #we need k to calculate average
-            k = 0
-            #read and write have their round values
-            for rnd in toPlot.getStdyState().getStdyRnds():
-                #calculate average iteratively
-                if wlds[i][j] != 0:
-                    wlds[i][j] *= k
-                    wlds[i][j] += row[rnd]
-                    wlds[i][j] = (wlds[i][j]) / (k+1)
-                else:
-                    wlds[i][j] = row[rnd]
-                k += 1
-    #Convert to MB/s
-    for i in range(len(wlds)):
-        for v in range(len(wlds[i])):
-            wlds[i][v] = (wlds[i][v]) / 1024
-    toPlot.addTable(wlds)
-
 def getBS(bsLabels):
     '''
     Convert a list of string block size labels to a list of integers.
@@ -752,11 +659,13 @@ def getBS(bsLabels):
     '''
     bs = []
     for b in bsLabels:
-        if b == "512":
-            bs.append(0.5)
-            continue
-        s = b[0:-1]
-        bs.append(int(s))
+        #labels without unit are bytes, plot in KiB
+        if b[-1] == 'k':
+            bs.append(int(b[0:-1]))
+        elif b[-1] == 'm':
+            bs.append(int(b[0:-1]) * 1024)
+        else:
+            bs.append(int(b) / 1024.0)
     return bs
 
 def getMinMax(values, currMin, currMax):
@@ -787,4 +696,14 @@ def getMinMax(values, currMin, currMax):
             newMin = currMin
     return [newMin,newMax]
     
-    
\ No newline at end of file
+    
+
+def markThrottled(ax,rounds):
+    '''
+    Shade the rounds a device has throttled in, cf. RoundStore.flagged.
+    @param ax The axes to shade the rounds in.
+    @param rounds A list of round numbers.
+    '''
+    for n,r in enumerate(rounds):
+        ax.axvspan(r - 0.5,r + 0.5,color='#FF0000',alpha=0.15,
+                   label='throttled' if n == 0 else '_nolegend_')
@@ -4,7 +4,6 @@ Created on 9 Aug 2012
 @author: gschoenb
 '''
 from cStringIO import StringIO
-from copy import deepcopy
 import os
 import inspect
 import subprocess
@@ -12,6 +11,7 @@ import logging
 
 import perfTest.DeviceTests as dt
 from perfTest.StdyState import StdyState
+import system.SmartProbe as sp
 
 class RstReport(object):
     '''
@@ -120,6 +120,14 @@ class RstReport(object):
                 if index == 1:
                     caption= "\tThe Write Saturation Latency Plot shows the mean latency of 4k random "
                     caption += "writes over all rounds."
+            if perftype == 'scale':
+                if index == 0:
+                    caption= "\tThe Scaling Plot shows the IOPS of 4k random IO over the number of outstanding IOs "
+                    caption += "(numjobs x iodepth) of every measured point. The knee of every workload is marked."
+            if perftype == 'qos':
+                if index == 0:
+                    caption= "\tThe Latency vs. Load Plot shows the 99th (dashed) and 99.9th percentile completion latency "
+                    caption += "of 4k random IO over the reached IOPS for every workload. The horizontal line is the latency objective."
         if testtype == 'hdd':
             if perftype == 'iops':
                 if index == 0:
@@ -135,20 +143,28 @@ class RstReport(object):
                     
         self.addString(caption)
         
-    def addTable(self,table,labels,perftype):
+    def addTable(self,table,labels,perftype,mixWlds=None):
         '''
         Adds a table to the restructured text.
         @param table The table to insert into the report.
+        @param labels The block size labels of the table columns.
         @param type The type of performance test.
+        @param mixWlds The read percentages of the table rows, None for the defaults.
         '''
         #copy labels and values, don't want to change them
         l = list(labels)
-        t = deepcopy(table)
+        t = [list(row) for row in table]
+        if mixWlds == None:
+            if perftype == 'iops':
+                mixWlds = dt.SsdIopsTest.mixWlds
+            else:
+                mixWlds = dt.SsdLatencyTest.mixWlds
+        wlds = [str(m) + '/' + str(100 - m) for m in mixWlds]
         
         if perftype == 'iops':
             val = StringIO()
             print >>self.__rst,".. csv-table:: Average IOPS vs. Block Size and R/W Mix %"
-            print >>self.__rst,"\t:header: \"Block Size\ |darr|\", \"Wld. |rarr| \" 100/0, 95/5, 65/35, 50/50, 35/65, 5/95, 0/100\n"
+            print >>self.__rst,"\t:header: \"Block Size\ |darr|\", \"Wld. |rarr| \" " + ', '.join(wlds) + "\n"
             #reverse the block size in each table row, to start with 512B
             for row in t:
                 row.reverse()
@@ -162,14 +178,26 @@ class RstReport(object):
         if perftype == 'avg-lat':
             val = StringIO()
             print >>self.__rst,".. csv-table:: Average Latency (ms) vs. Block Size and R/W Mix %"
-            print >>self.__rst,"\t:header: \"Block Size\ |darr|\", \"Wld. |rarr| \" 0/100, 65/35, 100/0\n"
+            print >>self.__rst,"\t:header: \"Block Size\ |darr|\", \"Wld. |rarr| \" " + ', '.join(reversed(wlds)) + "\n"
             #reverse to start with 0/100
             t.reverse()
         
         if perftype == 'max-lat':
             val = StringIO()
             print >>self.__rst,".. csv-table:: Max Latency (ms) vs. Block Size and R/W Mix %"
-            print >>self.__rst,"\t:header: \"Block Size\ |darr|\", \"Wld. |rarr| \" 0/100, 65/35, 100/0\n"
+            print >>self.__rst,"\t:header: \"Block Size\ |darr|\", \"Wld. |rarr| \" " + ', '.join(reversed(wlds)) + "\n"
+            #reverse to start with 0/100
+            t.reverse()
+
+        if perftype == 'qos-lat':
+            val = StringIO()
+            print >>self.__rst,".. csv-table:: 99.9th Percentile Completion Latency (ms) vs. Offered Load and R/W Mix %"
+            print >>self.__rst,"\t:header: \"Load |darr|\", \"Wld. |rarr| \" " + ', '.join(wlds) + "\n"
+
+        if perftype.startswith('clat-p'):
+            val = StringIO()
+            print >>self.__rst,".. csv-table:: " + perftype[6:] + "th Percentile Completion Latency (ms) vs. Block Size and R/W Mix %"
+            print >>self.__rst,"\t:header: \"Block Size\ |darr|\", \"Wld. |rarr| \" " + ', '.join(reversed(wlds)) + "\n"
             #reverse to start with 0/100
             t.reverse()
             
@@ -217,6 +245,22 @@ class RstReport(object):
             print >>self.__rst,"Feature Matrix:"
             print >>self.__rst,featMat + "\n"
             
+    def addBlockInfo(self,info):
+        '''
+        Add the block device information from sysfs to the report.
+        @param info The dictionary of a BlockInfo, None if not available.
+        '''
+        if info == None:
+            return
+        print >>self.__rst,"Block Device:"
+        print >>self.__rst," - Name and size: " + info['name'] + ", " + str(info['size']) + " bytes"
+        print >>self.__rst," - Logical/physical block size: " + str(info['logical']) + "/" + str(info['physical']) + " bytes"
+        print >>self.__rst," - Rotational: " + str(info['rotational'])
+        print >>self.__rst," - Queue depth (block layer/device): " + str(info['nrrequests']) + "/" + str(info['queuedepth'])
+        print >>self.__rst," - IO scheduler: " + str(info['scheduler'])
+        print >>self.__rst," - NUMA node: " + str(info['numa'])
+        print >>self.__rst,'\n'
+
     def addCmdLine(self,cmdLineStr):
         print >>self.__rst,"Used command line:"
         print >>self.__rst," - " + cmdLineStr
@@ -312,10 +356,48 @@ class RstReport(object):
         stdyStr.write("Average in stdy measurement window:\n")
         stdyStr.write(" - ")
         print >>stdyStr, test.getStdyState().getStdyAvg()  
+
+        stdyStr.write("Steady State criterion and max. number of rounds:\n")
+        stdyStr.write(" - ")
+        print >>stdyStr, test.getStdyState().getCriterion().describe() + ", " + str(test.getStdyState().getMaxRnds())
+
+        forecast = test.getStdyState().getForecast()
+        if len(forecast) > 0:
+            stdyStr.write("Forecast round of steady state, aborted:\n")
+            stdyStr.write(" - ")
+            print >>stdyStr, str(forecast['round']) + ", " + str(forecast['aborted'])
+
+        throttled = test.getStdyState().getThrottledRnds()
+        if len(throttled) > 0:
+            stdyStr.write("Rounds the device has throttled thermally in (shaded in the plots):\n")
+            stdyStr.write(" - ")
+            print >>stdyStr, throttled
         
         self.addString(stdyStr.getvalue())
         stdyStr.close()
     
+    def addWearInfo(self,wears):
+        '''
+        Add the write amplification and the projected endurance per test to the rst report.
+        @param wears A list of [test key,wear dictionary], cf. SmartProbe.endurance.
+        '''
+        desc = StringIO()
+        desc.write("The SMART counters of the device have been read just before and after the rounds of every test, ")
+        desc.write("after its secure erase and preconditioning. The write amplification (WAF) is the ratio of the data ")
+        desc.write("written to the NAND to the data written by the host. The endurance is projected as drive writes per ")
+        desc.write("day (DWPD) over " + str(sp.warrantyYears) + " years under the workload of the test. Values the device ")
+        desc.write("does not report are n/a.\n\n")
+        print >>desc,".. csv-table:: Write Amplification and Endurance per Test"
+        print >>desc,"\t:header: \"Test\", \"Host GB\", \"NAND GB\", \"WAF\", \"Used % before/after\", \"DWPD\"\n"
+        na = lambda v: str(v) if v != None else 'n/a'
+        for key,wear in wears:
+            gbs = [na(round(wear[k] / 1000.0 ** 3,1) if wear[k] != None else None) for k in ['hostwritten','nandwritten']]
+            used = '/'.join(na(u) for u in wear['pctused'])
+            print >>desc,"\t" + ', '.join([key] + gbs + [na(wear['waf']),used,na(wear['dwpd'])])
+        desc.write("\n")
+        self.addString(desc.getvalue())
+        desc.close()
+
     def addTestInfo(self,testtype,testname,test):
         '''
         Add information about a test to the rst report.
@@ -334,12 +416,13 @@ class RstReport(object):
                 print >>desc, "\tWorkload Ind. Preconditioning"
                 print >>desc, "\tWhile not Steady State"
                 print >>desc, "\t\tFor workloads ",
-                print >>desc, dt.SsdIopsTest.mixWlds
+                print >>desc, test.getMixWlds()
                 desc.write('\t\t\t')
                 print >>desc, "For block sizes",
-                print >>desc, dt.SsdIopsTest.bsLabels
-                desc.write("\nEach combination of workload and block size is carried out for 60 seconds using direct IO. ")
-                desc.write("The average number of read and write IOPS is measured and summed up, therefore 56 values are ")
+                print >>desc, test.getBsLabels()
+                desc.write("\nEach combination of workload and block size is carried out for " + str(test.getRuntime()) + " seconds using direct IO. ")
+                desc.write("The average number of read and write IOPS is measured and summed up, therefore ")
+                desc.write(str(len(test.getMixWlds()) * len(test.getBsLabels())) + " values are ")
                 desc.write("the result of the two loops.\n")
                 desc.write("After these loops are finished one test round has been carried out. To detect the steady state ")
                 desc.write("the IOPS of 4k random write are taken.\n\n")
@@ -352,7 +435,7 @@ class RstReport(object):
                 desc.write("The throughput test consists of looping over the following parameters:\n")
                 desc.write('\n::\n\n\t')
                 print >>desc, "For block sizes ",
-                print >>desc, dt.SsdTPTest.bsLabels
+                print >>desc, test.getBsLabels()
                 desc.write('\t\t')
                 print >>desc, "Make Secure Erase"
                 desc.write('\t\t')
@@ -361,11 +444,11 @@ class RstReport(object):
                 print >>desc, "Sequential read"
                 desc.write('\t\t\t')
                 print >>desc, "Sequential write"
-                desc.write("\nFor each block size sequential read and write is carried out for 60 seconds using direct IO. ")
+                desc.write("\nFor each block size sequential read and write is carried out for " + str(test.getRuntime()) + " seconds using direct IO. ")
                 desc.write("The number of kilobytes for read and write is measured, therefore 2 values are ")
                 desc.write("the result of one round.\n")
-                desc.write("To detect the steady state the throughput of 1024k sequential write is taken.\n\n")
-                print >>desc, "- Dependent Variable: 1024k block size, sequential write"
+                desc.write("To detect the steady state the throughput of " + test.getBsLabels()[0] + " sequential write is taken.\n\n")
+                print >>desc, "- Dependent Variable: " + test.getBsLabels()[0] + " block size, sequential write"
                 self.addString(desc.getvalue())
                 desc.close()
                 self.addSteadyInfo(test)
@@ -377,11 +460,11 @@ class RstReport(object):
                 print >>desc, "\tWorkload Ind. Preconditioning"
                 print >>desc, "\tWhile not Steady State"
                 print >>desc, "\t\tFor workloads ",
-                print >>desc, dt.SsdLatencyTest.mixWlds
+                print >>desc, test.getMixWlds()
                 desc.write('\t\t\t')
                 print >>desc, "For block sizes",
-                print >>desc, dt.SsdLatencyTest.bsLabels
-                desc.write("\nFor all block sizes random read, a 65/35 read/write mixed workload and random write is carried out for 60 ") 
+                print >>desc, test.getBsLabels()
+                desc.write("\nFor all block sizes and workloads random read/write is carried out for " + str(test.getRuntime()) + " ")
                 desc.write("seconds using direct IO. ")
                 desc.write("For every combination the Min, Max and Mean Latency is measured. ")
                 desc.write("After these loops are finished one test round has been carried out. To detect the steady state ")
@@ -401,7 +484,58 @@ class RstReport(object):
                 desc.write("seconds using direct IO. ")
                 desc.write("For each round (60 second window) the write IOPS and latencies are measured. Also the total written ")
                 desc.write("IO is measured to check if 4x capacity has been written.\n\n")
+                if test.getOptions() != None and test.getOptions().getSinglePass() == True:
+                    desc.write("The test has been carried out as one pass without restarting fio, the IOPS and latencies ")
+                    desc.write("have been logged per second and downsampled to rounds of one minute.\n\n")
                 desc.write("As no steady state detection is necessary there is no dependence variable.\n\n")
+                throttled = test.getRndMatrices().flagged('throttled')
+                if len(throttled) > 0:
+                    desc.write("The device has throttled thermally in rounds " + str(throttled) + ", they are shaded in the plots.\n\n")
+                self.addString(desc.getvalue())
+                desc.close()
+            if testname == 'qos':
+                desc = StringIO()
+                desc.write("The QoS test consists of looping over the following parameters:\n")
+                desc.write('\n::\n\n\t')
+                print >>desc, "Make Secure Erase"
+                print >>desc, "\tWorkload Ind. Preconditioning"
+                print >>desc, "\tFor workloads ",
+                print >>desc, test.getMixWlds()
+                desc.write('\t\t')
+                print >>desc, "Measure max IOPS without rate limit"
+                desc.write('\t\t')
+                print >>desc, "For offered loads in % of max IOPS",
+                print >>desc, test.getLoads()
+                desc.write("\nFor every workload and offered load 4k random read/write is carried out for " + str(test.getRuntime()) + " ")
+                desc.write("seconds using direct IO. Fio issues the IOs with poisson distributed arrivals at the offered IOPS. ")
+                desc.write("For every load the completion latency percentiles are measured.\n\n")
+                print >>desc, "- Latency objective: " + str(test.sloPct) + "th percentile <= " + str(test.getSlo()) + " ms"
+                for mix,iops in zip(test.getMixWlds(),test.getSloIops()):
+                    print >>desc, "- Max IOPS within the objective, workload " + str(mix) + "/" + str(100 - mix) + ": " + str(iops)
+                self.addString(desc.getvalue())
+                desc.close()
+            if testname == 'scale':
+                desc = StringIO()
+                desc.write("The scaling test consists of the following steps:\n")
+                desc.write('\n::\n\n\t')
+                print >>desc, "Make Secure Erase"
+                print >>desc, "\tWorkload Ind. Preconditioning"
+                print >>desc, "\tFor workloads ",
+                print >>desc, test.getMixWlds()
+                desc.write('\t\t')
+                print >>desc, "Double the iodepth of one job up to " + str(test.getMaxIod()) + " while the IOPS rise"
+                desc.write('\t\t')
+                print >>desc, "Double the number of jobs up to " + str(test.getMaxNj()) + " while the IOPS rise"
+                desc.write('\t\t')
+                print >>desc, "Bisect the last doubling to find the knee"
+                desc.write("\nEvery point is carried out with 4k random read/write for " + str(test.getRuntime()) + " seconds using direct IO. ")
+                desc.write("The IOPS rise if they grow by at least " + str(test.minGain) + "%. The knee is the lowest measured ")
+                desc.write("concurrency reaching " + str(test.getKnee()) + "% of the peak IOPS.\n\n")
+                for mix,peak,knee in zip(test.getMixWlds(),test.getPeaks(),test.getKnees()):
+                    print >>desc, "- Workload " + str(mix) + "/" + str(100 - mix) + ", peak: " + str(peak[2]) + " IOPS at numjobs " + \
+                        str(peak[0]) + ", iodepth " + str(peak[1])
+                    print >>desc, "- Workload " + str(mix) + "/" + str(100 - mix) + ", knee: " + str(knee[2]) + " IOPS at numjobs " + \
+                        str(knee[0]) + ", iodepth " + str(knee[1]) + ", mean latency " + str(round(knee[4] / 1000.0,3)) + " ms"
                 self.addString(desc.getvalue())
                 desc.close()
         
@@ -410,15 +544,17 @@ class RstReport(object):
                 desc = StringIO()
                 desc.write("The IOPS test consists of looping over the following parameters:\n")
                 desc.write('\n::\n\n\t')
-                print >>desc, "Divide device in " + str(dt.HddIopsTest.maxRnds) + " parts"
-                print >>desc, "\tFor range(" + str(dt.HddIopsTest.maxRnds) + ")"
+                print >>desc, "Divide device in " + str(test.getMaxRnds()) + " parts"
+                print >>desc, "\tFor range(" + str(test.getMaxRnds()) + ")"
                 print >>desc, "\t\tFor workloads ",
-                print >>desc, dt.HddIopsTest.mixWlds
+                print >>desc, test.getMixWlds()
                 desc.write('\t\t\t')
                 print >>desc, "For block sizes",
-                print >>desc, dt.HddIopsTest.bsLabels
-                desc.write("\nEach combination of workload and block size is carried out for 60 seconds using direct IO. ")
+                print >>desc, test.getBsLabels()
+                desc.write("\nEach combination of workload and block size is carried out for " + str(test.getRuntime()) + " seconds using direct IO. ")
                 desc.write("The IOPS of one round are an indicator for the random performance of the corresponding area.")
+                if test.isZoned():
+                    desc.write(" All areas have been scanned by one fio invocation per workload and block size.")
                 self.addString(desc.getvalue())
                 desc.close()
             if testname == 'tp':  
@@ -426,14 +562,16 @@ class RstReport(object):
                 desc.write("The throughput test consists of looping over the following parameters:\n")
                 desc.write('\n::\n\n\t')
                 print >>desc, "For block sizes ",
-                print >>desc, dt.HddTPTest.bsLabels
+                print >>desc, test.getBsLabels()
                 desc.write('\t\t')
-                print >>desc, "For range(" + str(dt.HddTPTest.maxRnds) + ")"
+                print >>desc, "For range(" + str(test.getMaxRnds()) + ")"
                 desc.write('\t\t\t')
                 print >>desc, "Sequential read"
                 desc.write('\t\t\t')
                 print >>desc, "Sequential write"
                 desc.write("\nFor each block size, every area of the device (this are the rounds) is tested ")
                 desc.write("with sequential read and write using direct IO. ")
+                if test.isZoned():
+                    desc.write("All areas have been scanned by one fio invocation per block size for read and write. ")
                 self.addString(desc.getvalue())
                 desc.close()
\ No newline at end of file
@@ -0,0 +1,170 @@
+''' @package Discovery
+A module reading information about block devices and the host directly from
+sysfs and procfs, instead of forking tools like blockdev, mount or uname.
+'''
+import logging
+import os
+
+class BlockInfo(object):
+    '''
+    Information about a block device from /sys/class/block, /proc/partitions
+    and /proc/self/mountinfo. The information is read once and cached for the
+    run, refresh reads it again, e.g. after a raid device has been created.
+    Partitions take the queue settings of their disk.
+    '''
+    ## Directory of the block devices in sysfs.
+    sysBlock = '/sys/class/block'
+    ## Unit of the size file in sysfs, independent of the block size.
+    sectorSize = 512
+
+    def __init__(self,devPath):
+        '''
+        Constructor
+        @param devPath Path of the device, e.g. /dev/sda or /dev/mapper/vg-lv.
+        '''
+        ## Path of the device
+        self.__devPath = devPath
+        ## Name of the device in sysfs, e.g. sda or dm-0
+        self.__name = os.path.basename(os.path.realpath(devPath))
+        ## The cached information, None if not yet read
+        self.__info = None
+
+    def getName(self): return self.__name
+    def getInfo(self): return self.__info
+    def setInfo(self,info): self.__info = info
+
+    def get(self):
+        '''
+        Return the information, read it on first use, cf. read.
+        @exception IOError if the device is no block device.
+        '''
+        if self.__info == None:
+            self.__info = self.read()
+        return self.__info
+
+    def refresh(self):
+        ''' Read the information again, cf. get. '''
+        self.__info = None
+        return self.get()
+
+    @staticmethod
+    def readAttr(path,default=None):
+        '''
+        Read a sysfs attribute.
+        @param path The path of the attribute file.
+        @param default The value if the attribute does not exist.
+        @return The stripped content of the file or the default.
+        '''
+        try:
+            f = open(path,'r')
+            try:
+                return f.read().strip()
+            finally:
+                f.close()
+        except IOError:
+            return default
+
+    @staticmethod
+    def readPartitions():
+        ''' Return the names of all block devices and partitions in /proc/partitions. '''
+        names = []
+        f = open('/proc/partitions','r')
+        try:
+            for line in f:
+                fields = line.split()
+                #skip the header and the empty line below it
+                if len(fields) == 4 and fields[0].isdigit():
+                    names.append(fields[3])
+        finally:
+            f.close()
+        return names
+
+    @staticmethod
+    def readMounts():
+        '''
+        Return the mounts of /proc/self/mountinfo.
+        @return A list of [major:minor,mount point,source] per mount.
+        '''
+        mounts = []
+        f = open('/proc/self/mountinfo','r')
+        try:
+            for line in f:
+                fields = line.split()
+                #optional fields are ended by a single dash before the file system type
+                sep = fields.index('-')
+                mounts.append([fields[2],fields[4],fields[sep + 2]])
+        finally:
+            f.close()
+        return mounts
+
+    def read(self):
+        '''
+        Read the information about the device.
+        @return A dictionary holding the size in bytes, the logical and physical
+        block size, if the device is rotational, the queue depth of the block
+        layer ('nrrequests') and of the device ('queuedepth', None if unknown),
+        the active scheduler, the NUMA node, the model, the partitions of a disk,
+        the devices holding it, its mounts and if it is listed in /proc/partitions.
+        @exception IOError if the device is no block device.
+        '''
+        sysDir = os.path.realpath(os.path.join(BlockInfo.sysBlock,self.__name))
+        if not os.path.isdir(sysDir):
+            raise IOError(self.__devPath + " is no block device, " + sysDir + " does not exist")
+        #partitions have their queue and device at the disk
+        diskDir = sysDir
+        partitions = []
+        if os.path.exists(os.path.join(sysDir,'partition')):
+            diskDir = os.path.dirname(sysDir)
+        else:
+            partitions = sorted(p for p in os.listdir(sysDir) if os.path.exists(os.path.join(sysDir,p,'partition')))
+        queue = lambda attr: BlockInfo.readAttr(os.path.join(diskDir,'queue',attr))
+        dev = lambda attr: BlockInfo.readAttr(os.path.join(diskDir,'device',attr))
+        scheduler = queue('scheduler')
+        if scheduler != None and '[' in scheduler:
+            scheduler = scheduler[scheduler.index('[') + 1:scheduler.index(']')]
+        #the nvme namespace's device is the controller, the pci device holds the NUMA node
+        numa = dev('numa_node')
+        if numa == None:
+            numa = BlockInfo.readAttr(os.path.join(diskDir,'device','device','numa_node'))
+        toInt = lambda v: int(v) if v != None else None
+        info = {'name':self.__name,
+                'size':int(BlockInfo.readAttr(os.path.join(sysDir,'size'),0)) * BlockInfo.sectorSize,
+                'logical':toInt(queue('logical_block_size')),
+                'physical':toInt(queue('physical_block_size')),
+                'rotational':queue('rotational') == '1',
+                'nrrequests':toInt(queue('nr_requests')),
+                'queuedepth':toInt(dev('queue_depth')),
+                'scheduler':scheduler,
+                'numa':toInt(numa),
+                'model':dev('model'),
+                'partitions':partitions,
+                'holders':sorted(os.listdir(os.path.join(sysDir,'holders'))) if os.path.isdir(os.path.join(sysDir,'holders')) else [],
+                'listed':self.__name in BlockInfo.readPartitions()}
+        #mounts of the device and its partitions, by device number or source
+        devNrs = [BlockInfo.readAttr(os.path.join(sysDir,p,'dev')) for p in ['.'] + partitions]
+        names = [self.__name] + partitions
+        info['mounts'] = [[m[1],m[2]] for m in BlockInfo.readMounts() if m[0] in devNrs or
+                          os.path.basename(os.path.realpath(m[2])) in names]
+        return info
+
+def osInfo():
+    '''
+    Return information about the operating system, read from os.uname and the
+    release files of the distribution.
+    @return A dictionary with the kernel release ('kernel') and the description
+    of the distribution ('lsb'), if it can be found.
+    '''
+    info = {'kernel':os.uname()[2]}
+    #red hat based distributions, then the os-release and lsb-release standards
+    desc = BlockInfo.readAttr('/etc/redhat-release')
+    for path,key in [['/etc/os-release','PRETTY_NAME='],['/etc/lsb-release','DISTRIB_DESCRIPTION=']]:
+        if desc != None:
+            break
+        for line in BlockInfo.readAttr(path,'').split('\n'):
+            if line.startswith(key):
+                desc = line[len(key):].strip('"\'')
+    if desc != None:
+        info['lsb'] = "Description: " + desc
+    else:
+        logging.warn("# Cannot find a description of the distribution")
+    return info
@@ -0,0 +1,105 @@
+''' @package IdleWaiter
+A module waiting until a block device is quiescent, by sampling its IO
+statistics in /sys/class/block/<dev>/stat.
+'''
+import logging
+import os
+import time
+
+class IdleWaiter(object):
+    '''
+    Waits until a block device has been idle for some seconds: no IOs in
+    flight and no sectors read or written between two samples. The measured
+    waits are kept, e.g. to write them to the xml.
+    '''
+    ## Default seconds the device has to be idle.
+    defIdle = 5
+    ## Default max seconds to wait for the device to get idle.
+    defTimeout = 300
+    ## Seconds between two samples of the device statistics.
+    interval = 0.5
+    ## Positions of sectors read, sectors written and IOs in flight in the stat file.
+    statSectorsRead = 2
+    statSectorsWritten = 6
+    statInFlight = 8
+
+    def __init__(self,devPath,idle=None,timeout=None):
+        '''
+        Constructor
+        @param devPath Path of the device, e.g. /dev/sda.
+        @param idle Seconds the device has to be idle, None for the default.
+        @param timeout Max seconds to wait, None for the default.
+        '''
+        ## Path of the device
+        self.__devPath = devPath
+        ## Seconds the device has to be idle
+        self.__idle = IdleWaiter.defIdle if idle == None else idle
+        ## Max seconds to wait
+        self.__timeout = IdleWaiter.defTimeout if timeout == None else timeout
+        ## Measured waits, a list of dictionaries
+        self.__waits = []
+
+    def getIdle(self): return self.__idle
+    def getTimeout(self): return self.__timeout
+    def getWaits(self): return self.__waits
+
+    def getStatPath(self):
+        ''' Return the path of the stat file of the device, also for partitions. '''
+        name = os.path.basename(os.path.realpath(self.__devPath))
+        return '/sys/class/block/' + name + '/stat'
+
+    def readStat(self):
+        '''
+        Read the IO statistics of the device.
+        @return [sectors read,sectors written,IOs in flight] or None if the
+        statistics cannot be read.
+        '''
+        try:
+            f = open(self.getStatPath(),'r')
+            try:
+                fields = f.read().split()
+            finally:
+                f.close()
+            return [int(fields[IdleWaiter.statSectorsRead]),int(fields[IdleWaiter.statSectorsWritten]),
+                    int(fields[IdleWaiter.statInFlight])]
+        except (IOError,IndexError,ValueError):
+            return None
+
+    def wait(self,label,fallback):
+        '''
+        Wait until the device has been idle for the idle period or the timeout
+        is reached. If the statistics of the device cannot be read, sleep for
+        a fixed number of seconds instead.
+        @param label A description of the wait, e.g. 'secure erase'.
+        @param fallback Seconds to sleep if the statistics cannot be read.
+        @return The seconds waited.
+        '''
+        start = time.time()
+        last = self.readStat()
+        if last == None:
+            logging.info("# Cannot read " + self.getStatPath() + ", sleeping for " + str(fallback) + " seconds...")
+            time.sleep(fallback)
+            self.__waits.append({'label':label,'waited':round(time.time() - start,1),'idle':None})
+            return self.__waits[-1]['waited']
+        logging.info("# Waiting for " + self.__devPath + " to be idle for " + str(self.__idle) + " seconds...")
+        idleSince = start if last[2] == 0 else None
+        idle = False
+        while time.time() - start < self.__timeout:
+            time.sleep(IdleWaiter.interval)
+            cur = self.readStat()
+            now = time.time()
+            if cur == None or cur[2] > 0 or cur[0:2] != last[0:2]:
+                idleSince = None
+            elif idleSince == None:
+                idleSince = now
+            last = cur if cur != None else last
+            if idleSince != None and now - idleSince >= self.__idle:
+                idle = True
+                break
+        waited = round(time.time() - start,1)
+        if idle:
+            logging.info("# " + self.__devPath + " is idle after " + str(waited) + " seconds")
+        else:
+            logging.warn("# " + self.__devPath + " did not get idle within " + str(self.__timeout) + " seconds")
+        self.__waits.append({'label':label,'waited':waited,'idle':idle})
+        return waited
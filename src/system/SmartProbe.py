@@ -0,0 +1,284 @@
+''' @package SmartProbe
+A module taking SMART snapshots of a device, e.g. before and after a test
+round to detect if the device has throttled thermally during the round, or
+before and after a test to calculate its write amplification.
+'''
+from abc import ABCMeta, abstractmethod
+import json
+import logging
+import os
+import re
+import subprocess
+
+class SmartProbe(object):
+    '''
+    A probe reading the temperature, the thermal and the wear counters of a
+    device. A snapshot is a dictionary holding the temperature in degrees
+    Celsius ('temp'), the minutes above the warning and critical temperature
+    ('warntime','crittime'), the number of thermal management transitions
+    ('throttle'), the bytes written by the host and to the NAND
+    ('hostwritten','nandwritten') and the percentage of the rated life used
+    ('pctused'). Values the device does not report are None.
+    '''
+    __metaclass__ = ABCMeta
+
+    ## Name of the probe, cf. probes.
+    name = None
+    ## Degrees Celsius from which a round counts as throttled if the device has no thermal counters.
+    tempLimit = 70
+    ## Counters of a snapshot increasing while the device throttles.
+    counters = ['warntime','crittime','throttle']
+    ## Bytes of a nvme data unit.
+    dataUnit = 512000
+
+    def __init__(self,devPath):
+        '''
+        Constructor
+        @param devPath Path of the device, e.g. /dev/nvme0n1.
+        '''
+        ## Path of the device
+        self.__devPath = devPath
+
+    def getDevPath(self): return self.__devPath
+
+    @abstractmethod
+    def read(self):
+        '''
+        Read a snapshot from the device, cf. snapshot.
+        @exception OSError, ValueError if the device cannot be read.
+        '''
+
+    def snapshot(self):
+        '''
+        Take a snapshot of the device.
+        @return A snapshot dictionary or None if the device cannot be read.
+        '''
+        try:
+            return self.read()
+        except (OSError,ValueError,KeyError,TypeError),e:
+            logging.warn("# SMART probe " + self.name + " cannot read " + self.__devPath + ": " + str(e))
+            return None
+
+    def run(self,args,fatal=0xff):
+        '''
+        Run a command reading SMART data.
+        @param args The command and its arguments.
+        @param fatal Bits of the exit status stating an error.
+        @return The output of the command.
+        @exception OSError if the command is not found.
+        @exception ValueError if the command failed.
+        '''
+        out = subprocess.Popen(args,stdout=subprocess.PIPE,stderr=subprocess.PIPE)
+        (stdout,stderr) = out.communicate()
+        if out.returncode & fatal:
+            raise ValueError(args[0] + " exited with " + str(out.returncode) + ": " + stderr.strip())
+        return stdout
+
+    @staticmethod
+    def compare(before,after):
+        '''
+        Annotate a test round by the snapshots taken before and after it. A
+        round is throttled if a thermal counter increased. If the device has no
+        thermal counters, a round is throttled if it reached tempLimit.
+        @param before The snapshot before the round, None if not available.
+        @param after The snapshot after the round, None if not available.
+        @return A dictionary with the highest temperature ('temp'), if the
+        round has been throttled ('throttled') and the increase of the
+        counters, or None if a snapshot is missing.
+        '''
+        if before == None or after == None:
+            return None
+        temps = [s['temp'] for s in [before,after] if s.get('temp') != None]
+        note = {'temp':max(temps) if len(temps) > 0 else None}
+        for c in SmartProbe.counters:
+            if before.get(c) != None and after.get(c) != None:
+                note[c] = after[c] - before[c]
+        if len(note) > 1:
+            note['throttled'] = any(note[c] > 0 for c in SmartProbe.counters if c in note)
+        else:
+            note['throttled'] = note['temp'] != None and note['temp'] >= SmartProbe.tempLimit
+        return note
+
+class NvmeProbe(SmartProbe):
+    '''
+    Reads the SMART / health log of a nvme device with nvme-cli.
+    '''
+    name = 'nvme'
+
+    def read(self):
+        log = json.loads(self.run(['nvme','smart-log',self.getDevPath(),'-o','json']))
+        trans = [log[k] for k in ['thm_temp1_trans_count','thm_temp2_trans_count'] if k in log]
+        #the composite temperature is reported in Kelvin, the NAND writes are not part of the standard log
+        return {'temp':int(log['temperature']) - 273,
+                'warntime':log.get('warning_temp_time'),
+                'crittime':log.get('critical_comp_time'),
+                'throttle':sum(trans) if len(trans) > 0 else None,
+                'hostwritten':log['data_units_written'] * SmartProbe.dataUnit,
+                'nandwritten':None,
+                'pctused':log.get('percent_used',log.get('percentage_used'))}
+
+class SataProbe(SmartProbe):
+    '''
+    Reads the SMART attributes of a sata or sas device with smartctl, if
+    smartctl is not available or too old for json output hdparm is used.
+    Sata devices have no thermal counters, only the temperature is read. The
+    wear counters are vendor specific attributes, they are read by the parsers
+    registered for their names in attrParsers.
+    '''
+    name = 'sata'
+    ## Exit status bits of smartctl stating that the device could not be read.
+    smartctlFatal = 0x03
+
+    def read(self):
+        try:
+            data = json.loads(self.run(['smartctl','-A','-j',self.getDevPath()],SataProbe.smartctlFatal))
+        except (OSError,ValueError):
+            return self.readHdparm()
+        snap = {'temp':data.get('temperature',{}).get('current'),
+                'warntime':None,'crittime':None,'throttle':None,
+                'hostwritten':None,'nandwritten':None,'pctused':None}
+        for attr in data.get('ata_smart_attributes',{}).get('table',[]):
+            if attr.get('name') in attrParsers:
+                key,parser = attrParsers[attr['name']]
+                snap[key] = parser(attr)
+        #nvme devices behind smartctl report their health log
+        log = data.get('nvme_smart_health_information_log')
+        if log != None:
+            snap['warntime'] = log.get('warning_temp_time')
+            snap['crittime'] = log.get('critical_comp_time')
+            snap['hostwritten'] = log['data_units_written'] * SmartProbe.dataUnit
+            snap['pctused'] = log.get('percentage_used')
+        return snap
+
+    def readHdparm(self):
+        ''' Read the temperature with hdparm, cf. read. '''
+        out = self.run(['hdparm','-H',self.getDevPath()])
+        match = re.search(r'drive temperature \(celsius\) is:\s*(-?\d+)',out)
+        if match == None:
+            raise ValueError("hdparm -H reports no temperature")
+        return {'temp':int(match.group(1)),'warntime':None,'crittime':None,'throttle':None,
+                'hostwritten':None,'nandwritten':None,'pctused':None}
+
+class FakeProbe(SmartProbe):
+    '''
+    A probe returning given snapshots instead of reading a device, e.g. to
+    run tests on a file or to replay the snapshots of a previous run.
+    '''
+    name = 'fake'
+    ## Snapshot returned if no snapshots are given: a cool device without throttling.
+    idle = {'temp':40,'warntime':0,'crittime':0,'throttle':0,'hostwritten':0,'nandwritten':0,'pctused':0}
+
+    def __init__(self,devPath,snaps=None):
+        '''
+        Constructor
+        @param devPath Path of the device, only used for logging.
+        @param snaps A list of snapshots returned in order, the last one is
+        repeated. None for the idle snapshot.
+        '''
+        super(FakeProbe,self).__init__(devPath)
+        ## Snapshots still to return
+        self.__snaps = [FakeProbe.idle] if snaps == None or len(snaps) == 0 else list(snaps)
+
+    def read(self):
+        if len(self.__snaps) > 1:
+            return dict(self.__snaps.pop(0))
+        return dict(self.__snaps[0])
+
+## Available probes per name.
+probes = dict((p.name,p) for p in [NvmeProbe,SataProbe,FakeProbe])
+
+## Parsers of sata SMART attributes per attribute name as named by smartctl:
+## [snapshot key,function of the attribute returning the value], cf. addAttrParser.
+attrParsers = {}
+## Years the endurance is projected over, the usual warranty period.
+warrantyYears = 5
+
+def addAttrParser(name,key,parser):
+    '''
+    Register a parser of a sata SMART attribute.
+    @param name The name of the attribute as reported by smartctl, e.g. Total_LBAs_Written.
+    @param key The key of the value in a snapshot, e.g. hostwritten.
+    @param parser A function of the attribute's json dictionary returning the value.
+    '''
+    attrParsers[name] = [key,parser]
+
+def rawScaled(scale):
+    ''' Return a parser of the raw value of an attribute multiplied by scale. '''
+    return lambda attr: attr['raw']['value'] * scale
+
+def lifeUsed(attr):
+    ''' Parse an attribute whose normalized value is the remaining life in percent. '''
+    return 100 - attr['value']
+
+addAttrParser('Total_LBAs_Written','hostwritten',rawScaled(512))
+addAttrParser('Host_Writes_32MiB','hostwritten',rawScaled(32 * 1024 ** 2))
+addAttrParser('Host_Writes_GiB','hostwritten',rawScaled(1024 ** 3))
+addAttrParser('Lifetime_Writes_GiB','hostwritten',rawScaled(1024 ** 3))
+addAttrParser('NAND_Writes_32MiB','nandwritten',rawScaled(32 * 1024 ** 2))
+addAttrParser('NAND_Writes_1GiB','nandwritten',rawScaled(1024 ** 3))
+addAttrParser('NAND_Writes_GiB','nandwritten',rawScaled(1024 ** 3))
+addAttrParser('Media_Wearout_Indicator','pctused',lifeUsed)
+addAttrParser('Wear_Leveling_Count','pctused',lifeUsed)
+addAttrParser('SSD_Life_Left','pctused',lifeUsed)
+addAttrParser('Percent_Lifetime_Remain','pctused',lifeUsed)
+
+def endurance(before,after,capacity,hostWritten=None):
+    '''
+    Calculate the write amplification of a test from the snapshots taken
+    before and after it, and project the endurance of the device under the
+    workload of the test. The write amplification is the ratio of the bytes
+    written to the NAND to the bytes written by the host. The host writes per
+    percent of rated life are taken from the increase of the percentage used
+    during the test. If it did not increase, the NAND writes per percent used
+    over the whole life of the device are divided by the write amplification.
+    The endurance is given as drive writes per day over warrantyYears.
+    @param before The snapshot before the test, None if not available.
+    @param after The snapshot after the test, None if not available.
+    @param capacity The capacity of the device in bytes.
+    @param hostWritten The bytes written by the test as reported by fio, used
+    if the device does not count the host writes. None if not known.
+    @return A dictionary holding the host and NAND bytes written during the
+    test ('hostwritten','nandwritten'), the write amplification ('waf'), the
+    percentage used before and after the test ('pctused') and the drive writes
+    per day ('dwpd'), values that cannot be calculated are None. None if a
+    snapshot is missing.
+    '''
+    if before == None or after == None:
+        return None
+    def delta(key):
+        if before.get(key) == None or after.get(key) == None:
+            return None
+        return after[key] - before[key]
+    host = delta('hostwritten')
+    if host == None:
+        host = hostWritten
+    nand = delta('nandwritten')
+    wear = {'hostwritten':host,'nandwritten':nand,'waf':None,'dwpd':None,
+            'pctused':[before.get('pctused'),after.get('pctused')]}
+    if host != None and host > 0 and nand != None:
+        wear['waf'] = round(nand / float(host),2)
+    perPct = None
+    used = delta('pctused')
+    if used != None and used > 0 and host != None:
+        perPct = host / float(used)
+    elif wear['waf'] != None and wear['waf'] > 0 and after.get('pctused') != None and \
+         after['pctused'] > 0 and after.get('nandwritten') != None:
+        perPct = after['nandwritten'] / float(after['pctused']) / wear['waf']
+    if perPct != None and capacity > 0:
+        wear['dwpd'] = round(perPct * 100 / (capacity * 365.0 * warrantyYears),3)
+    return wear
+
+def getProbe(name,devPath,intfce=None):
+    '''
+    Create a probe for a device.
+    @param name The name of the probe, cf. probes, or 'auto' to choose by the device.
+    @param devPath Path of the device.
+    @param intfce The interface of the device, e.g. nvme, None if unknown.
+    @exception ValueError if the probe is unknown.
+    '''
+    if name == 'auto':
+        nvme = intfce == 'nvme' or os.path.basename(os.path.realpath(devPath)).startswith('nvme')
+        name = 'nvme' if nvme else 'sata'
+    if name not in probes:
+        raise ValueError("unknown SMART probe " + name)
+    return probes[name](devPath)
@@ -0,0 +1,192 @@
+''' @package Telemetry
+A module sampling host and device statistics in the background while fio is
+running, to tell if the host instead of the device limits the performance.
+'''
+from collections import deque
+import logging
+import os
+import re
+import threading
+import time
+
+class Telemetry(object):
+    '''
+    A sampler reading /proc/diskstats of the device, /proc/stat per cpu and
+    /proc/interrupts of the device's IRQs in a background thread. The samples
+    are kept in a ring buffer, peaks are tracked over the whole run, so a
+    summary covers all samples also if the buffer has wrapped.
+    '''
+    ## Seconds between two samples.
+    interval = 1.0
+    ## Number of samples kept in the ring buffer.
+    capacity = 3600
+    ## Busy percentage of a cpu from which it is saturated.
+    cpuLimit = 95.0
+    ## Percentage of a cpu spent in irq and softirq from which interrupt handling is saturated.
+    irqLimit = 50.0
+    ## Utilization percentage of the device below which it is not the bottleneck.
+    devLimit = 90.0
+    ## IRQ names of storage controllers if the device has no own IRQs, e.g. sata disks.
+    ctrlIrqs = r'ahci|ata|mpt\d*sas|megasas|virtio'
+
+    def __init__(self,devPath):
+        '''
+        Constructor
+        @param devPath Path of the device, e.g. /dev/nvme0n1.
+        '''
+        ## Name of the device in /proc/diskstats
+        self.__devName = os.path.basename(os.path.realpath(devPath))
+        ## Pattern matching the IRQ names of the device
+        self.__irqPattern = re.compile(Telemetry.irqPattern(self.__devName))
+        ## Ring buffer of samples
+        self.__samples = deque([],Telemetry.capacity)
+        ## First sample of the current run
+        self.__first = None
+        ## Peak busy and irq percentage of a single cpu of the current run
+        self.__peaks = None
+        ## Event stopping the sampling thread
+        self.__stopEvent = None
+        ## The sampling thread
+        self.__thread = None
+
+    def getDevName(self): return self.__devName
+    def getSamples(self): return self.__samples
+
+    @staticmethod
+    def irqPattern(devName):
+        '''
+        Return a pattern of the IRQ names of a device, nvme devices have queue
+        IRQs named after the controller, e.g. nvme0q1.
+        @param devName The name of the device, e.g. nvme0n1.
+        '''
+        match = re.match(r'(nvme\d+)',devName)
+        if match != None:
+            return match.group(1) + r'q\d+'
+        return Telemetry.ctrlIrqs
+
+    def readDiskstats(self):
+        '''
+        Read the statistics of the device from /proc/diskstats.
+        @return [IOs completed,sectors read and written,ms spent doing IO] or None.
+        '''
+        f = open('/proc/diskstats','r')
+        try:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 12 and fields[2] == self.__devName:
+                    return [int(fields[3]) + int(fields[7]),int(fields[5]) + int(fields[9]),int(fields[12])]
+        finally:
+            f.close()
+        return None
+
+    def readCpuStat(self):
+        '''
+        Read the jiffies of every cpu from /proc/stat.
+        @return A dictionary of cpu name -> [total,busy,irq and softirq] jiffies.
+        '''
+        cpus = {}
+        f = open('/proc/stat','r')
+        try:
+            for line in f:
+                fields = line.split()
+                if not re.match(r'cpu\d+$',fields[0]):
+                    continue
+                vals = [int(v) for v in fields[1:8]]
+                #user nice system idle iowait irq softirq
+                total = sum(vals)
+                cpus[fields[0]] = [total,total - vals[3] - vals[4],vals[5] + vals[6]]
+        finally:
+            f.close()
+        return cpus
+
+    def readInterrupts(self):
+        ''' Return the number of interrupts of the device's IRQs on all cpus. '''
+        count = 0
+        f = open('/proc/interrupts','r')
+        try:
+            ncpus = len(f.readline().split())
+            for line in f:
+                fields = line.split()
+                if len(fields) <= ncpus or not self.__irqPattern.search(fields[-1]):
+                    continue
+                count += sum(int(v) for v in fields[1:ncpus + 1] if v.isdigit())
+        finally:
+            f.close()
+        return count
+
+    def sample(self):
+        '''
+        Take one sample and update the peaks of the current run.
+        @return The sample [time,diskstats,cpu stats,interrupts].
+        '''
+        s = [time.time(),self.readDiskstats(),self.readCpuStat(),self.readInterrupts()]
+        if len(self.__samples) > 0:
+            last = self.__samples[-1]
+            for cpu,vals in s[2].iteritems():
+                if cpu not in last[2]:
+                    continue
+                delta = [v - l for v,l in zip(vals,last[2][cpu])]
+                if delta[0] <= 0:
+                    continue
+                self.__peaks[0] = max(self.__peaks[0],100.0 * delta[1] / delta[0])
+                self.__peaks[1] = max(self.__peaks[1],100.0 * delta[2] / delta[0])
+        self.__samples.append(s)
+        return s
+
+    def __run(self):
+        ''' Sample until the stop event is set. '''
+        while not self.__stopEvent.wait(Telemetry.interval):
+            try:
+                self.sample()
+            except (IOError,ValueError),e:
+                logging.warn("# Telemetry sampling failed: " + str(e))
+                return
+
+    def start(self):
+        '''
+        Start sampling in a background thread, e.g. before fio is started.
+        '''
+        self.__peaks = [0.0,0.0]
+        self.__first = self.sample()
+        self.__stopEvent = threading.Event()
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        '''
+        Stop sampling, e.g. after fio has finished, and summarize the run.
+        @return A summary of the run, cf. summarize.
+        '''
+        self.__stopEvent.set()
+        self.__thread.join()
+        return self.summarize(self.__first,self.sample())
+
+    def summarize(self,first,last):
+        '''
+        Summarize the samples between two samples.
+        @param first The first sample of the run.
+        @param last The last sample of the run.
+        @return A dictionary with the seconds, the mean busy percentage of all
+        cpus, the peak busy and irq percentage of a single cpu, the device
+        utilization, IOPS and interrupts per second and a list of alerts if the
+        host is the bottleneck.
+        '''
+        secs = max(last[0] - first[0],0.001)
+        summary = {'secs':round(secs,1),'cpupeak':round(self.__peaks[0],1),'irqpeak':round(self.__peaks[1],1)}
+        total = sum(v[0] - first[2][c][0] for c,v in last[2].iteritems() if c in first[2])
+        busy = sum(v[1] - first[2][c][1] for c,v in last[2].iteritems() if c in first[2])
+        summary['cpumean'] = round(100.0 * busy / total,1) if total > 0 else 0.0
+        summary['irqs'] = round((last[3] - first[3]) / secs,1)
+        summary['devutil'] = None
+        if first[1] != None and last[1] != None:
+            summary['devutil'] = round(min(100.0 * (last[1][2] - first[1][2]) / (secs * 1000),100.0),1)
+            summary['deviops'] = round((last[1][0] - first[1][0]) / secs,1)
+        alerts = []
+        if summary['devutil'] == None or summary['devutil'] < Telemetry.devLimit:
+            if summary['cpupeak'] >= Telemetry.cpuLimit:
+                alerts.append("a cpu was " + str(summary['cpupeak']) + "% busy while the device was not saturated")
+            if summary['irqpeak'] >= Telemetry.irqLimit:
+                alerts.append("a cpu spent " + str(summary['irqpeak']) + "% in irq/softirq while the device was not saturated")
+        summary['alerts'] = alerts
+        return summary